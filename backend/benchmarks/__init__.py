@@ -0,0 +1,9 @@
+"""Benchmarks do backend.
+
+- `crud_bench`: micro-benchmarks das funções de `crud` em bancos semeados de vários tamanhos.
+- `carga`: gerador de carga asyncio com cenários de PDV (mesas) e loja online.
+- `comparar`: compara dois resultados JSON e aponta regressões.
+
+Os bancos de benchmark são gerados com `backend/gerar_dataset.py` e ficam em
+`.bench/` na raiz do projeto (reaproveitados entre execuções).
+"""
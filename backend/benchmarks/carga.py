@@ -0,0 +1,206 @@
+"""Gerador de carga asyncio com cenários realistas de PDV e loja online.
+
+Cenários (usuários virtuais em paralelo, com tempo de "pensar" entre ações):
+- garçom (PDV): lista mesas, lança item na mesa, consulta a mesa e às vezes remove um item;
+- cliente (loja): navega no catálogo, abre um produto e suas avaliações, salva o carrinho.
+
+Sem `--url` o backend sobe em um subprocesso uvicorn sobre uma cópia de um
+banco semeado (DATABASE_URL vai no ambiente do subprocesso, então o banco
+principal nunca é tocado). Para medir contra um servidor já configurado use
+`--url http://localhost:8000`.
+
+Usage:
+    python -m backend.benchmarks.carga --tamanho medio --duracao 30 --garcons 20 --clientes 50 --saida carga.json
+    python -m backend.benchmarks.carga --url http://localhost:8000 --duracao 60
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from backend.benchmarks import comum
+from backend.replay import AsyncHTTPClient
+
+
+class Coletor:
+    """Acumula latência e status por operação (método + rota template)."""
+
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.status: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def chamar(self, cliente: AsyncHTTPClient, chave: str, method: str, path: str,
+                     corpo: Optional[dict] = None, session: Optional[int] = None):
+        headers = {}
+        body = b""
+        if corpo is not None:
+            body = json.dumps(corpo).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if session is not None:
+            headers["Cookie"] = f"session={session}"
+        t = time.perf_counter()
+        try:
+            status, resp, _h = await cliente.request(method, path, body, headers)
+        except Exception:
+            self.status[chave]["erro"] += 1
+            return None, None
+        self.latencias[chave].append(time.perf_counter() - t)
+        self.status[chave][str(status)] += 1
+        try:
+            return status, json.loads(resp) if resp else None
+        except ValueError:
+            return status, None
+
+    def resultados(self, duracao: float) -> dict:
+        saida = {}
+        for chave in sorted(self.latencias):
+            r = comum.resumo(self.latencias[chave])
+            r["ops_s"] = len(self.latencias[chave]) / duracao
+            r["status"] = dict(self.status[chave])
+            saida[chave] = r
+        return saida
+
+
+async def _pensar(rng: random.Random, media_ms: float):
+    if media_ms > 0:
+        await asyncio.sleep(rng.expovariate(1000.0 / media_ms))
+
+
+async def garcom(base_url: str, dados: dict, coletor: Coletor, fim: float, rng: random.Random, pensar_ms: float):
+    cliente = AsyncHTTPClient(base_url)
+    usuario = rng.choice(dados["usuarios"])
+    try:
+        while time.perf_counter() < fim:
+            await coletor.chamar(cliente, "GET /mesas/", "GET", "/mesas/")
+            mesa = rng.choice(dados["mesas"])
+            await coletor.chamar(cliente, "POST /mesas/{mesa_id}/itens", "POST", f"/mesas/{mesa}/itens",
+                                 {"produtoId": rng.choice(dados["produtos"]), "quantidade": rng.randint(1, 3),
+                                  "usuarioId": usuario})
+            _s, detalhe = await coletor.chamar(cliente, "GET /mesas/{mesa_id}", "GET", f"/mesas/{mesa}")
+            itens = (detalhe or {}).get("itens") or []
+            if itens and rng.random() < 0.1:
+                item = rng.choice(itens)
+                await coletor.chamar(cliente, "DELETE /mesas/{mesa_id}/itens/{item_id}", "DELETE",
+                                     f"/mesas/{mesa}/itens/{item['id']}")
+            await _pensar(rng, pensar_ms)
+    finally:
+        await cliente.fechar()
+
+
+async def cliente_loja(base_url: str, dados: dict, coletor: Coletor, fim: float, rng: random.Random, pensar_ms: float):
+    cliente = AsyncHTTPClient(base_url)
+    usuario = rng.choice(dados["usuarios"])
+    try:
+        while time.perf_counter() < fim:
+            skip = rng.randrange(max(1, len(dados["produtos"]) - 50))
+            await coletor.chamar(cliente, "GET /produtos/", "GET", f"/produtos/?skip={skip}&limit=50")
+            produto = rng.choice(dados["produtos"])
+            await coletor.chamar(cliente, "GET /produtos/{produto_id}", "GET", f"/produtos/{produto}")
+            await coletor.chamar(cliente, "GET /produtos/{produto_id}/avaliacoes/", "GET", f"/produtos/{produto}/avaliacoes/")
+            if rng.random() < 0.3:
+                itens = [{"produtoId": rng.choice(dados["produtos"]), "quantidade": rng.randint(1, 3)}
+                         for _ in range(rng.randint(1, 5))]
+                await coletor.chamar(cliente, "POST /carrinho/", "POST", "/carrinho/", {"itens": itens}, session=usuario)
+                await coletor.chamar(cliente, "GET /carrinho/", "GET", "/carrinho/", session=usuario)
+            await _pensar(rng, pensar_ms)
+    finally:
+        await cliente.fechar()
+
+
+async def _carregar_dados(base_url: str) -> dict:
+    cliente = AsyncHTTPClient(base_url)
+    try:
+        _s, produtos, _h = await cliente.request("GET", "/produtos/?limit=5000")
+        _s, mesas, _h = await cliente.request("GET", "/mesas/?limit=1000")
+        _s, usuarios, _h = await cliente.request("GET", "/users/?limit=1000")
+    finally:
+        await cliente.fechar()
+    return {
+        "produtos": [p["id"] for p in json.loads(produtos)],
+        "mesas": [m["id"] for m in json.loads(mesas)],
+        "usuarios": [u["id"] for u in json.loads(usuarios)],
+    }
+
+
+async def executar(base_url: str, duracao: float, garcons: int, clientes: int, pensar_ms: float, seed: int) -> dict:
+    dados = await _carregar_dados(base_url)
+    coletor = Coletor()
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    tarefas = [garcom(base_url, dados, coletor, fim, random.Random(f"{seed}:g{i}"), pensar_ms) for i in range(garcons)]
+    tarefas += [cliente_loja(base_url, dados, coletor, fim, random.Random(f"{seed}:c{i}"), pensar_ms) for i in range(clientes)]
+    await asyncio.gather(*tarefas)
+    return coletor.resultados(time.perf_counter() - inicio)
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def subir_em_processo(tamanho: str, seed: int):
+    """Sobe o backend em um subprocesso sobre uma cópia do banco semeado; retorna (url, processo)."""
+    base = comum.banco_semeado(tamanho, seed=seed)
+    caminho = comum.copia_banco(base, f"carga-{tamanho}")
+    # O engine é criado no import de backend.database: a URL precisa estar no ambiente do processo do servidor
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{caminho}", PYTHONPATH=str(comum.RAIZ))
+    porta = _porta_livre()
+    url = f"http://127.0.0.1:{porta}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(porta),
+         "--log-level", "warning"],
+        cwd=str(comum.RAIZ), env=env,
+    )
+    prazo = time.monotonic() + 60
+    while True:
+        try:
+            urllib.request.urlopen(url + "/health", timeout=1).close()
+            return url, proc
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > prazo:
+                proc.kill()
+                raise RuntimeError(f"Backend em {url} não subiu")
+            time.sleep(0.1)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga com cenários de PDV e loja online.")
+    parser.add_argument("--url", default=None, help="Alvo já em execução (sem isso sobe o backend em processo)")
+    parser.add_argument("--tamanho", default="pequeno", choices=list(comum.TAMANHOS), help="Banco semeado (modo em processo)")
+    parser.add_argument("--duracao", type=float, default=30.0, help="Segundos de carga")
+    parser.add_argument("--garcons", type=int, default=10, help="Usuários virtuais do PDV")
+    parser.add_argument("--clientes", type=int, default=30, help="Usuários virtuais da loja online")
+    parser.add_argument("--pensar-ms", type=float, default=50.0, help="Tempo médio entre ações de cada usuário")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado")
+    args = parser.parse_args(argv)
+
+    servidor = None
+    url = args.url
+    if url is None:
+        url, servidor = subir_em_processo(args.tamanho, args.seed)
+    try:
+        resultados = asyncio.run(executar(url, args.duracao, args.garcons, args.clientes, args.pensar_ms, args.seed))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait(timeout=10)
+    comum.imprimir(resultados)
+    comum.salvar("carga", resultados, args.saida, {
+        "alvo": args.url or f"em-processo:{args.tamanho}", "duracao_s": args.duracao,
+        "garcons": args.garcons, "clientes": args.clientes, "pensar_ms": args.pensar_ms,
+    })
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Coerência dos caches em processo com vários workers.
+
+Sobe N processos uvicorn independentes (portas consecutivas) sobre uma cópia de
+um banco semeado, aquece os caches de catálogo, usuários e salão em todos
+eles, e então escreve por um único worker:
+
+- `PUT /produtos/{id}` trocando o nome   → `GET /produtos/` dos demais
+- `PUT /mesas/{id}` trocando o status    → `GET /mesas/` dos demais
+- `POST /users/` com um usuário novo     → `GET /users/` dos demais
+
+Para cada escrita mede quanto tempo cada worker leva para refletir a mudança.
+Termina com código 1 se algum atraso passar de `--limite-ms` ou se os caches
+não tiverem sido usados (nenhum acerto em /metrics, o que tornaria o teste
+inócuo).
+
+Usage:
+    python -m backend.benchmarks.coerencia_workers --workers 3 --limite-ms 1000
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Callable, List
+
+import requests
+
+from backend.benchmarks import comum
+
+
+def _portas_livres(n: int) -> List[int]:
+    portas, sockets = [], []
+    for _ in range(n):
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        sockets.append(s)
+        portas.append(s.getsockname()[1])
+    for s in sockets:
+        s.close()
+    return portas
+
+
+def subir_workers(caminho, n: int, poll_ms: int) -> List[tuple]:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{caminho}", JOBS_WORKERS="0",
+               INVALIDACAO_POLL_MS=str(poll_ms), PYTHONPATH=str(comum.RAIZ))
+    # Esquema criado antes, como faz `backend.servidor`, para os workers não disputarem o create_all
+    subprocess.run([sys.executable, "-c", "from backend.servidor import preparar_banco; preparar_banco()"],
+                   cwd=str(comum.RAIZ), env=env, check=True)
+    workers = []
+    for porta in _portas_livres(n):
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(porta),
+             "--log-level", "warning"],
+            cwd=str(comum.RAIZ), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        workers.append((proc, f"http://127.0.0.1:{porta}"))
+    for proc, url in workers:
+        prazo = time.monotonic() + 60
+        while True:
+            try:
+                requests.get(url + "/health", timeout=1)
+                break
+            except requests.RequestException:
+                if proc.poll() is not None or time.monotonic() > prazo:
+                    raise RuntimeError(f"Worker {url} não subiu")
+                time.sleep(0.1)
+    return workers
+
+
+def esperar(urls: List[str], condicao: Callable[[str], bool], limite_s: float) -> List[float]:
+    """Atraso (s) até `condicao(url)` ser verdadeira em cada worker; None se estourar `limite_s`."""
+    inicio = time.perf_counter()
+    atrasos = [None] * len(urls)
+    while time.perf_counter() - inicio < limite_s * 5 and None in atrasos:
+        for i, url in enumerate(urls):
+            if atrasos[i] is None and condicao(url):
+                atrasos[i] = time.perf_counter() - inicio
+        time.sleep(0.01)
+    return atrasos
+
+
+def _acertos_cache(url: str) -> int:
+    texto = requests.get(url + "/metrics", timeout=5).text
+    return sum(int(v) for v in re.findall(r'^cache_hits_total\{cache="(?:catalogo|usuarios|salao)"\} (\d+)$',
+                                           texto, re.M))
+
+
+def rodar(workers: List[tuple], limite_s: float) -> dict:
+    urls = [url for _proc, url in workers]
+    escritor = urls[0]
+
+    def produtos(url):
+        return requests.get(url + "/produtos/", timeout=5).json()
+
+    def mesas(url):
+        return requests.get(url + "/mesas/", timeout=5).json()
+
+    def usuarios(url):
+        return requests.get(url + "/users/?limit=100000", timeout=5).json()
+
+    for _ in range(2):
+        for url in urls:
+            produtos(url), mesas(url), usuarios(url)
+
+    resultados = {}
+    sufixo = str(int(time.time() * 1000))
+
+    produto = produtos(escritor)[0]
+    novo_nome = f"{produto['nome'].split(' #')[0]} #{sufixo}"
+    corpo = {k: produto[k] for k in ("descricao", "preco_compra", "preco_venda", "codigo", "categoria_id", "estoque")}
+    requests.put(f"{escritor}/produtos/{produto['id']}", json=dict(corpo, nome=novo_nome), timeout=5).raise_for_status()
+    resultados["produto"] = esperar(
+        urls, lambda u: any(p["id"] == produto["id"] and p["nome"] == novo_nome for p in produtos(u)), limite_s)
+
+    mesa = mesas(escritor)[0]
+    novo_status = "ocupada" if mesa["status"] != "ocupada" else "livre"
+    requests.put(f"{escritor}/mesas/{mesa['id']}", json={"nome": mesa["nome"], "status": novo_status},
+                 timeout=5).raise_for_status()
+    resultados["mesa"] = esperar(
+        urls, lambda u: any(m["id"] == mesa["id"] and m["status"] == novo_status for m in mesas(u)), limite_s)
+
+    email = f"coerencia{sufixo}@carga.example.com"
+    requests.post(f"{escritor}/users/", json={"username": f"coerencia{sufixo}", "nome": "Coerência", "email": email,
+                                             "password": "carga123"},
+                  timeout=5).raise_for_status()
+    resultados["usuario"] = esperar(urls, lambda u: any(x["email"] == email for x in usuarios(u)), limite_s)
+
+    resultados["acertos_cache"] = sum(_acertos_cache(u) for u in urls)
+    return resultados
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica a invalidação de caches entre vários workers.")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--tamanho", default="pequeno", choices=list(comum.TAMANHOS))
+    parser.add_argument("--poll-ms", type=int, default=200, help="INVALIDACAO_POLL_MS dos workers")
+    parser.add_argument("--limite-ms", type=float, default=1000.0, help="Atraso máximo aceito por worker")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    base = comum.banco_semeado(args.tamanho, seed=args.seed)
+    caminho = comum.copia_banco(base, "coerencia")
+    workers = subir_workers(caminho, args.workers, args.poll_ms)
+    try:
+        resultados = rodar(workers, args.limite_ms / 1000.0)
+    finally:
+        for proc, _url in workers:
+            proc.terminate()
+        for proc, _url in workers:
+            proc.wait(timeout=10)
+        caminho.unlink(missing_ok=True)
+
+    ok = resultados.pop("acertos_cache") > 0
+    if not ok:
+        print("Nenhum acerto de cache registrado: caches desligados (CACHE_LOCAL=false)?")
+    for escrita, atrasos in resultados.items():
+        texto = ", ".join("-" if a is None else f"{a * 1000:.0f} ms" for a in atrasos)
+        estourou = any(a is None or a * 1000 > args.limite_ms for a in atrasos)
+        ok = ok and not estourou
+        print(f"{escrita:8s} {'FALHOU' if estourou else 'ok':6s} {texto}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Compara dois resultados de benchmark (JSON) e aponta regressões.
+
+Usage:
+    python -m backend.benchmarks.comparar base.json novo.json --metrica p50_ms --limite 10
+
+Sai com código 1 se algum benchmark presente nos dois arquivos piorar mais que
+`--limite` por cento na métrica escolhida (para métricas de vazão, `ops_s`,
+piorar significa diminuir).
+"""
+import argparse
+import json
+import sys
+from typing import List, Tuple
+
+# Métricas em que maior é melhor
+METRICAS_VAZAO = {"ops_s"}
+
+
+def carregar(caminho: str) -> dict:
+    with open(caminho, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def comparar(base: dict, novo: dict, metrica: str, limite: float) -> Tuple[List[tuple], List[str]]:
+    """Retorna (linhas da tabela, regressões) para os benchmarks presentes nos dois resultados."""
+    linhas, regressoes = [], []
+    rb, rn = base.get("resultados", {}), novo.get("resultados", {})
+    for nome in sorted(set(rb) & set(rn)):
+        vb, vn = rb[nome].get(metrica), rn[nome].get(metrica)
+        if vb is None or vn is None or vb == 0:
+            continue
+        delta = (vn - vb) / vb * 100
+        pior = -delta if metrica in METRICAS_VAZAO else delta
+        marca = "REGRESSÃO" if pior > limite else ("melhora" if pior < -limite else "")
+        linhas.append((nome, vb, vn, delta, marca))
+        if marca == "REGRESSÃO":
+            regressoes.append(f"{nome}: {metrica} {vb:.3f} -> {vn:.3f} ({delta:+.1f}%)")
+    return linhas, regressoes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compara dois resultados de benchmark.")
+    parser.add_argument("base")
+    parser.add_argument("novo")
+    parser.add_argument("--metrica", default="p50_ms", help="Campo comparado (p50_ms, p95_ms, media_ms, ops_s...)")
+    parser.add_argument("--limite", type=float, default=10.0, help="Piora percentual tolerada")
+    args = parser.parse_args(argv)
+
+    base, novo = carregar(args.base), carregar(args.novo)
+    if base.get("suite") != novo.get("suite"):
+        print(f"Aviso: suítes diferentes ({base.get('suite')} x {novo.get('suite')})")
+    linhas, regressoes = comparar(base, novo, args.metrica, args.limite)
+
+    print(f"base: {base.get('meta', {}).get('commit')}  novo: {novo.get('meta', {}).get('commit')}  métrica: {args.metrica}")
+    print(f"{'benchmark':<55} {'base':>10} {'novo':>10} {'Δ%':>8}")
+    for nome, vb, vn, delta, marca in linhas:
+        print(f"{nome:<55} {vb:10.3f} {vn:10.3f} {delta:+8.1f}  {marca}")
+    for r in regressoes:
+        print(f"REGRESSÃO {r}")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
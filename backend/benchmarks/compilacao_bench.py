@@ -0,0 +1,93 @@
+"""Custo por chamada de montar/compilar as consultas quentes de crud.
+
+Compara, para as mesmas buscas por chave (produto, usuário, pedido pendente da
+mesa, item do carrinho):
+
+- `query`: API legada `db.query(...).filter(...).first()` (como antes);
+- `select`: `select()` 2.0 montado a cada chamada (SQL em cache, mas a
+  construção e a chave de cache são refeitas);
+- `lambda_stmt`: as funções atuais de `backend.crud`;
+- `sem_cache`: `select()` com `compiled_cache=None`, para isolar o custo da
+  compilação em si.
+
+A sessão é reaproveitada e o identity map esvaziado antes de cada chamada
+(fora da medição), então a diferença entre as variantes é montagem +
+compilação do statement.
+
+Usage:
+    python -m backend.benchmarks.compilacao_bench --tamanho pequeno --repeticoes 2000
+"""
+import argparse
+import random
+import sys
+
+from sqlalchemy import select
+
+from backend.benchmarks import comum
+from backend import crud, models
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Custo de montagem/compilação das consultas de crud.")
+    parser.add_argument("--tamanho", default="pequeno", choices=list(comum.TAMANHOS))
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado")
+    args = parser.parse_args(argv)
+
+    engine, Session = comum.sessao_para(comum.banco_semeado(args.tamanho, seed=args.seed))
+    db = Session()
+    produtos = [r[0] for r in db.query(models.Produto.id).all()]
+    usuarios = [r[0] for r in db.query(models.User.id).all()]
+    mesas = [r[0] for r in db.query(models.Mesa.id).all()]
+    rng = random.Random(args.seed)
+    sem_cache = {"compiled_cache": None}
+
+    P, U, Pe, Ci = models.Produto, models.User, models.Pedido, models.CarrinhoItem
+    variantes = {
+        "get_produto": {
+            "query": lambda i: db.query(P).filter(P.id == rng.choice(produtos)).first(),
+            "select": lambda i: db.execute(select(P).where(P.id == rng.choice(produtos))).scalars().first(),
+            "lambda_stmt": lambda i: crud.get_produto(db, rng.choice(produtos)),
+            "sem_cache": lambda i: db.execute(select(P).where(P.id == rng.choice(produtos)),
+                                              execution_options=sem_cache).scalars().first(),
+        },
+        "get_user": {
+            "query": lambda i: db.query(U).filter(U.id == rng.choice(usuarios)).first(),
+            "select": lambda i: db.execute(select(U).where(U.id == rng.choice(usuarios))).scalars().first(),
+            "lambda_stmt": lambda i: crud.get_user(db, rng.choice(usuarios)),
+            "sem_cache": lambda i: db.execute(select(U).where(U.id == rng.choice(usuarios)),
+                                              execution_options=sem_cache).scalars().first(),
+        },
+        "get_pedido_pendente_por_mesa": {
+            "query": lambda i: db.query(Pe).filter(Pe.mesa_id == rng.choice(mesas), Pe.status == "pendente").first(),
+            "select": lambda i: db.execute(select(Pe).where(Pe.mesa_id == rng.choice(mesas), Pe.status == "pendente")
+                                           .limit(1)).scalars().first(),
+            "lambda_stmt": lambda i: crud.get_pedido_pendente_por_mesa(db, rng.choice(mesas)),
+            "sem_cache": lambda i: db.execute(select(Pe).where(Pe.mesa_id == rng.choice(mesas), Pe.status == "pendente")
+                                              .limit(1), execution_options=sem_cache).scalars().first(),
+        },
+        "item_carrinho": {
+            "query": lambda i: db.query(Ci).filter(Ci.carrinho_id == 1, Ci.produto_id == rng.choice(produtos)).first(),
+            "select": lambda i: db.execute(select(Ci).where(Ci.carrinho_id == 1, Ci.produto_id == rng.choice(produtos))
+                                           .limit(1)).scalars().first(),
+            "lambda_stmt": lambda i: crud._item_carrinho(db, 1, rng.choice(produtos)),
+            "sem_cache": lambda i: db.execute(select(Ci).where(Ci.carrinho_id == 1, Ci.produto_id == rng.choice(produtos))
+                                              .limit(1), execution_options=sem_cache).scalars().first(),
+        },
+    }
+
+    resultados = {}
+    for consulta, casos in variantes.items():
+        for nome, fn in casos.items():
+            resultados[f"{args.tamanho}/{consulta}/{nome}"] = comum.medir(fn, args.repeticoes, aquecimento=20,
+                                                                          setup=db.expunge_all)
+    comum.imprimir(resultados)
+    comum.salvar("compilacao", resultados, args.saida, {"repeticoes": args.repeticoes})
+    db.close()
+    engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Utilitários compartilhados pelos benchmarks: bancos semeados, medição e saída JSON."""
+import gc
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+if __package__ in (None, ''):
+    project_root_str = str(pathlib.Path(__file__).resolve().parents[2])
+    if project_root_str not in sys.path:
+        sys.path.insert(0, project_root_str)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.replay import percentil
+
+RAIZ = pathlib.Path(__file__).resolve().parents[2]
+DIR_BENCH = pathlib.Path(os.environ.get("BENCH_DIR", RAIZ / ".bench"))
+
+# Fatores de escala dos bancos semeados (argumentos de gerar_dataset)
+TAMANHOS: Dict[str, Dict[str, int]] = {
+    "pequeno": {"produtos": 100, "usuarios": 200, "mesas": 20, "dias": 30, "pedidos_por_dia": 100},
+    "medio": {"produtos": 500, "usuarios": 2000, "mesas": 40, "dias": 180, "pedidos_por_dia": 500},
+    "grande": {"produtos": 2000, "usuarios": 20000, "mesas": 60, "dias": 365, "pedidos_por_dia": 2000},
+}
+
+# Data fixa para que o mesmo tamanho gere sempre o mesmo banco
+DATA_FINAL = date(2025, 12, 31)
+
+
+def banco_semeado(tamanho: str, seed: int = 42, recriar: bool = False) -> pathlib.Path:
+    """Retorna o caminho de um banco semeado do tamanho pedido, gerando-o se necessário."""
+    from backend import gerar_dataset
+
+    if tamanho not in TAMANHOS:
+        raise ValueError(f"Tamanho desconhecido: {tamanho} (use {', '.join(TAMANHOS)})")
+    DIR_BENCH.mkdir(parents=True, exist_ok=True)
+    caminho = DIR_BENCH / f"{tamanho}-{seed}.db"
+    if caminho.exists() and not recriar:
+        # Banco gerado por uma versão anterior do esquema: tabelas novas e depois as migrações, como no startup
+        from backend import migracoes, models
+        engine = create_engine(f"sqlite:///{caminho}")
+        models.Base.metadata.create_all(bind=engine)
+        migracoes.aplicar(engine)
+        engine.dispose()
+        return caminho
+    for sufixo in ("", "-wal", "-shm"):
+        pathlib.Path(str(caminho) + sufixo).unlink(missing_ok=True)
+    fatores = TAMANHOS[tamanho]
+    argv = [
+        "--database-url", f"sqlite:///{caminho}", "--recriar", "--seed", str(seed),
+        "--data-final", DATA_FINAL.isoformat(),
+    ]
+    for chave, valor in fatores.items():
+        argv += [f"--{chave.replace('_', '-')}", str(valor)]
+    gerar_dataset.main(argv)
+    return caminho
+
+
+def copia_banco(origem: pathlib.Path, nome: str) -> pathlib.Path:
+    """Cópia descartável de um banco semeado (para benchmarks que escrevem)."""
+    import sqlite3
+
+    destino = DIR_BENCH / f"tmp-{nome}.db"
+    for sufixo in ("", "-wal", "-shm"):
+        pathlib.Path(str(destino) + sufixo).unlink(missing_ok=True)
+    src = sqlite3.connect(str(origem))
+    dst = sqlite3.connect(str(destino))
+    with dst:
+        src.backup(dst)
+    src.close()
+    dst.close()
+    return destino
+
+
+def sessao_para(caminho: pathlib.Path):
+    """Cria engine + sessionmaker isolados (mesmas opções de `backend.database`)."""
+    engine = create_engine(f"sqlite:///{caminho}", connect_args={"check_same_thread": False})
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def resumo(amostras_s: List[float]) -> dict:
+    """Estatísticas em milissegundos de uma lista de durações em segundos."""
+    ms = [a * 1000 for a in amostras_s]
+    total = sum(amostras_s)
+    return {
+        "n": len(ms),
+        "media_ms": (sum(ms) / len(ms)) if ms else None,
+        "min_ms": min(ms) if ms else None,
+        "p50_ms": percentil(ms, 50),
+        "p95_ms": percentil(ms, 95),
+        "p99_ms": percentil(ms, 99),
+        "ops_s": (len(ms) / total) if total else None,
+    }
+
+
+def medir(fn: Callable[[int], object], repeticoes: int, aquecimento: int = 3, setup: Optional[Callable[[], None]] = None) -> dict:
+    """Executa `fn(i)` `repeticoes` vezes (após aquecimento) e resume as durações.
+
+    `setup`, quando informado, roda antes de cada chamada e fica fora da medição.
+    """
+    for i in range(aquecimento):
+        if setup:
+            setup()
+        fn(-1 - i)
+    amostras = []
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(repeticoes):
+            if setup:
+                setup()
+            t = time.perf_counter()
+            fn(i)
+            amostras.append(time.perf_counter() - t)
+    finally:
+        if gc_ativo:
+            gc.enable()
+    return resumo(amostras)
+
+
+def _commit_git() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def salvar(suite: str, resultados: dict, saida: Optional[str], extra: Optional[dict] = None) -> dict:
+    """Monta o documento de resultado (com metadados) e grava em `saida` se informado."""
+    doc = {
+        "suite": suite,
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit_git(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            **(extra or {}),
+        },
+        "resultados": resultados,
+    }
+    if saida:
+        with open(saida, "w", encoding="utf-8") as fh:
+            json.dump(doc, fh, indent=2, ensure_ascii=False)
+    return doc
+
+
+def imprimir(resultados: Dict[str, dict]) -> None:
+    print(f"{'benchmark':<55} {'n':>6} {'média ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'ops/s':>10}")
+    for nome, r in resultados.items():
+        def _f(v):
+            return "-" if v is None else f"{v:10.3f}"
+        print(f"{nome:<55} {r['n']:>6} {_f(r['media_ms'])} {_f(r['p50_ms'])} {_f(r['p95_ms'])} "
+              f"{'-' if r.get('ops_s') is None else format(r['ops_s'], '10.1f')}")
@@ -0,0 +1,96 @@
+"""Micro-benchmarks das funções quentes de `backend.crud`.
+
+Cada chamada abre uma sessão nova (como uma requisição faria) sobre uma cópia
+descartável de um banco semeado, para que as escritas não contaminem o banco
+base nem as rodadas seguintes.
+
+Usage:
+    python -m backend.benchmarks.crud_bench --tamanhos pequeno medio --repeticoes 200 --saida crud.json
+"""
+import argparse
+import random
+import sys
+
+from sqlalchemy import func
+
+from backend.benchmarks import comum
+from backend import crud, models, schemas
+
+
+def _ids(Session):
+    with Session() as db:
+        produtos = [r[0] for r in db.query(models.Produto.id).all()]
+        mesas = [r[0] for r in db.query(models.Mesa.id).all()]
+        usuarios = [r[0] for r in db.query(models.User.id).all()]
+        pedidos = db.query(func.count(models.Pedido.id)).scalar()
+    return produtos, mesas, usuarios, pedidos
+
+
+def rodar_tamanho(tamanho: str, repeticoes: int, seed: int) -> dict:
+    base = comum.banco_semeado(tamanho, seed=seed)
+    caminho = comum.copia_banco(base, f"crud-{tamanho}")
+    engine, Session = comum.sessao_para(caminho)
+    produtos, mesas, usuarios, total_pedidos = _ids(Session)
+    rng = random.Random(seed)
+    resultados = {}
+
+    def _get_produtos(_i):
+        with Session() as db:
+            crud.get_produtos(db, skip=rng.randrange(max(1, len(produtos) - 100)), limit=100)
+
+    def _create_pedido(_i):
+        pedido = schemas.PedidoCreate(
+            status="pendente", tipo="online",
+            itens=[{"produto_id": rng.choice(produtos), "quantidade": rng.randint(1, 3)} for _ in range(3)],
+        )
+        with Session() as db:
+            crud.create_pedido(db, pedido=pedido, usuario_id=rng.choice(usuarios))
+
+    def _add_item(_i):
+        with Session() as db:
+            crud.add_item_to_pedido(db, mesa_id=rng.choice(mesas), produto_id=rng.choice(produtos),
+                                    quantidade=1, usuario_id=rng.choice(usuarios))
+
+    def _replace_carrinho(_i):
+        itens = [{"produtoId": rng.choice(produtos), "quantidade": rng.randint(1, 4)} for _ in range(5)]
+        with Session() as db:
+            crud.replace_carrinho_items(db, usuario_id=rng.choice(usuarios), items=itens)
+
+    def _movimentacao(_i):
+        with Session() as db:
+            crud.create_movimentacao_estoque(db, produto_id=rng.choice(produtos), quantidade=1,
+                                             tipo="saida", origem="venda_fisica")
+
+    casos = {
+        "get_produtos": _get_produtos,
+        "create_pedido": _create_pedido,
+        "add_item_to_pedido": _add_item,
+        "replace_carrinho_items": _replace_carrinho,
+        "create_movimentacao_estoque": _movimentacao,
+    }
+    for nome, fn in casos.items():
+        resultados[f"{tamanho}/{nome}"] = comum.medir(fn, repeticoes)
+    engine.dispose()
+    caminho.unlink(missing_ok=True)
+    return resultados, {"produtos": len(produtos), "pedidos": total_pedidos}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks das funções de crud.")
+    parser.add_argument("--tamanhos", nargs="+", default=["pequeno", "medio"], choices=list(comum.TAMANHOS))
+    parser.add_argument("--repeticoes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado")
+    args = parser.parse_args(argv)
+
+    resultados, bancos = {}, {}
+    for tamanho in args.tamanhos:
+        res, bancos[tamanho] = rodar_tamanho(tamanho, args.repeticoes, args.seed)
+        resultados.update(res)
+    comum.imprimir(resultados)
+    comum.salvar("crud", resultados, args.saida, {"bancos": bancos, "repeticoes": args.repeticoes})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
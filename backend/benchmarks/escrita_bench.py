@@ -0,0 +1,117 @@
+"""Escritas por segundo com muitos escritores concorrentes: direto vs. coordenador.
+
+Cada escritor (thread) repete operações do PDV — `add_item_to_pedido` em uma
+mesa aleatória e `create_movimentacao_estoque` — sobre uma cópia do banco
+semeado. No modo `direto` cada operação abre sua sessão e faz seu próprio
+commit, disputando o lock de escrita do SQLite; no modo `coordenador` as
+operações passam pelo `CoordenadorEscrita` (uma thread escritora, group
+commit). Relata operações/s, latência por operação e erros (ex.: "database is
+locked").
+
+Usage:
+    python -m backend.benchmarks.escrita_bench --tamanho pequeno --escritores 50 --operacoes 40
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+from backend.benchmarks import comum
+from backend import crud, models
+from backend.write_coordinator import CoordenadorEscrita
+
+
+def _operacao(rng, mesas, produtos):
+    if rng.random() < 0.7:
+        mesa, produto = rng.choice(mesas), rng.choice(produtos)
+        return lambda db: crud.add_item_to_pedido(db, mesa_id=mesa, produto_id=produto, quantidade=1, usuario_id=1)
+    produto = rng.choice(produtos)
+    return lambda db: crud.create_movimentacao_estoque(db, produto_id=produto, quantidade=1, tipo="saida",
+                                                       origem="venda_fisica")
+
+
+def rodar(modo: str, tamanho: str, escritores: int, operacoes: int, seed: int) -> dict:
+    base = comum.banco_semeado(tamanho, seed=seed)
+    caminho = comum.copia_banco(base, f"escrita-{modo}")
+    engine, Session = comum.sessao_para(caminho)
+    with Session() as db:
+        mesas = [r[0] for r in db.query(models.Mesa.id).all()]
+        produtos = [r[0] for r in db.query(models.Produto.id).all()]
+
+    coordenador = None
+    if modo == "coordenador":
+        coordenador = CoordenadorEscrita(engine)
+        coordenador.iniciar()
+
+    latencias, erros = [], []
+    lock = threading.Lock()
+    largada = threading.Barrier(escritores + 1)
+
+    def escritor(indice: int):
+        rng = random.Random(seed * 1000 + indice)
+        largada.wait()
+        for _ in range(operacoes):
+            fn = _operacao(rng, mesas, produtos)
+            t = time.perf_counter()
+            try:
+                if coordenador is not None:
+                    coordenador.executar(fn)
+                else:
+                    with Session() as db:
+                        fn(db)
+            except Exception as e:
+                with lock:
+                    erros.append(type(e).__name__ + ": " + str(e).splitlines()[0][:120])
+                continue
+            with lock:
+                latencias.append(time.perf_counter() - t)
+
+    threads = [threading.Thread(target=escritor, args=(i,)) for i in range(escritores)]
+    for th in threads:
+        th.start()
+    largada.wait()
+    inicio = time.perf_counter()
+    for th in threads:
+        th.join()
+    duracao = time.perf_counter() - inicio
+
+    if coordenador is not None:
+        coordenador.parar()
+    engine.dispose()
+    caminho.unlink(missing_ok=True)
+
+    resultado = comum.resumo(latencias)
+    resultado["ops_s"] = len(latencias) / duracao if duracao else None
+    resultado["erros"] = len(erros)
+    resultado["exemplos_erro"] = sorted(set(erros))[:5]
+    if coordenador is not None:
+        resultado["commits"] = coordenador.lotes
+        resultado["lotes_refeitos"] = coordenador.lotes_refeitos
+    return resultado
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Escritas/s com escritores concorrentes (direto vs. coordenador).")
+    parser.add_argument("--tamanho", default="pequeno", choices=list(comum.TAMANHOS))
+    parser.add_argument("--escritores", type=int, default=50)
+    parser.add_argument("--operacoes", type=int, default=40, help="Operações por escritor")
+    parser.add_argument("--modos", nargs="+", default=["direto", "coordenador"], choices=["direto", "coordenador"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado")
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for modo in args.modos:
+        resultados[f"{args.tamanho}/{args.escritores}x/{modo}"] = rodar(modo, args.tamanho, args.escritores,
+                                                                        args.operacoes, args.seed)
+    comum.imprimir(resultados)
+    for nome, r in resultados.items():
+        extra = f", commits={r['commits']}" if "commits" in r else ""
+        print(f"{nome}: erros={r['erros']}{extra} {r['exemplos_erro'] or ''}")
+    comum.salvar("escrita", resultados, args.saida, {"escritores": args.escritores, "operacoes": args.operacoes})
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Bytes por linha das listagens: entidades ORM vs. projeções de `read_models`.
+
+Para cada listagem mede, com tracemalloc, a memória retida pelo resultado
+(incluindo identity map e relacionamentos carregados para a resposta) dividida
+pelo número de linhas, e também o pico durante a consulta. O caminho ORM
+acessa os mesmos relacionamentos que a serialização acessaria
+(`Produto.categoria`, `Pedido.itens`).
+
+Usage:
+    python -m backend.benchmarks.memoria_bench --tamanho medio --linhas 1000 --saida memoria.json
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from backend.benchmarks import comum
+from backend import crud, read_models
+
+
+def _medir(Session, fn) -> dict:
+    gc.collect()
+    db = Session()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    inicio, _ = tracemalloc.get_traced_memory()
+    linhas = fn(db)
+    gc.collect()
+    atual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = len(linhas)
+    del linhas
+    db.close()
+    return {
+        "linhas": n,
+        "bytes_retidos": atual - inicio,
+        "bytes_por_linha": round((atual - inicio) / n, 1) if n else None,
+        "pico_bytes": pico - inicio,
+    }
+
+
+def _orm_produtos(limite):
+    def fn(db):
+        produtos = crud.get_produtos(db, limit=limite)
+        for p in produtos:
+            p.categoria
+        return produtos
+    return fn
+
+
+def _orm_pedidos(limite):
+    def fn(db):
+        pedidos = crud.get_pedidos(db, limit=limite)
+        for p in pedidos:
+            p.itens
+        return pedidos
+    return fn
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Memória por linha: ORM vs. read models.")
+    parser.add_argument("--tamanho", default="pequeno", choices=list(comum.TAMANHOS))
+    parser.add_argument("--linhas", type=int, default=1000, help="Tamanho da página consultada")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado")
+    args = parser.parse_args(argv)
+
+    engine, Session = comum.sessao_para(comum.banco_semeado(args.tamanho, seed=args.seed))
+    limite = args.linhas
+    casos = {
+        "produtos/orm": _orm_produtos(limite),
+        "produtos/read_model": lambda db: read_models.listar_produtos(db, limit=limite),
+        "pedidos/orm": _orm_pedidos(limite),
+        "pedidos/read_model": lambda db: read_models.listar_pedidos(db, limit=limite),
+        "usuarios/orm": lambda db: crud.get_users(db, limit=limite),
+        "usuarios/read_model": lambda db: read_models.listar_usuarios(db, limit=limite),
+    }
+    # Uma rodada de aquecimento para que caches de compilação não entrem na conta
+    for fn in casos.values():
+        _medir(Session, fn)
+    resultados = {nome: _medir(Session, fn) for nome, fn in casos.items()}
+
+    print(f"{'listagem':<25} {'linhas':>7} {'bytes/linha':>12} {'retidos':>12} {'pico':>12}")
+    for nome, r in resultados.items():
+        print(f"{nome:<25} {r['linhas']:>7} {r['bytes_por_linha'] or 0:>12.1f} {r['bytes_retidos']:>12} {r['pico_bytes']:>12}")
+    comum.salvar("memoria", resultados, args.saida, {"tamanho": args.tamanho, "linhas": limite})
+    engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
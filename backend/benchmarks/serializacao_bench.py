@@ -0,0 +1,85 @@
+"""Tempo de CPU para serializar 1.000 pedidos (com itens) em JSON.
+
+Compara o caminho padrão do FastAPI com `response_model` (validação +
+`dump_python(mode="json")` + `json.dumps` no JSONResponse) com o caminho de
+`backend.serializacao` (TypeAdapter pré-construído + `dump_json` no
+pydantic-core) e, se o orjson estiver instalado, com a `RespostaJSON`.
+Os pedidos são carregados uma vez com `selectinload`, então só a serialização
+entra na medição. Os tempos são de CPU (`time.process_time`) normalizados por
+1.000 pedidos.
+
+Usage:
+    python -m backend.benchmarks.serializacao_bench --tamanho pequeno --pedidos 1000 --repeticoes 30
+"""
+import argparse
+import gc
+import sys
+import time
+
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import selectinload
+
+from backend.benchmarks import comum
+from backend import models, serializacao
+
+
+def _medir_cpu(fn, repeticoes: int, fator: float, aquecimento: int = 3) -> dict:
+    for _ in range(aquecimento):
+        fn()
+    amostras = []
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeticoes):
+            t = time.process_time()
+            fn()
+            amostras.append((time.process_time() - t) * fator)
+    finally:
+        if gc_ativo:
+            gc.enable()
+    return comum.resumo(amostras)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="CPU por 1.000 pedidos serializados.")
+    parser.add_argument("--tamanho", default="pequeno", choices=list(comum.TAMANHOS))
+    parser.add_argument("--pedidos", type=int, default=1000, help="Pedidos por lote serializado")
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado")
+    args = parser.parse_args(argv)
+
+    engine, Session = comum.sessao_para(comum.banco_semeado(args.tamanho, seed=args.seed))
+    db = Session()
+    pedidos = (
+        db.query(models.Pedido).options(selectinload(models.Pedido.itens))
+        .order_by(models.Pedido.id).limit(args.pedidos).all()
+    )
+    itens = sum(len(p.itens) for p in pedidos)
+    fator = 1000.0 / len(pedidos)
+    adaptador = serializacao.ADAPTADOR_PEDIDOS
+
+    def _fastapi_padrao():
+        JSONResponse(adaptador.dump_python(adaptador.validate_python(pedidos, from_attributes=True), mode="json"))
+
+    def _type_adapter():
+        serializacao.responder_lista(adaptador, pedidos)
+
+    casos = {"response_model+json": _fastapi_padrao, "typeadapter.dump_json": _type_adapter}
+    if serializacao.ORJSON_DISPONIVEL:
+        def _orjson():
+            serializacao.RespostaJSON(adaptador.dump_python(adaptador.validate_python(pedidos, from_attributes=True), mode="json"))
+        casos["response_model+orjson"] = _orjson
+
+    resultados = {f"{args.tamanho}/{nome}": _medir_cpu(fn, args.repeticoes, fator) for nome, fn in casos.items()}
+    print(f"{len(pedidos)} pedidos, {itens} itens; tempos de CPU por 1.000 pedidos")
+    comum.imprimir(resultados)
+    comum.salvar("serializacao", resultados, args.saida,
+                 {"pedidos": len(pedidos), "itens": itens, "orjson": serializacao.ORJSON_DISPONIVEL})
+    db.close()
+    engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
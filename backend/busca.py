@@ -0,0 +1,188 @@
+"""Busca textual de produtos (SQLite FTS5) sem diferenciar acentos.
+
+O índice `produtos_fts` (tabela virtual FTS5, rowid = id do produto) guarda
+`nome`, `descricao` e `codigo` já normalizados: sem acentos, pela mesma
+`models.remover_acentos` usada em `gerar_slug`, e em minúsculas. A consulta
+passa pela mesma normalização, então "pao" encontra "Pão" e vice-versa. Cada
+termo vira um prefixo ("cho" → `"cho"*`) e todos precisam aparecer. A
+ordenação usa bm25, com peso maior para `nome` e `codigo` do que para
+`descricao`.
+
+O índice é mantido por eventos de mapper do `Produto` (after_insert,
+after_update, after_delete), na mesma conexão e transação da escrita. No
+startup ele é criado se não existir e reconstruído se o número de linhas não
+bater com o de produtos. UPDATE em massa ou SQL cru fora do ORM deixam o
+índice defasado; nesse caso rode `python -m backend.busca --reindexar`.
+
+Em bancos sem FTS5 (ou fora do SQLite) a busca cai em LIKE sobre os campos
+originais, sem ranking e sem ignorar acentos.
+"""
+import argparse
+import re
+import sys
+from typing import List, Optional
+
+from sqlalchemy import column, event, func, inspect, literal_column, or_, table, text
+from sqlalchemy.orm import Session
+
+from backend import models, read_models
+from backend.logging_config import logger
+
+# Pesos do bm25 na ordem das colunas do índice: nome, descricao, codigo
+PESOS = (10.0, 1.0, 5.0)
+MAX_TERMOS = 8
+CAMPOS = ("nome", "descricao", "codigo")
+
+_TABELA_FTS = table("produtos_fts", column("rowid"))
+
+_fts_ativo = False
+
+
+def normalizar(texto: Optional[str]) -> str:
+    return models.remover_acentos(texto or "").lower()
+
+
+def termos(q: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", normalizar(q))[:MAX_TERMOS]
+
+
+def expressao_fts(q: str) -> str:
+    """'Pão de quei' -> '"pao"* "de"* "quei"*' (todos os termos, por prefixo)."""
+    return " ".join(f'"{t}"*' for t in termos(q))
+
+
+# --- manutenção do índice ---
+
+def _fts5_disponivel(conn) -> bool:
+    try:
+        return bool(conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+    except Exception:
+        return False
+
+
+def _valores(produto_id: int, nome, descricao, codigo) -> dict:
+    return {"id": produto_id, "nome": normalizar(nome), "descricao": normalizar(descricao),
+            "codigo": normalizar(codigo)}
+
+
+_INSERIR = text("INSERT INTO produtos_fts(rowid, nome, descricao, codigo) VALUES (:id, :nome, :descricao, :codigo)")
+_REMOVER = text("DELETE FROM produtos_fts WHERE rowid = :id")
+
+
+def reindexar(conn) -> int:
+    """Reconstrói o índice inteiro a partir de `produtos`; devolve o número de linhas."""
+    linhas = conn.execute(text("SELECT id, nome, descricao, codigo FROM produtos")).all()
+    conn.execute(text("DELETE FROM produtos_fts"))
+    if linhas:
+        conn.execute(_INSERIR, [_valores(*linha) for linha in linhas])
+    return len(linhas)
+
+
+def criar_indice(engine) -> bool:
+    """Cria `produtos_fts` se possível e o reconstrói quando estiver defasado."""
+    global _fts_ativo
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        if not _fts5_disponivel(conn):
+            logger.warning("SQLite sem FTS5: /produtos/search usará LIKE")
+            return False
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(nome, descricao, codigo)"
+        )
+        indexados = conn.exec_driver_sql("SELECT count(*) FROM produtos_fts").scalar()
+        produtos = conn.exec_driver_sql("SELECT count(*) FROM produtos").scalar()
+        if indexados != produtos:
+            logger.info("Reindexando busca de produtos (%d no índice, %d produtos)", indexados, produtos)
+            reindexar(conn)
+    _fts_ativo = True
+    return True
+
+
+def _apos_inserir(_mapper, conn, produto) -> None:
+    if _fts_ativo:
+        conn.execute(_INSERIR, _valores(produto.id, produto.nome, produto.descricao, produto.codigo))
+
+
+def _apos_atualizar(_mapper, conn, produto) -> None:
+    if not _fts_ativo:
+        return
+    estado = inspect(produto)
+    if not any(estado.attrs[c].history.has_changes() for c in CAMPOS):
+        return
+    conn.execute(_REMOVER, {"id": produto.id})
+    conn.execute(_INSERIR, _valores(produto.id, produto.nome, produto.descricao, produto.codigo))
+
+
+def _apos_remover(_mapper, conn, produto) -> None:
+    if _fts_ativo:
+        conn.execute(_REMOVER, {"id": produto.id})
+
+
+event.listen(models.Produto, "after_insert", _apos_inserir)
+event.listen(models.Produto, "after_update", _apos_atualizar)
+event.listen(models.Produto, "after_delete", _apos_remover)
+
+
+# --- consulta ---
+
+def buscar_produtos(
+    db: Session,
+    q: str,
+    categoria_id: Optional[int] = None,
+    empresa_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 20,
+) -> List[dict]:
+    """Produtos que casam com `q`, mais relevantes primeiro, no formato de `schemas.Produto`."""
+    produto = models.Produto
+    stmt = read_models.select_produtos()
+    if _fts_ativo:
+        expressao = expressao_fts(q)
+        if not expressao:
+            return []
+        fts = literal_column("produtos_fts")
+        stmt = (
+            stmt.join(_TABELA_FTS, _TABELA_FTS.c.rowid == produto.id)
+            .where(fts.op("MATCH")(expressao))
+            .order_by(func.bm25(fts, *PESOS), produto.id)
+        )
+    else:
+        palavras = [p for p in q.split() if p][:MAX_TERMOS]
+        if not palavras:
+            return []
+        for palavra in palavras:
+            padrao = f"%{palavra}%"
+            stmt = stmt.where(or_(produto.nome.ilike(padrao), produto.descricao.ilike(padrao),
+                                  produto.codigo.ilike(padrao)))
+        stmt = stmt.order_by(produto.nome, produto.id)
+    if categoria_id is not None:
+        stmt = stmt.where(produto.categoria_id == categoria_id)
+    if empresa_id is not None:
+        stmt = stmt.where(produto.empresa_id == empresa_id)
+    return [read_models.produto_de_linha(linha) for linha in db.execute(stmt.offset(skip).limit(limit))]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Índice de busca de produtos (FTS5).")
+    parser.add_argument("--reindexar", action="store_true", help="Reconstrói o índice a partir da tabela produtos")
+    parser.add_argument("--buscar", default=None, help="Executa uma busca e imprime os resultados")
+    args = parser.parse_args(argv)
+
+    from backend.database import SessionLocal, engine
+
+    if not criar_indice(engine):
+        print("FTS5 indisponível neste banco")
+        return 1
+    if args.reindexar:
+        with engine.begin() as conn:
+            print(f"{reindexar(conn)} produtos indexados")
+    if args.buscar:
+        with SessionLocal() as db:
+            for p in buscar_produtos(db, args.buscar):
+                print(f"{p['id']:>6}  {p['codigo']:<12} {p['nome']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""Captura opcional de tráfego real em arquivos JSONL rotativos.
+
+Ativada por variável de ambiente (desligada por padrão):
+
+    CAPTURE_REQUESTS=true        liga a captura
+    CAPTURE_SAMPLE_RATE=0.1      fração das requisições gravadas (padrão 1.0)
+    CAPTURE_DIR=capturas         diretório dos arquivos (padrão ./capturas)
+    CAPTURE_MAX_BYTES=52428800   tamanho máximo de cada arquivo antes de rotacionar
+    CAPTURE_MAX_FILES=20         quantidade de arquivos mantidos (os mais antigos são apagados)
+    CAPTURE_MAX_BODY=65536       bytes do corpo gravados por requisição
+    CAPTURE_SESSION=false        grava o cookie `session` (só para replay em cópia do banco)
+    CAPTURE_AUTH=false           grava também as rotas /auth/*
+
+Cada linha contém método, caminho, query, rota (template), corpo, status e
+duração. A escrita em disco acontece em uma thread separada para não
+adicionar latência às requisições. Os arquivos são consumidos por
+`backend/replay.py`.
+
+Os arquivos não guardam credenciais por padrão. O cookie de sessão (que
+identifica o usuário e permitiria se passar por ele) só é gravado com
+CAPTURE_SESSION=true. Headers além do Content-Type nunca são gravados, o que
+exclui Cookie e Authorization. Campos de corpo JSON ou de formulário com nomes
+como `password`, `senha`, `token` ou `secret` são trocados por "***". As
+rotas de login/logout ficam de fora.
+"""
+import base64
+import json
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from fastapi import Request
+
+from backend.logging_config import logger
+
+
+def _env_bool(nome: str, padrao: bool = False) -> bool:
+    return os.environ.get(nome, str(padrao)).lower() in ("1", "true", "yes", "sim")
+
+
+CAPTURE_ENABLED = _env_bool("CAPTURE_REQUESTS")
+CAPTURE_SAMPLE_RATE = float(os.environ.get("CAPTURE_SAMPLE_RATE", "1.0"))
+CAPTURE_DIR = os.environ.get("CAPTURE_DIR", "capturas")
+CAPTURE_MAX_BYTES = int(os.environ.get("CAPTURE_MAX_BYTES", str(50 * 1024 * 1024)))
+CAPTURE_MAX_FILES = int(os.environ.get("CAPTURE_MAX_FILES", "20"))
+CAPTURE_MAX_BODY = int(os.environ.get("CAPTURE_MAX_BODY", "65536"))
+CAPTURE_SESSION = _env_bool("CAPTURE_SESSION")
+CAPTURE_AUTH = _env_bool("CAPTURE_AUTH")
+
+# Caminhos que não fazem sentido reproduzir
+CAMINHOS_IGNORADOS = ("/docs", "/openapi.json", "/redoc", "/favicon.ico")
+# Caminhos cujo corpo é essencialmente credencial
+CAMINHOS_AUTH = ("/auth/",)
+# Trechos de nomes de campo cujo valor é mascarado
+CAMPOS_SENSIVEIS = ("password", "senha", "token", "secret", "authorization", "cookie", "cvv")
+MASCARA = "***"
+
+
+class GravadorCaptura:
+    """Grava registros em JSONL a partir de uma fila, rotacionando por tamanho."""
+
+    def __init__(self, diretorio: str, max_bytes: int, max_arquivos: int):
+        self.diretorio = Path(diretorio)
+        self.max_bytes = max_bytes
+        self.max_arquivos = max_arquivos
+        self._fila: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=10000)
+        self._arquivo = None
+        self._tamanho = 0
+        self._descartados = 0
+        self._thread = threading.Thread(target=self._loop, name="captura-writer", daemon=True)
+        self._thread.start()
+
+    def registrar(self, registro: dict) -> None:
+        try:
+            self._fila.put_nowait(registro)
+        except queue.Full:
+            # Nunca bloquear a requisição por causa da captura
+            self._descartados += 1
+
+    def fechar(self) -> None:
+        self._fila.put(None)
+        self._thread.join(timeout=5)
+
+    def _abrir_novo(self) -> None:
+        if self._arquivo is not None:
+            self._arquivo.close()
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        nome = f"captura-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl"
+        self._arquivo = open(self.diretorio / nome, "a", encoding="utf-8")
+        self._tamanho = 0
+        arquivos = sorted(self.diretorio.glob("captura-*.jsonl"), key=lambda p: p.stat().st_mtime)
+        for antigo in arquivos[:-self.max_arquivos]:
+            try:
+                antigo.unlink()
+            except OSError:
+                pass
+
+    def _loop(self) -> None:
+        while True:
+            registro = self._fila.get()
+            if registro is None:
+                break
+            try:
+                if self._arquivo is None or self._tamanho >= self.max_bytes:
+                    self._abrir_novo()
+                linha = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+                self._arquivo.write(linha)
+                self._tamanho += len(linha)
+                if self._fila.empty():
+                    self._arquivo.flush()
+            except Exception:
+                logger.exception("Erro ao gravar captura de requisição")
+        if self._arquivo is not None:
+            self._arquivo.close()
+
+
+_gravador: Optional[GravadorCaptura] = None
+
+
+def _get_gravador() -> GravadorCaptura:
+    global _gravador
+    if _gravador is None:
+        _gravador = GravadorCaptura(CAPTURE_DIR, CAPTURE_MAX_BYTES, CAPTURE_MAX_FILES)
+    return _gravador
+
+
+def _sensivel(campo) -> bool:
+    nome = str(campo).lower()
+    return any(trecho in nome for trecho in CAMPOS_SENSIVEIS)
+
+
+def _mascarar(valor):
+    if isinstance(valor, dict):
+        return {k: MASCARA if _sensivel(k) else _mascarar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_mascarar(v) for v in valor]
+    return valor
+
+
+def _redigir_corpo(corpo: bytes, content_type: Optional[str]) -> bytes:
+    """Corpo com os campos sensíveis mascarados; corpo que não dá para inspecionar e cita um deles é descartado."""
+    if not corpo:
+        return corpo
+    tipo = (content_type or "").split(";")[0].strip().lower()
+    try:
+        if tipo == "application/x-www-form-urlencoded":
+            pares = parse_qsl(corpo.decode("utf-8"), keep_blank_values=True)
+            return urlencode([(k, MASCARA if _sensivel(k) else v) for k, v in pares]).encode("utf-8")
+        return json.dumps(_mascarar(json.loads(corpo)), ensure_ascii=False).encode("utf-8")
+    except (UnicodeDecodeError, ValueError):
+        texto = corpo.decode("utf-8", errors="ignore").lower()
+        return b"" if any(trecho in texto for trecho in CAMPOS_SENSIVEIS) else corpo
+
+
+def _serializar_corpo(corpo: bytes) -> dict:
+    truncado = len(corpo) > CAPTURE_MAX_BODY
+    corpo = corpo[:CAPTURE_MAX_BODY]
+    try:
+        return {"body": corpo.decode("utf-8"), "body_b64": False, "body_truncated": truncado}
+    except UnicodeDecodeError:
+        return {"body": base64.b64encode(corpo).decode("ascii"), "body_b64": True, "body_truncated": truncado}
+
+
+async def capturar_requisicoes(request: Request, call_next):
+    """Middleware HTTP que grava uma amostra das requisições para replay."""
+    path = request.url.path
+    if path.startswith(CAMINHOS_IGNORADOS) or (path.startswith(CAMINHOS_AUTH) and not CAPTURE_AUTH) \
+            or random.random() >= CAPTURE_SAMPLE_RATE:
+        return await call_next(request)
+
+    ts = time.time()
+    inicio = time.perf_counter()
+    corpo = await request.body() if request.method in ("POST", "PUT", "PATCH", "DELETE") else b""
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        registro = {
+            "ts": ts,
+            "method": request.method,
+            "path": path,
+            "query": request.url.query,
+            "route": getattr(route, "path", None),
+            "content_type": request.headers.get("content-type"),
+            "session": request.cookies.get("session") if CAPTURE_SESSION else None,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - inicio) * 1000, 3),
+        }
+        registro.update(_serializar_corpo(_redigir_corpo(corpo, request.headers.get("content-type"))))
+        _get_gravador().registrar(registro)
+
+
+def fechar() -> None:
+    """Esvazia a fila e fecha o arquivo atual (chamado no shutdown)."""
+    global _gravador
+    if _gravador is not None:
+        _gravador.fechar()
+        _gravador = None
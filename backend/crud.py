@@ -1,16 +1,22 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import delete, func, lambda_stmt, select
 from typing import List, Optional, Dict, Any
-from . import models, schemas
+from . import favoritos, models, schemas
 from datetime import datetime
 import re
 
+# Consultas quentes usam lambda_stmt: a construção do statement e a chave de
+# cache são calculadas uma vez por local de chamada, e os valores capturados
+# (ids, emails) viram parâmetros do SQL compilado em cache no engine.
+def _primeiro(db: Session, stmt):
+    return db.execute(stmt).scalars().first()
+
 # User
 def get_user(db: Session, user_id: int) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return _primeiro(db, lambda_stmt(lambda: select(models.User).where(models.User.id == user_id)))
 
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.email == email).first()
+    return _primeiro(db, lambda_stmt(lambda: select(models.User).where(models.User.email == email).limit(1)))
 
 def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.username == username).first()
@@ -47,7 +53,7 @@ def create_categoria(db: Session, categoria: schemas.CategoriaCreate) -> models.
 
 # Produto
 def get_produto(db: Session, produto_id: int) -> Optional[models.Produto]:
-    return db.query(models.Produto).filter(models.Produto.id == produto_id).first()
+    return _primeiro(db, lambda_stmt(lambda: select(models.Produto).where(models.Produto.id == produto_id)))
 
 def get_produto_by_codigo(db: Session, codigo: str) -> Optional[models.Produto]:
     return db.query(models.Produto).filter(models.Produto.codigo == codigo).first()
@@ -85,7 +91,7 @@ def create_mesa(db: Session, mesa: schemas.MesaCreate) -> models.Mesa:
     return db_mesa
 
 def get_mesa(db: Session, mesa_id: int) -> Optional[models.Mesa]:
-    return db.query(models.Mesa).filter(models.Mesa.id == mesa_id).first()
+    return _primeiro(db, lambda_stmt(lambda: select(models.Mesa).where(models.Mesa.id == mesa_id)))
 
 def get_mesa_by_slug(db: Session, slug: str) -> Optional[models.Mesa]:
     return db.query(models.Mesa).filter(models.Mesa.slug == slug).first()
@@ -152,7 +158,7 @@ def create_pedido(db: Session, pedido: schemas.PedidoCreate, usuario_id: int) ->
     # Adicionar itens
     total = 0
     for item in pedido.itens:
-        produto = db.query(models.Produto).filter(models.Produto.id == item["produto_id"]).first()
+        produto = get_produto(db, item["produto_id"])
         if produto:
             pedido_item = models.PedidoItem(
                 pedido_id=db_pedido.id,
@@ -177,7 +183,7 @@ def create_pedido(db: Session, pedido: schemas.PedidoCreate, usuario_id: int) ->
     return db_pedido
 
 def get_pedido(db: Session, pedido_id: int) -> Optional[models.Pedido]:
-    return db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
+    return _primeiro(db, lambda_stmt(lambda: select(models.Pedido).where(models.Pedido.id == pedido_id)))
 
 def get_pedidos(
     db: Session, 
@@ -191,10 +197,10 @@ def get_pedidos(
     return query.offset(skip).limit(limit).all()
 
 def get_pedido_pendente_por_mesa(db: Session, mesa_id: int) -> Optional[models.Pedido]:
-    return db.query(models.Pedido).filter(
+    return _primeiro(db, lambda_stmt(lambda: select(models.Pedido).where(
         models.Pedido.mesa_id == mesa_id,
         models.Pedido.status == "pendente"
-    ).first()
+    ).limit(1)))
 
 
 def add_item_to_pedido(
@@ -247,7 +253,7 @@ def add_item_to_pedido(
         db.flush()
 
         # Atualizar o status da mesa para 'ocupada' e atribuir usuario_responsavel_id se fornecido
-        db_mesa = db.query(models.Mesa).filter(models.Mesa.id == mesa_id).first()
+        db_mesa = get_mesa(db, mesa_id)
         if db_mesa:
             try:
                 if db_mesa.status != 'ocupada':
@@ -260,7 +266,7 @@ def add_item_to_pedido(
                 pass
 
     # Obter produto
-    produto = db.query(models.Produto).filter(models.Produto.id == produto_id).first()
+    produto = get_produto(db, produto_id)
     if not produto:
         raise Exception(f"Produto {produto_id} não encontrado")
 
@@ -282,7 +288,8 @@ def add_item_to_pedido(
 
     # Recalcular total
     total = 0
-    for it in db.query(models.PedidoItem).filter(models.PedidoItem.pedido_id == pedido.id).all():
+    pedido_id = pedido.id
+    for it in db.execute(lambda_stmt(lambda: select(models.PedidoItem).where(models.PedidoItem.pedido_id == pedido_id))).scalars():
         total += float(it.subtotal or 0)
     pedido.total = total
     db.add(pedido)
@@ -374,6 +381,15 @@ def create_avaliacao(
         comentario=comentario
     )
     db.add(db_aval)
+    # Agregados no produto: incrementos em SQL (rating_count = rating_count + 1), na mesma transação
+    db_produto = get_produto(db, produto_id)
+    if db_produto is not None:
+        P = models.Produto
+        db_produto.rating_count = P.rating_count + 1
+        db_produto.rating_sum = P.rating_sum + rating
+        if 1 <= rating <= 5:
+            coluna = f"rating_{rating}"
+            setattr(db_produto, coluna, getattr(P, coluna) + 1)
     db.commit()
     db.refresh(db_aval)
     return db_aval
@@ -383,30 +399,44 @@ def get_avaliacoes_produto(db: Session, produto_id: int) -> List[models.Avaliaca
 
 # Favorito
 def create_favorito(db: Session, usuario_id: int, produto_id: int) -> models.Favorito:
-    db_fav = models.Favorito(usuario_id=usuario_id, produto_id=produto_id)
-    db.add(db_fav)
+    """Marca o favorito; repetir a chamada não cria outra linha (upsert sem conflito)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+    db.execute(
+        insert_dialeto(models.Favorito)
+        .values(usuario_id=usuario_id, produto_id=produto_id)
+        .on_conflict_do_nothing(index_elements=["usuario_id", "produto_id"])
+    )
     db.commit()
-    db.refresh(db_fav)
-    return db_fav
+    favoritos.adicionado(usuario_id, produto_id)
+    return _primeiro(db, select(models.Favorito).where(
+        models.Favorito.usuario_id == usuario_id, models.Favorito.produto_id == produto_id))
 
 def get_favoritos_usuario(db: Session, usuario_id: int) -> List[models.Favorito]:
     return db.query(models.Favorito).filter(models.Favorito.usuario_id == usuario_id).all()
 
 def remove_favorito(db: Session, usuario_id: int, produto_id: int) -> bool:
-    db_fav = db.query(models.Favorito).filter(
+    removidos = db.execute(delete(models.Favorito).where(
         models.Favorito.usuario_id == usuario_id,
         models.Favorito.produto_id == produto_id
-    ).first()
-    if db_fav:
-        db.delete(db_fav)
-        db.commit()
-        return True
-    return False
+    )).rowcount
+    db.commit()
+    favoritos.removido(usuario_id, produto_id)
+    return removidos > 0
 
 
 # Carrinho
 def get_carrinho_por_usuario(db: Session, usuario_id: int) -> Optional[models.Carrinho]:
-    return db.query(models.Carrinho).filter(models.Carrinho.usuario_id == usuario_id).first()
+    return _primeiro(db, lambda_stmt(lambda: select(models.Carrinho).where(models.Carrinho.usuario_id == usuario_id).limit(1)))
+
+
+def _item_carrinho(db: Session, carrinho_id: int, produto_id: int) -> Optional[models.CarrinhoItem]:
+    return _primeiro(db, lambda_stmt(lambda: select(models.CarrinhoItem).where(
+        models.CarrinhoItem.carrinho_id == carrinho_id,
+        models.CarrinhoItem.produto_id == produto_id
+    ).limit(1)))
 
 
 def create_carrinho_for_user(db: Session, usuario_id: int) -> models.Carrinho:
@@ -441,7 +471,7 @@ def replace_carrinho_items(db: Session, usuario_id: int, items: List[Dict[str, A
         quantidade = itm.get('quantidade') or itm.get('qtd') or itm.get('qty') or 1
         if pid is None:
             continue
-        produto = db.query(models.Produto).filter(models.Produto.id == int(pid)).first()
+        produto = get_produto(db, int(pid))
         if not produto:
             continue
         ci = models.CarrinhoItem(
@@ -463,8 +493,8 @@ def add_item_to_carrinho(db: Session, usuario_id: int, produto_id: int, quantida
         cart = create_carrinho_for_user(db, usuario_id=usuario_id)
 
     # verificar item existente
-    item = db.query(models.CarrinhoItem).filter(models.CarrinhoItem.carrinho_id == cart.id, models.CarrinhoItem.produto_id == produto_id).first()
-    produto = db.query(models.Produto).filter(models.Produto.id == produto_id).first()
+    item = _item_carrinho(db, cart.id, produto_id)
+    produto = get_produto(db, produto_id)
     if not produto:
         raise Exception(f"Produto {produto_id} não encontrado")
 
@@ -489,7 +519,7 @@ def remove_item_from_carrinho(db: Session, usuario_id: int, produto_id: int) ->
     cart = get_carrinho_por_usuario(db, usuario_id=usuario_id)
     if cart is None:
         return False
-    item = db.query(models.CarrinhoItem).filter(models.CarrinhoItem.carrinho_id == cart.id, models.CarrinhoItem.produto_id == produto_id).first()
+    item = _item_carrinho(db, cart.id, produto_id)
     if not item:
         return False
     db.delete(item)
@@ -0,0 +1,92 @@
+"""Resumo do salão e das vendas do dia para o painel dos gerentes.
+
+`GET /dashboard/resumo` junta em uma resposta:
+
+    mesas            quantidade por status e taxa de ocupação
+    comandasAbertas  pedidos de mesa ainda não fechados nem cancelados e seu total
+    vendasHoje       pedidos, itens e receita do dia, lidos de `vendas_por_dia`
+    maisVendidos     produtos com maior receita no dia (`vendas.ranking`)
+    estoqueBaixo     produtos marcados com `estoque_baixo`
+
+Vários painéis abertos consultam a rota ao mesmo tempo. O resumo fica pronto,
+em bytes JSON, por DASHBOARD_TTL_S segundos em um `CacheLocal` com carga única:
+quando ele expira, só uma requisição recalcula e as simultâneas esperam o
+resultado dela. Escritas em pedidos, itens e mesas (domínio `salao`) descartam o
+resumo na hora, em qualquer worker. As vendas do dia vêm dos rollups, que o job
+`vendas.rollup_pedido` atualiza logo depois do fechamento; o estoque baixo muda
+com o catálogo. Esses dois aparecem no máximo DASHBOARD_TTL_S depois.
+"""
+import os
+from datetime import timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from backend import invalidacao, jobs, models, serializacao, tarefas, vendas
+
+TTL_S = float(os.environ.get("DASHBOARD_TTL_S", "5"))
+MAIS_VENDIDOS = int(os.environ.get("DASHBOARD_MAIS_VENDIDOS", "5"))
+STATUS_CANCELADOS = {"cancelado", "cancelada"}
+
+cache = invalidacao.CacheLocal("dashboard", ("salao",), ttl_s=TTL_S, max_itens=1, carga_unica=True)
+
+
+def _mesas(db: Session) -> dict:
+    mesa = models.Mesa
+    por_status = {
+        (status or "").strip().lower() or "sem_status": n
+        for status, n in db.execute(select(mesa.status, func.count()).group_by(mesa.status))
+    }
+    total = sum(por_status.values())
+    ocupadas = por_status.get("ocupada", 0)
+    return {"total": total, "ocupadas": ocupadas, "porStatus": por_status,
+            "taxaOcupacao": round(ocupadas / total, 4) if total else 0.0}
+
+
+def _comandas_abertas(db: Session) -> dict:
+    pedido = models.Pedido
+    pedidos, mesas, total = db.execute(
+        select(func.count(), func.count(pedido.mesa_id.distinct()), func.coalesce(func.sum(pedido.total), 0))
+        .where(pedido.mesa_id.is_not(None),
+               func.lower(func.trim(func.coalesce(pedido.status, ""))).not_in(
+                   sorted(tarefas.STATUS_FECHADOS | STATUS_CANCELADOS)))
+    ).one()
+    return {"pedidos": pedidos, "mesas": mesas, "total": round(float(total), 2)}
+
+
+def _vendas_hoje(db: Session) -> tuple:
+    hoje = vendas.intervalo_atual("dia")
+    amanha = hoje + timedelta(days=1)
+    linhas = vendas.serie(db, "dia", "total", hoje, amanha)
+    dia = {"data": hoje.date().isoformat(), "pedidos": 0, "itens": 0, "receita": 0.0}
+    if linhas:
+        dia.update(pedidos=linhas[0]["pedidos"], itens=linhas[0]["itens"], receita=float(linhas[0]["receita"]))
+    ranking = vendas.ranking(db, "produto", hoje, amanha, limite=MAIS_VENDIDOS)
+    ids = [r["chave"] for r in ranking if r["chave"] is not None]
+    produto = models.Produto
+    nomes = dict(db.execute(select(produto.id, produto.nome).where(produto.id.in_(ids))).all()) if ids else {}
+    mais_vendidos = [
+        {"produtoId": r["chave"], "nome": nomes.get(r["chave"]), "itens": r["itens"], "receita": float(r["receita"])}
+        for r in ranking
+    ]
+    return dia, mais_vendidos
+
+
+def calcular(db: Session) -> dict:
+    vendas_hoje, mais_vendidos = _vendas_hoje(db)
+    estoque_baixo = db.execute(
+        select(func.count()).select_from(models.Produto).where(models.Produto.estoque_baixo.is_(True))
+    ).scalar()
+    return {
+        "geradoEm": jobs.agora().isoformat(),
+        "mesas": _mesas(db),
+        "comandasAbertas": _comandas_abertas(db),
+        "vendasHoje": vendas_hoje,
+        "maisVendidos": mais_vendidos,
+        "estoqueBaixo": estoque_baixo or 0,
+    }
+
+
+def resumo_json(db: Session) -> bytes:
+    """Bytes JSON do resumo, recalculado por uma única requisição quando o cache expira."""
+    return cache.obter("resumo", lambda: serializacao.RespostaJSON(calcular(db)).body)
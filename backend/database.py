@@ -6,10 +6,17 @@ import os
 # Configuração do banco de dados
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///bancodados.db")
 
+# Entradas do cache de SQL compilado. A app tem algumas centenas de statements
+# distintos (veja `sqlalchemy_compiled_cache_entries` em /metrics e
+# /admin/query-plans); o padrão do SQLAlchemy (500) fica justo com as variações
+# de paginação e filtros, então sobra folga aqui.
+QUERY_CACHE_SIZE = int(os.getenv("SQLALCHEMY_QUERY_CACHE_SIZE", "1200"))
+
 # Criar engine do SQLAlchemy
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Necessário apenas para SQLite
+    connect_args={"check_same_thread": False},  # Necessário apenas para SQLite
+    query_cache_size=QUERY_CACHE_SIZE,
 )
 
 # Criar classe de sessão
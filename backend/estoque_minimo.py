@@ -0,0 +1,114 @@
+"""Estoque mínimo por produto e alertas de estoque baixo.
+
+O limite de um produto é `Produto.estoque_minimo` ou, se ele for nulo,
+`Empresa.estoque_minimo_padrao` da empresa do produto. Sem nenhum dos dois o
+produto não é acompanhado. A coluna indexada `Produto.estoque_baixo`
+(estoque <= limite) é recalculada por eventos de mapper sempre que o estoque,
+o limite ou a empresa do produto mudam, por qualquer caminho do ORM
+(movimentações, baixa de pedidos, PUT do produto). `GET /estoque/baixo` lê só
+os produtos marcados, pelo índice.
+
+Quando a marcação muda, o evento grava na mesma transação uma linha no outbox
+(`entidade = "alerta_estoque"`, operação `baixo` ou `normalizado`), que chega
+aos consumidores de `GET /changes` sem varredura. Mudar o padrão de uma
+empresa recalcula a marcação dos produtos dela que usam o padrão, sem gerar
+alertas.
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from backend import models, outbox
+from backend.logging_config import logger
+
+LIMITE_MAXIMO = 1000
+_CAMPOS = ("estoque", "estoque_minimo", "empresa_id")
+
+
+def limite_efetivo(conn, produto) -> Optional[int]:
+    if produto.estoque_minimo is not None:
+        return int(produto.estoque_minimo)
+    if produto.empresa_id is None:
+        return None
+    return conn.execute(
+        select(models.Empresa.estoque_minimo_padrao).where(models.Empresa.id == produto.empresa_id)
+    ).scalar()
+
+
+def _recalcular(conn, produto) -> Tuple[bool, Optional[int]]:
+    """Atualiza `estoque_baixo`; devolve (mudou, limite)."""
+    limite = limite_efetivo(conn, produto)
+    baixo = limite is not None and int(produto.estoque or 0) <= limite
+    if baixo == bool(produto.estoque_baixo):
+        return False, limite
+    # Atributo de coluna da própria linha: ainda entra no INSERT/UPDATE em curso
+    produto.estoque_baixo = baixo
+    return True, limite
+
+
+def _alertar(conn, produto, limite: Optional[int]) -> None:
+    operacao = "baixo" if produto.estoque_baixo else "normalizado"
+    logger.info("Estoque %s: produto %s (%s) com %s, mínimo %s", operacao, produto.id, produto.nome,
+                produto.estoque, limite)
+    outbox.registrar(conn, "alerta_estoque", produto.id, operacao, {
+        "nome": produto.nome, "codigo": produto.codigo, "estoque": produto.estoque,
+        "estoque_minimo": limite, "empresa_id": produto.empresa_id,
+    })
+
+
+def _antes_inserir(_mapper, conn, produto) -> None:
+    _recalcular(conn, produto)
+
+
+def _apos_inserir(_mapper, conn, produto) -> None:
+    # O id só existe depois do INSERT
+    if produto.estoque_baixo:
+        _alertar(conn, produto, limite_efetivo(conn, produto))
+
+
+def _antes_atualizar(_mapper, conn, produto) -> None:
+    if not any(inspect(produto).attrs[c].history.has_changes() for c in _CAMPOS):
+        return
+    mudou, limite = _recalcular(conn, produto)
+    if mudou:
+        _alertar(conn, produto, limite)
+
+
+def _apos_atualizar_empresa(_mapper, conn, empresa) -> None:
+    if not inspect(empresa).attrs.estoque_minimo_padrao.history.has_changes():
+        return
+    tabela = models.Produto.__table__
+    padrao = empresa.estoque_minimo_padrao
+    baixo = False if padrao is None else case((func.coalesce(tabela.c.estoque, 0) <= padrao, True), else_=False)
+    conn.execute(
+        update(tabela)
+        .where(tabela.c.empresa_id == empresa.id, tabela.c.estoque_minimo.is_(None))
+        .values(estoque_baixo=baixo)
+    )
+
+
+event.listen(models.Produto, "before_insert", _antes_inserir)
+event.listen(models.Produto, "after_insert", _apos_inserir)
+event.listen(models.Produto, "before_update", _antes_atualizar)
+event.listen(models.Empresa, "after_update", _apos_atualizar_empresa)
+
+
+def listar_baixo(db: Session, empresa_id: Optional[int] = None, limite: int = 200) -> List[dict]:
+    """Produtos com estoque no mínimo ou abaixo, os mais críticos primeiro (usa ix_produtos_estoque_baixo)."""
+    produto, empresa = models.Produto, models.Empresa
+    minimo = func.coalesce(produto.estoque_minimo, empresa.estoque_minimo_padrao)
+    stmt = (
+        select(produto.id, produto.codigo, produto.nome, produto.estoque, minimo, produto.empresa_id)
+        .outerjoin(empresa, empresa.id == produto.empresa_id)
+        .where(produto.estoque_baixo.is_(True))
+        .order_by(produto.estoque, produto.id)
+        .limit(max(1, min(int(limite), LIMITE_MAXIMO)))
+    )
+    if empresa_id is not None:
+        stmt = stmt.where(produto.empresa_id == empresa_id)
+    return [
+        {"produtoId": pid, "codigo": codigo, "nome": nome, "estoque": estoque, "estoqueMinimo": minimo_efetivo,
+         "empresaId": eid, "falta": max(0, (minimo_efetivo or 0) - (estoque or 0))}
+        for pid, codigo, nome, estoque, minimo_efetivo, eid in db.execute(stmt)
+    ]
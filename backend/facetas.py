@@ -0,0 +1,151 @@
+"""Filtros e contagens por faceta do catálogo (`GET /produtos/?facets=true`).
+
+As contagens saem de um "cubo" montado com uma única consulta agrupada por
+(categoria, empresa, disponível, em estoque, preço de venda). Ele tem no
+máximo uma linha por combinação distinta, bem menos que o número de produtos
+num catálogo real. O cubo fica no cache do catálogo (`invalidacao.cache_catalogo`)
+e só é refeito quando o catálogo muda, em qualquer worker. Trocar de filtro
+não vai ao banco para as contagens.
+
+A contagem de cada faceta aplica todos os filtros menos o da própria faceta.
+Assim, com `categoria_id=2` selecionado, a faceta de categoria ainda mostra
+quantos produtos as outras categorias teriam, e as demais facetas refletem só
+a categoria 2.
+
+    FACETAS_FAIXAS_PRECO="0,10,20,30,50,100"   limites das faixas de preço
+"""
+import os
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.orm import Session
+
+from backend import invalidacao, models
+
+FAIXAS_PRECO = [Decimal(v) for v in os.environ.get("FACETAS_FAIXAS_PRECO", "0,10,20,30,50,100").split(",") if v.strip()]
+
+# Índices das colunas de cada célula do cubo
+_CATEGORIA, _EMPRESA, _DISPONIVEL, _EM_ESTOQUE, _PRECO, _QTD = range(6)
+
+def condicoes(filtros: Dict[str, object]) -> list:
+    """Cláusulas WHERE de `Produto` para os filtros informados (valores None são ignorados)."""
+    p = models.Produto
+    clausulas = []
+    if filtros.get("categoria_id") is not None:
+        clausulas.append(p.categoria_id == filtros["categoria_id"])
+    if filtros.get("empresa_id") is not None:
+        clausulas.append(p.empresa_id == filtros["empresa_id"])
+    if filtros.get("disponivel") is not None:
+        clausulas.append(func.coalesce(p.disponivel, True) == filtros["disponivel"])
+    if filtros.get("preco_min") is not None:
+        clausulas.append(p.preco_venda >= filtros["preco_min"])
+    if filtros.get("preco_max") is not None:
+        clausulas.append(p.preco_venda <= filtros["preco_max"])
+    if filtros.get("em_estoque") is True:
+        clausulas.append(p.estoque > 0)
+    elif filtros.get("em_estoque") is False:
+        clausulas.append(or_(p.estoque.is_(None), p.estoque <= 0))
+    return clausulas
+
+
+def _montar_cubo(db: Session) -> dict:
+    p = models.Produto
+    em_estoque = case((func.coalesce(p.estoque, 0) > 0, True), else_=False)
+    disponivel = func.coalesce(p.disponivel, True)
+    celulas = [
+        (cat, emp, bool(disp), bool(estoque), Decimal(str(preco)) if preco is not None else None, qtd)
+        for cat, emp, disp, estoque, preco, qtd in db.execute(
+            select(p.categoria_id, p.empresa_id, disponivel, em_estoque, p.preco_venda, func.count())
+            .group_by(p.categoria_id, p.empresa_id, disponivel, em_estoque, p.preco_venda)
+        )
+    ]
+    categorias = dict(db.execute(select(models.Categoria.id, models.Categoria.nome)).all())
+    empresas = dict(db.execute(select(models.Empresa.id, models.Empresa.nome)).all())
+    return {"celulas": celulas, "categorias": categorias, "empresas": empresas}
+
+
+def cubo(db: Session) -> dict:
+    return invalidacao.cache_catalogo.obter(("facetas-cubo",), lambda: _montar_cubo(db))
+
+
+def _casa(celula: tuple, filtros: Dict[str, object], ignorar: Optional[str] = None) -> bool:
+    if ignorar != "categoria_id" and filtros.get("categoria_id") is not None \
+            and celula[_CATEGORIA] != filtros["categoria_id"]:
+        return False
+    if ignorar != "empresa_id" and filtros.get("empresa_id") is not None \
+            and celula[_EMPRESA] != filtros["empresa_id"]:
+        return False
+    if ignorar != "disponivel" and filtros.get("disponivel") is not None \
+            and celula[_DISPONIVEL] != filtros["disponivel"]:
+        return False
+    if ignorar != "em_estoque" and filtros.get("em_estoque") is not None \
+            and celula[_EM_ESTOQUE] != filtros["em_estoque"]:
+        return False
+    if ignorar != "preco":
+        preco = celula[_PRECO]
+        if filtros.get("preco_min") is not None and (preco is None or preco < filtros["preco_min"]):
+            return False
+        if filtros.get("preco_max") is not None and (preco is None or preco > filtros["preco_max"]):
+            return False
+    return True
+
+
+def _faixa(preco: Optional[Decimal]) -> Optional[int]:
+    """Índice da faixa de preço (a última é aberta); None abaixo da primeira ou sem preço."""
+    if preco is None or not FAIXAS_PRECO or preco < FAIXAS_PRECO[0]:
+        return None
+    for i in range(len(FAIXAS_PRECO) - 1, -1, -1):
+        if preco >= FAIXAS_PRECO[i]:
+            return i
+    return None
+
+
+def contar(dados: dict, filtros: Dict[str, object]) -> dict:
+    """Total que casa com os filtros e contagens de cada faceta."""
+    celulas = dados["celulas"]
+    filtros = dict(filtros)
+    for chave in ("preco_min", "preco_max"):
+        if filtros.get(chave) is not None:
+            filtros[chave] = Decimal(str(filtros[chave]))
+    total = sum(c[_QTD] for c in celulas if _casa(c, filtros))
+
+    def _por(indice: int, ignorar: str) -> Dict[object, int]:
+        contagens: Dict[object, int] = {}
+        for c in celulas:
+            if _casa(c, filtros, ignorar):
+                contagens[c[indice]] = contagens.get(c[indice], 0) + c[_QTD]
+        return contagens
+
+    por_categoria = _por(_CATEGORIA, "categoria_id")
+    por_empresa = _por(_EMPRESA, "empresa_id")
+    por_disponivel = _por(_DISPONIVEL, "disponivel")
+    por_estoque = _por(_EM_ESTOQUE, "em_estoque")
+    por_faixa: Dict[int, int] = {}
+    for c in celulas:
+        if _casa(c, filtros, "preco"):
+            faixa = _faixa(c[_PRECO])
+            if faixa is not None:
+                por_faixa[faixa] = por_faixa.get(faixa, 0) + c[_QTD]
+
+    def _lista(contagens: Dict[object, int], nomes: Dict[int, str]) -> List[dict]:
+        return sorted(
+            ({"id": k, "nome": nomes.get(k), "total": v} for k, v in contagens.items()),
+            key=lambda f: (-f["total"], f["nome"] or ""),
+        )
+
+    faixas = []
+    for i, minimo in enumerate(FAIXAS_PRECO):
+        maximo = FAIXAS_PRECO[i + 1] if i + 1 < len(FAIXAS_PRECO) else None
+        faixas.append({"min": str(minimo), "max": str(maximo) if maximo is not None else None,
+                       "total": por_faixa.get(i, 0)})
+    return {
+        "total": total,
+        "facetas": {
+            "categoria": _lista(por_categoria, dados["categorias"]),
+            "empresa": _lista(por_empresa, dados["empresas"]),
+            "disponivel": {"true": por_disponivel.get(True, 0), "false": por_disponivel.get(False, 0)},
+            "emEstoque": {"true": por_estoque.get(True, 0), "false": por_estoque.get(False, 0)},
+            "faixaPreco": faixas,
+        },
+    }
@@ -0,0 +1,74 @@
+"""Conjunto de produtos favoritos por usuário, em memória.
+
+`GET /produtos/` marca `isFavorito` nos produtos do usuário da sessão sem
+consultar `favoritos` a cada requisição. O conjunto de ids de cada usuário é
+carregado uma vez, e `crud.create_favorito`/`crud.remove_favorito` o atualizam
+depois do commit. Escritas de outros workers chegam pelo domínio `favoritos`
+de `backend/invalidacao.py` e descartam os conjuntos, que são recarregados na
+próxima consulta.
+
+    FAVORITOS_MAX_USUARIOS=5000   usuários mantidos em memória (os mais antigos saem)
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import FrozenSet
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend import invalidacao, models
+
+MAX_USUARIOS = int(os.environ.get("FAVORITOS_MAX_USUARIOS", "5000"))
+
+_conjuntos: "OrderedDict[int, FrozenSet[int]]" = OrderedDict()
+_geracao = 0
+_lock = threading.Lock()
+
+
+def do_usuario(db: Session, usuario_id: int) -> FrozenSet[int]:
+    """Ids dos produtos favoritos de `usuario_id`."""
+    with _lock:
+        ids = _conjuntos.get(usuario_id)
+        if ids is not None:
+            _conjuntos.move_to_end(usuario_id)
+            return ids
+        geracao = _geracao
+    fav = models.Favorito
+    ids = frozenset(db.execute(select(fav.produto_id).where(fav.usuario_id == usuario_id)).scalars())
+    with _lock:
+        # Uma invalidação durante a carga torna o valor suspeito: não guardar
+        if invalidacao.ATIVO and _geracao == geracao:
+            _conjuntos[usuario_id] = ids
+            if len(_conjuntos) > MAX_USUARIOS:
+                _conjuntos.popitem(last=False)
+    return ids
+
+
+def _alterar(usuario_id: int, produto_id: int, favorito: bool) -> None:
+    global _geracao
+    with _lock:
+        _geracao += 1
+        ids = _conjuntos.get(usuario_id)
+        if ids is None:
+            return
+        _conjuntos[usuario_id] = ids | {produto_id} if favorito else ids - {produto_id}
+
+
+def adicionado(usuario_id: int, produto_id: int) -> None:
+    """Chamado depois do commit de um favorito novo (ou já existente)."""
+    _alterar(usuario_id, produto_id, True)
+
+
+def removido(usuario_id: int, produto_id: int) -> None:
+    _alterar(usuario_id, produto_id, False)
+
+
+def limpar() -> None:
+    global _geracao
+    with _lock:
+        _conjuntos.clear()
+        _geracao += 1
+
+
+invalidacao.ao_invalidar("favoritos", limpar, somente_remoto=True)
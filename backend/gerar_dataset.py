@@ -0,0 +1,406 @@
+"""Gerador determinístico de massa de dados para testes de carga e benchmarks.
+
+Diferente de `populate_db_sqlalchemy.py` (poucos registros, commit por linha),
+este script gera anos de `pedidos`, milhões de `pedido_itens` e
+`movimentacoes_estoque` com inserção em lote (executemany) em transações
+grandes. A geração é determinística: a mesma `--seed` e os mesmos fatores de
+escala produzem exatamente o mesmo banco, independentemente de `--workers`.
+
+Distribuições usadas:
+- horário do pedido segue o movimento típico de uma choperia (almoço discreto,
+  pico entre 19h e 23h) e sextas/sábados têm mais pedidos;
+- popularidade dos produtos segue uma lei de Zipf (poucos chopes vendem muito).
+
+Usage:
+    python backend/gerar_dataset.py --database-url sqlite:///carga.db --recriar \
+        --produtos 2000 --usuarios 20000 --mesas 60 --dias 730 --pedidos-por-dia 3000
+
+Todos os usuários gerados usam a senha `carga123`.
+"""
+import argparse
+import math
+import os
+import pathlib
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+# Permite execução direta (python backend/gerar_dataset.py) sem configurar PYTHONPATH
+if __package__ is None or __package__ == '':
+    project_root_str = str(pathlib.Path(__file__).resolve().parents[1])
+    if project_root_str not in sys.path:
+        sys.path.insert(0, project_root_str)
+
+import bcrypt
+from sqlalchemy import create_engine, event, text
+
+from backend.database import Base
+from backend import models
+from backend.logging_config import logger
+from backend.populate_db_sqlalchemy import DEFAULT_CATEGORIES
+
+# Peso relativo de pedidos por hora do dia (0h..23h)
+PESOS_HORA = [
+    6, 3, 1, 0, 0, 0, 0, 0, 0, 0, 1, 4,
+    10, 12, 6, 3, 3, 6, 14, 24, 30, 32, 26, 14,
+]
+
+# Fator multiplicador por dia da semana (segunda=0 .. domingo=6)
+FATOR_DIA_SEMANA = [0.6, 0.7, 0.8, 1.0, 1.6, 1.8, 1.1]
+
+ESTILOS = [
+    "Pilsen", "IPA", "Weiss", "Stout", "Red Ale", "APA", "Lager", "Porter",
+    "Session IPA", "Witbier", "Sour", "Bock", "Tripel", "Dubbel", "Saison",
+]
+PRATOS = [
+    "Batata Frita", "Tábua de Frios", "Isca de Peixe", "Pastel", "Nachos",
+    "Bolinho de Bacalhau", "Anéis de Cebola", "Tapioca", "Pizza", "Hambúrguer",
+    "Caldo", "Coxinha", "Torresmo", "Frango a Passarinho", "Mandioca Frita",
+]
+BEBIDAS = ["Refrigerante", "Água Mineral", "Suco", "Energético", "Água Tônica"]
+NOMES = [
+    "Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor",
+    "Isabela", "João", "Karina", "Lucas", "Mariana", "Nicolas", "Olívia",
+    "Paulo", "Renata", "Sérgio", "Tatiane", "Vinícius",
+]
+
+SENHA_PADRAO = "carga123"
+FORMATO_DATA = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _sql_insert(tabela: str, colunas: list) -> str:
+    return f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' for _ in colunas)})"
+
+
+COLS_PEDIDO = ["id", "numero", "tipo", "status", "total", "observacoes", "mesa_id", "usuario_id", "created_at"]
+COLS_ITEM = ["pedido_id", "produto_id", "quantidade", "preco_unitario", "subtotal", "created_at"]
+COLS_MOV = ["produto_id", "quantidade", "quantidade_anterior", "quantidade_nova", "tipo", "origem", "observacoes", "usuario_id", "created_at"]
+COLS_PAG = ["pedido_id", "valor", "forma_pagamento", "status", "created_at"]
+
+
+def _rng(seed: int, *partes) -> random.Random:
+    """Gerador independente por (seed, partes): torna cada dia reprodutível isoladamente."""
+    return random.Random(":".join(str(p) for p in (seed,) + partes))
+
+
+def _pesos_zipf(n: int, s: float, seed: int) -> list:
+    """Pesos acumulados de Zipf sobre os produtos, com ranking embaralhado pela seed."""
+    ranking = list(range(n))
+    _rng(seed, "zipf").shuffle(ranking)
+    pesos = [0.0] * n
+    for posicao, idx in enumerate(ranking):
+        pesos[idx] = 1.0 / math.pow(posicao + 1, s)
+    acumulado = []
+    total = 0.0
+    for p in pesos:
+        total += p
+        acumulado.append(total)
+    return acumulado
+
+
+def planejar_dias(args) -> list:
+    """Calcula quantos pedidos cada dia terá e o id inicial dos pedidos do dia.
+
+    Feito no processo principal (barato) para que os workers possam gerar os
+    dias em paralelo com ids de pedido já definidos, sem coordenação.
+    """
+    plano = []
+    proximo_id = args.pedido_id_inicial
+    inicio = args.data_final - timedelta(days=args.dias - 1)
+    for i in range(args.dias):
+        dia = inicio + timedelta(days=i)
+        rng = _rng(args.seed, "volume", dia.isoformat())
+        fator = FATOR_DIA_SEMANA[dia.weekday()] * rng.uniform(0.85, 1.15)
+        quantidade = max(0, int(round(args.pedidos_por_dia * fator)))
+        plano.append((dia, proximo_id, quantidade))
+        proximo_id += quantidade
+    return plano
+
+
+def gerar_dia(contexto: dict, dia: date, primeiro_id: int, quantidade: int):
+    """Gera as linhas de um dia: pedidos, itens, movimentações e pagamentos."""
+    rng = _rng(contexto["seed"], "dia", dia.isoformat())
+    produtos = contexto["produtos"]  # lista de (id, preco_venda)
+    acumulado = contexto["pesos_produtos"]
+    mesas = contexto["mesas"]
+    usuarios_online = contexto["usuarios_online"]
+    usuarios_fisica = contexto["usuarios_fisica"]
+    itens_por_pedido = contexto["itens_por_pedido"]
+    ultimo_dia = dia >= contexto["data_final"]
+    horas = list(range(24))
+
+    pedidos, itens, movs, pagamentos = [], [], [], []
+    horarios = rng.choices(horas, weights=PESOS_HORA, k=quantidade)
+    horarios.sort()
+    for n, hora in enumerate(horarios):
+        pedido_id = primeiro_id + n
+        criado = datetime(dia.year, dia.month, dia.day, hora, rng.randrange(60), rng.randrange(60), rng.randrange(1000000))
+        criado_str = criado.strftime(FORMATO_DATA)
+        online = rng.random() < contexto["fracao_online"]
+        if online:
+            tipo, origem, mesa_id = "online", "venda_online", None
+            usuario_id = rng.choice(usuarios_online)
+        else:
+            tipo, origem, mesa_id = "fisica", "venda_fisica", rng.choice(mesas)
+            usuario_id = rng.choice(usuarios_fisica)
+
+        if ultimo_dia and hora >= 18 and rng.random() < 0.3:
+            status = "pendente"
+        else:
+            status = "cancelado" if rng.random() < 0.04 else "entregue"
+
+        # quantidade de linhas distintas no pedido (geométrica com média ~itens_por_pedido)
+        linhas = 1
+        while linhas < 30 and rng.random() > 1.0 / itens_por_pedido:
+            linhas += 1
+        escolhidos = rng.choices(produtos, cum_weights=acumulado, k=linhas)
+        total = 0.0
+        for produto_id, preco in escolhidos:
+            qtd = rng.choices((1, 2, 3, 4), weights=(70, 20, 7, 3))[0]
+            subtotal = round(qtd * preco, 2)
+            total += subtotal
+            itens.append((pedido_id, produto_id, qtd, preco, subtotal, criado_str))
+            if status != "cancelado":
+                movs.append((produto_id, qtd, None, None, "saida", origem, f"Pedido {pedido_id}", usuario_id, criado_str))
+
+        pedidos.append((pedido_id, str(pedido_id).zfill(2), tipo, status, round(total, 2), None, mesa_id, usuario_id, criado_str))
+        if status == "entregue":
+            forma = "pix" if online else rng.choice(("dinheiro", "credito", "debito", "pix"))
+            pagamentos.append((pedido_id, round(total, 2), forma, "aprovado", criado_str))
+
+    # reposição semanal (segundas): uma entrada por produto
+    if dia.weekday() == 0:
+        reposicao = datetime(dia.year, dia.month, dia.day, 9, 0, 0).strftime(FORMATO_DATA)
+        for produto_id, _preco in produtos:
+            movs.append((produto_id, rng.randint(50, 400), None, None, "entrada", "compra", "Reposição semanal", None, reposicao))
+
+    return pedidos, itens, movs, pagamentos
+
+
+def _gerar_bloco(contexto: dict, bloco: list):
+    """Gera um bloco de dias (executado em worker quando --workers > 1)."""
+    pedidos, itens, movs, pagamentos = [], [], [], []
+    for dia, primeiro_id, quantidade in bloco:
+        p, i, m, g = gerar_dia(contexto, dia, primeiro_id, quantidade)
+        pedidos.extend(p)
+        itens.extend(i)
+        movs.extend(m)
+        pagamentos.extend(g)
+    return pedidos, itens, movs, pagamentos
+
+
+def _configurar_carga(engine):
+    """PRAGMAs de carga em massa: sem fsync por commit e cache maior."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=OFF")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA cache_size=-262144")
+        cur.close()
+
+
+def criar_cadastros(conn, args) -> dict:
+    """Insere categorias, empresas, usuários, mesas e produtos; retorna o contexto de geração."""
+    rng = _rng(args.seed, "cadastros")
+    inicio = (args.data_final - timedelta(days=args.dias)).strftime(FORMATO_DATA)
+
+    categorias = {}
+    for nome in DEFAULT_CATEGORIES:
+        row = conn.execute(text("SELECT id FROM categorias WHERE nome = :n"), {"n": nome}).first()
+        if row is None:
+            row = conn.execute(
+                text("INSERT INTO categorias (nome, descricao, created_at) VALUES (:n, :d, :c) RETURNING id"),
+                {"n": nome, "d": f"Categoria {nome}", "c": inicio},
+            ).first()
+        categorias[nome] = row[0]
+
+    base_empresa = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM empresas")).scalar()
+    empresas = []
+    for i in range(args.empresas):
+        eid = base_empresa + i + 1
+        nome = f"Choperia Carga {eid:03d}"
+        conn.exec_driver_sql(
+            _sql_insert("empresas", ["id", "nome", "cnpj", "email", "telefone", "endereco", "created_at", "slug"]),
+            (eid, nome, f"{eid:014d}", f"empresa{eid}@carga.example.com", "11999990000", f"Rua da Carga, {eid}", inicio, models.gerar_slug(nome)),
+        )
+        empresas.append(eid)
+
+    # bcrypt é caro: um único hash reaproveitado para todos os usuários gerados
+    senha = bcrypt.hashpw(SENHA_PADRAO.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode("utf-8")
+    base_user = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM usuarios")).scalar()
+    usuarios, online, fisica = [], [], []
+    for i in range(args.usuarios):
+        uid = base_user + i + 1
+        tipo = "fisica" if i < max(1, args.usuarios // 20) else "online"
+        nome = f"{rng.choice(NOMES)} {uid}"
+        usuarios.append((uid, f"carga{uid}", f"carga{uid}@carga.example.com", nome, senha, tipo, 1, inicio))
+        (fisica if tipo == "fisica" else online).append(uid)
+    conn.exec_driver_sql(
+        _sql_insert("usuarios", ["id", "username", "email", "nome", "password", "tipo", "ativo", "created_at"]),
+        usuarios,
+    )
+
+    base_mesa = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM mesas")).scalar()
+    mesas = []
+    linhas_mesa = []
+    for i in range(args.mesas):
+        mid = base_mesa + i + 1
+        nome = f"Carga {mid:03d}"
+        linhas_mesa.append((mid, nome, "livre", rng.choice((2, 4, 4, 6, 8)), None, None, models.gerar_slug(nome), inicio))
+        mesas.append(mid)
+    conn.exec_driver_sql(
+        _sql_insert("mesas", ["id", "nome", "status", "capacidade", "observacoes", "usuario_responsavel_id", "slug", "created_at"]),
+        linhas_mesa,
+    )
+
+    base_prod = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM produtos")).scalar()
+    produtos, linhas_prod = [], []
+    for i in range(args.produtos):
+        pid = base_prod + i + 1
+        grupo = rng.random()
+        if grupo < 0.5:
+            nome, categoria = f"Chopp {rng.choice(ESTILOS)} {pid}", "CERVEJA"
+            venda = round(rng.uniform(9.9, 24.9), 2)
+        elif grupo < 0.85:
+            nome, categoria = f"{rng.choice(PRATOS)} {pid}", rng.choice(("COMIDA", "LANCHE", "PIZZA", "TAPIOCA"))
+            venda = round(rng.uniform(14.9, 79.9), 2)
+        else:
+            nome, categoria = f"{rng.choice(BEBIDAS)} {pid}", rng.choice(("BEBIDA", "SUCO"))
+            venda = round(rng.uniform(4.9, 12.9), 2)
+        custo = round(venda * rng.uniform(0.4, 0.7), 2)
+        linhas_prod.append((
+            pid, f"GEN-{pid:06d}", nome, f"Produto gerado {pid}", custo, venda, categorias[categoria],
+            rng.choice(empresas) if empresas else None, rng.randint(0, 500), 1 if rng.random() < 0.95 else 0,
+            None, models.gerar_slug(nome), inicio,
+        ))
+        produtos.append((pid, venda))
+    conn.exec_driver_sql(
+        _sql_insert("produtos", ["id", "codigo", "nome", "descricao", "preco_compra", "preco_venda", "categoria_id",
+                                 "empresa_id", "estoque", "disponivel", "imagem", "slug", "created_at"]),
+        linhas_prod,
+    )
+    logger.info("Cadastros gerados: %d empresas, %d usuários, %d mesas, %d produtos",
+                len(empresas), len(usuarios), len(mesas), len(produtos))
+
+    return {
+        "seed": args.seed,
+        "produtos": produtos,
+        "pesos_produtos": _pesos_zipf(len(produtos), args.zipf, args.seed),
+        "mesas": mesas,
+        "usuarios_online": online or fisica,
+        "usuarios_fisica": fisica,
+        "itens_por_pedido": max(1.0, args.itens_por_pedido),
+        "fracao_online": args.fracao_online,
+        "data_final": args.data_final,
+    }
+
+
+def _blocos(plano: list, dias_por_bloco: int):
+    for i in range(0, len(plano), dias_por_bloco):
+        yield plano[i:i + dias_por_bloco]
+
+
+def gerar(args) -> dict:
+    """Executa a geração completa e retorna a contagem de linhas inseridas por tabela."""
+    engine = create_engine(args.database_url)
+    _configurar_carga(engine)
+    if args.recriar:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    contagem = {"pedidos": 0, "pedido_itens": 0, "movimentacoes_estoque": 0, "pagamentos": 0}
+    inicio = time.perf_counter()
+    with engine.begin() as conn:
+        contexto = criar_cadastros(conn, args)
+        args.pedido_id_inicial = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM pedidos")).scalar() + 1
+
+    plano = planejar_dias(args)
+    blocos = list(_blocos(plano, args.dias_por_bloco))
+    sql = {
+        "pedidos": _sql_insert("pedidos", COLS_PEDIDO),
+        "pedido_itens": _sql_insert("pedido_itens", COLS_ITEM),
+        "movimentacoes_estoque": _sql_insert("movimentacoes_estoque", COLS_MOV),
+        "pagamentos": _sql_insert("pagamentos", COLS_PAG),
+    }
+
+    def _gravar(resultado):
+        # Uma transação por bloco: milhares de linhas por commit
+        with engine.begin() as conn:
+            for tabela, linhas in zip(("pedidos", "pedido_itens", "movimentacoes_estoque", "pagamentos"), resultado):
+                if linhas:
+                    conn.exec_driver_sql(sql[tabela], linhas)
+                    contagem[tabela] += len(linhas)
+        total = sum(contagem.values())
+        logger.info("Gravadas %d linhas (%.0f linhas/s)", total, total / max(time.perf_counter() - inicio, 1e-9))
+
+    if args.workers > 1:
+        # Workers só geram as linhas; a gravação continua sequencial (SQLite tem um único escritor)
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for resultado in pool.map(_gerar_bloco, [contexto] * len(blocos), blocos):
+                _gravar(resultado)
+    else:
+        for bloco in blocos:
+            _gravar(_gerar_bloco(contexto, bloco))
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+    duracao = time.perf_counter() - inicio
+    logger.info("Dataset gerado em %.1fs: %s", duracao, contagem)
+    return contagem
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um banco de carga determinístico para benchmarks.")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL_CARGA", "sqlite:///bancodados_carga.db"),
+                        help="URL do banco de destino (padrão: sqlite:///bancodados_carga.db)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente da geração (mesma seed = mesmo banco)")
+    parser.add_argument("--recriar", action="store_true", help="Apaga e recria todas as tabelas antes de gerar")
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument("--mesas", type=int, default=40)
+    parser.add_argument("--empresas", type=int, default=3)
+    parser.add_argument("--dias", type=int, default=365, help="Quantidade de dias de histórico")
+    parser.add_argument("--pedidos-por-dia", type=int, default=800, help="Média de pedidos por dia (antes do fator do dia da semana)")
+    parser.add_argument("--itens-por-pedido", type=float, default=3.0, help="Média de linhas por pedido")
+    parser.add_argument("--fracao-online", type=float, default=0.3, help="Fração de pedidos online (0..1)")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Expoente de Zipf da popularidade dos produtos")
+    parser.add_argument("--data-final", type=date.fromisoformat, default=date.today(), help="Último dia gerado (YYYY-MM-DD)")
+    parser.add_argument("--dias-por-bloco", type=int, default=7, help="Dias gravados por transação")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para gerar blocos em paralelo")
+    parser.add_argument("--confirmar-banco-principal", action="store_true",
+                        help="Permite --recriar no banco principal (bancodados.db), apagando todos os dados dele")
+    args = parser.parse_args(argv)
+    # Os pedidos sorteiam mesa, produto e usuário: listas vazias não têm o que sortear
+    for nome in ("produtos", "usuarios", "mesas"):
+        if getattr(args, nome) < 1:
+            parser.error(f"--{nome} deve ser pelo menos 1")
+    if args.empresas < 0:
+        parser.error("--empresas não pode ser negativo")
+    if _banco_principal(args.database_url) and args.recriar and not args.confirmar_banco_principal:
+        parser.error(f"--recriar apagaria todas as tabelas do banco principal ({args.database_url}); "
+                     "use outro --database-url ou passe --confirmar-banco-principal")
+    return args
+
+
+def _banco_principal(database_url: str) -> bool:
+    return database_url.rstrip("/").endswith("bancodados.db")
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if _banco_principal(args.database_url):
+        logger.warning("Gerando dados de carga no banco principal (%s)", args.database_url)
+    return gerar(args)
+
+
+if __name__ == "__main__":
+    main()
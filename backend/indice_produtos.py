@@ -0,0 +1,217 @@
+"""Índice de prefixos em memória para o lançamento rápido no PDV.
+
+`GET /produtos/lookup?prefix=` responde sem ir ao banco. O índice é um array
+ordenado de pares `(chave, produto_id)` consultado com bisect. As chaves de
+cada produto disponível são:
+
+- o código em minúsculas ("chop-001");
+- o nome normalizado (sem acentos, minúsculas) a partir de cada palavra, de
+  modo que "ipa" e "cerveja i" encontram "Cerveja IPA";
+- o slug normalizado.
+
+Escritas de produtos feitas neste processo atualizam o índice por produto,
+depois do commit, com os valores capturados nos eventos de mapper (sem nova
+consulta). Uma escrita que confirma enquanto o índice está sendo reconstruído
+faz a reconstrução reler o banco, para o snapshot antigo não sobrescrevê-la.
+Escritas de outros processos chegam pelo canal de
+`backend/invalidacao.py` e marcam o índice como obsoleto; ele é reconstruído
+por inteiro na próxima consulta. UPDATE/DELETE em massa sobre `Produto` também
+forçam reconstrução.
+"""
+import threading
+from bisect import bisect_left, insort
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from backend import invalidacao, models
+from backend.database import SessionLocal
+from backend.logging_config import logger
+
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 50
+CAMPOS = ("id", "codigo", "nome", "slug", "preco_venda", "estoque", "disponivel")
+
+
+def normalizar(texto: Optional[str]) -> str:
+    return models.remover_acentos(texto or "").lower().strip()
+
+
+def _chaves(registro: dict) -> List[str]:
+    chaves = set()
+    if registro.get("codigo"):
+        chaves.add(normalizar(registro["codigo"]))
+    palavras = normalizar(registro.get("nome")).split()
+    for i in range(len(palavras)):
+        chaves.add(" ".join(palavras[i:]))
+    if registro.get("slug"):
+        chaves.add(normalizar(registro["slug"]))
+    return sorted(chaves)
+
+
+def _preco(valor) -> Optional[str]:
+    if valor is None:
+        return None
+    return str(Decimal(str(valor)).quantize(Decimal("0.01")))
+
+
+class IndicePrefixos:
+    def __init__(self):
+        self._entradas: List[Tuple[str, int]] = []
+        self._registros: Dict[int, dict] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._registros)
+
+    def montar(self, registros: Iterable[dict]) -> tuple:
+        """Entradas e registros novos, sem tocar no índice em uso (ver `trocar`)."""
+        entradas, por_id = [], {}
+        for registro in registros:
+            if not registro.get("disponivel", True):
+                continue
+            por_id[registro["id"]] = self._publico(registro)
+            entradas.extend((chave, registro["id"]) for chave in _chaves(registro))
+        entradas.sort()
+        return entradas, por_id
+
+    def trocar(self, montado: tuple) -> None:
+        with self._lock:
+            self._entradas, self._registros = montado
+
+    def reconstruir(self, registros: Iterable[dict]) -> None:
+        self.trocar(self.montar(registros))
+
+    def atualizar(self, produto_id: int, registro: Optional[dict]) -> None:
+        """Substitui as entradas de um produto (`registro=None` ou indisponível remove)."""
+        with self._lock:
+            antigo = self._registros.pop(produto_id, None)
+            if antigo is not None:
+                for chave in _chaves(antigo):
+                    i = bisect_left(self._entradas, (chave, produto_id))
+                    if i < len(self._entradas) and self._entradas[i] == (chave, produto_id):
+                        del self._entradas[i]
+            if registro is None or not registro.get("disponivel", True):
+                return
+            self._registros[produto_id] = self._publico(registro)
+            for chave in _chaves(registro):
+                insort(self._entradas, (chave, produto_id))
+
+    def buscar(self, prefixo: str, limite: int = LIMITE_PADRAO) -> List[dict]:
+        p = normalizar(prefixo)
+        if not p:
+            return []
+        resultado, vistos = [], set()
+        with self._lock:
+            i = bisect_left(self._entradas, (p,))
+            entradas = self._entradas
+            while i < len(entradas) and len(resultado) < limite:
+                chave, produto_id = entradas[i]
+                if not chave.startswith(p):
+                    break
+                if produto_id not in vistos:
+                    vistos.add(produto_id)
+                    resultado.append(self._registros[produto_id])
+                i += 1
+        return resultado
+
+    @staticmethod
+    def _publico(registro: dict) -> dict:
+        return {
+            "id": registro["id"], "codigo": registro.get("codigo"), "nome": registro.get("nome"),
+            "slug": registro.get("slug"), "preco_venda": _preco(registro.get("preco_venda")),
+            "estoque": registro.get("estoque"),
+        }
+
+
+indice = IndicePrefixos()
+_obsoleto = True
+_estado_lock = threading.Lock()
+# Incrementada a cada commit local que altera produtos; protegida por _geracao_lock
+_geracao = 0
+_geracao_lock = threading.Lock()
+TENTATIVAS_RECONSTRUCAO = 3
+
+
+def marcar_obsoleto() -> None:
+    global _obsoleto
+    _obsoleto = True
+
+
+def reconstruir() -> int:
+    global _obsoleto
+    with _estado_lock:
+        _obsoleto = False
+        produto = models.Produto
+        for _tentativa in range(TENTATIVAS_RECONSTRUCAO):
+            geracao = _geracao
+            with SessionLocal() as db:
+                linhas = db.execute(select(*(getattr(produto, c) for c in CAMPOS))).all()
+            montado = indice.montar(dict(zip(CAMPOS, linha)) for linha in linhas)
+            with _geracao_lock:
+                # Um commit local durante a leitura foi aplicado ao índice antigo: o snapshot pode não tê-lo
+                if _geracao == geracao:
+                    indice.trocar(montado)
+                    break
+        else:
+            indice.trocar(montado)
+            _obsoleto = True  # escritas demais durante a leitura: reconstruir de novo na próxima consulta
+    logger.debug("Índice de prefixos reconstruído: %d produtos", len(indice))
+    return len(indice)
+
+
+def buscar(prefixo: str, limite: int = LIMITE_PADRAO) -> List[dict]:
+    if _obsoleto:
+        reconstruir()
+    return indice.buscar(prefixo, max(1, min(limite, LIMITE_MAXIMO)))
+
+
+# --- atualização incremental a partir das escritas deste processo ---
+
+def _pendentes(produto) -> dict:
+    return object_session(produto).info.setdefault("indice_produtos", {})
+
+
+def _capturar(_mapper, _conn, produto) -> None:
+    _pendentes(produto)[produto.id] = {c: getattr(produto, c) for c in CAMPOS}
+
+
+def _capturar_remocao(_mapper, _conn, produto) -> None:
+    _pendentes(produto)[produto.id] = None
+
+
+def _orm_execute(estado) -> None:
+    if (estado.is_update or estado.is_delete) and estado.bind_mapper is not None \
+            and estado.bind_mapper.class_ is models.Produto:
+        estado.session.info["indice_produtos_massa"] = True
+
+
+def _apos_commit(session: Session) -> None:
+    global _geracao
+    capturados = session.info.pop("indice_produtos", None)
+    if session.info.pop("indice_produtos_massa", False):
+        marcar_obsoleto()
+        return
+    if capturados:
+        with _geracao_lock:
+            _geracao += 1
+            if not _obsoleto:
+                for produto_id, registro in capturados.items():
+                    indice.atualizar(produto_id, registro)
+
+
+def _fim_transacao(session: Session, transacao) -> None:
+    if transacao.parent is None:
+        session.info.pop("indice_produtos", None)
+        session.info.pop("indice_produtos_massa", None)
+
+
+event.listen(models.Produto, "after_insert", _capturar)
+event.listen(models.Produto, "after_update", _capturar)
+event.listen(models.Produto, "after_delete", _capturar_remocao)
+event.listen(Session, "do_orm_execute", _orm_execute)
+event.listen(Session, "after_commit", _apos_commit)
+event.listen(Session, "after_transaction_end", _fim_transacao)
+invalidacao.ao_invalidar("catalogo", marcar_obsoleto, somente_remoto=True)
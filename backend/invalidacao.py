@@ -0,0 +1,333 @@
+"""Caches em processo coerentes entre vários workers.
+
+Cada cache local (`CacheLocal`) pertence a um ou mais domínios:
+
+    catalogo   Produto, Categoria, Empresa
+    usuarios   User
+    salao      Mesa, Pedido, PedidoItem
+    favoritos  Favorito
+
+Toda transação ORM que grava em um domínio incrementa a linha correspondente
+em `versoes_cache` dentro da própria transação (eventos `after_flush` e
+`do_orm_execute` da Session). Se a transação for desfeita, o incremento também
+é. Depois do commit o processo que escreveu limpa os próprios caches na hora.
+Os demais processos têm uma thread que consulta `PRAGMA data_version` a cada
+INVALIDACAO_POLL_MS. Esse valor muda quando outra conexão confirma algo no
+arquivo, e só então a thread relê `versoes_cache` e limpa os caches dos
+domínios que mudaram. Em bancos que não são SQLite, a tabela é relida a cada
+ciclo.
+
+    CACHE_LOCAL=true            liga os caches (false = sempre consulta o banco)
+    CACHE_LOCAL_TTL_S=60        validade máxima de uma entrada (rede de segurança)
+    INVALIDACAO_POLL_MS=200     intervalo de verificação entre processos
+
+Escritas feitas fora do ORM (SQL cru, scripts de carga) não incrementam
+versões; nesses casos vale o TTL.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from backend import metrics, models
+from backend.logging_config import logger
+
+ATIVO = os.environ.get("CACHE_LOCAL", "true").lower() in ("1", "true", "yes", "sim")
+TTL_S = float(os.environ.get("CACHE_LOCAL_TTL_S", "60"))
+POLL_S = float(os.environ.get("INVALIDACAO_POLL_MS", "200")) / 1000.0
+
+DOMINIOS_POR_MODELO = {
+    models.Produto: "catalogo",
+    models.Categoria: "catalogo",
+    models.Empresa: "catalogo",
+    models.User: "usuarios",
+    models.Mesa: "salao",
+    models.Pedido: "salao",
+    models.PedidoItem: "salao",
+    models.Favorito: "favoritos",
+}
+DOMINIOS = sorted(set(DOMINIOS_POR_MODELO.values()))
+
+_caches_por_dominio: Dict[str, List["CacheLocal"]] = defaultdict(list)
+_callbacks: Dict[str, List[tuple]] = defaultdict(list)
+
+
+class CacheLocal:
+    """Cache chave → valor imutável (ex.: bytes JSON), limpo quando um domínio muda.
+
+    Com `carga_unica=True`, requisições simultâneas para a mesma chave ausente
+    esperam a carga de uma só delas em vez de cada uma carregar o valor.
+    """
+
+    def __init__(self, nome: str, dominios: Iterable[str], ttl_s: float = TTL_S, max_itens: int = 256,
+                 carga_unica: bool = False):
+        self.nome = nome
+        self.ttl_s = ttl_s
+        self.max_itens = max_itens
+        self.carga_unica = carga_unica
+        self._dados: Dict[object, tuple] = {}
+        self._carregando: Dict[object, threading.Event] = {}
+        self._geracao = 0
+        self._lock = threading.Lock()
+        self.stats = metrics.registrar_cache(nome)
+        for dominio in dominios:
+            _caches_por_dominio[dominio].append(self)
+
+    def obter(self, chave, carregar: Callable[[], object]):
+        if not ATIVO:
+            return carregar()
+        while True:
+            agora = time.monotonic()
+            with self._lock:
+                item = self._dados.get(chave)
+                geracao = self._geracao
+                if item is not None and item[0] > agora:
+                    self.stats.acerto()
+                    return item[1]
+                em_curso = self._carregando.get(chave) if self.carga_unica else None
+                if em_curso is None and self.carga_unica:
+                    self._carregando[chave] = threading.Event()
+            if em_curso is None:
+                break
+            # Outra thread já está carregando: esperar e reler (se a carga falhar ou for
+            # invalidada, uma das que esperam assume a próxima)
+            em_curso.wait()
+        self.stats.falta()
+        try:
+            valor = carregar()
+            with self._lock:
+                # Uma invalidação durante a carga torna o valor suspeito: não guardar
+                if self._geracao == geracao:
+                    if len(self._dados) >= self.max_itens:
+                        self._dados.pop(next(iter(self._dados)))
+                    self._dados[chave] = (agora + self.ttl_s, valor)
+        finally:
+            if self.carga_unica:
+                with self._lock:
+                    self._carregando.pop(chave).set()
+        return valor
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+            self._geracao += 1
+
+
+cache_catalogo = CacheLocal("catalogo", ("catalogo",))
+cache_usuarios = CacheLocal("usuarios", ("usuarios",))
+# O estado do salão inclui nomes de produtos nos itens das mesas
+cache_salao = CacheLocal("salao", ("salao", "catalogo"))
+
+
+def ao_invalidar(dominio: str, fn: Callable[[], None], somente_remoto: bool = False) -> None:
+    """Registra uma função chamada sempre que `dominio` mudar.
+
+    Com `somente_remoto=True` ela só é chamada para escritas de outros
+    processos (quem já trata as escritas locais por conta própria).
+    """
+    _callbacks[dominio].append((fn, somente_remoto))
+
+
+def invalidar_local(dominios: Iterable[str], remoto: bool = False) -> None:
+    for dominio in dominios:
+        for cache in _caches_por_dominio.get(dominio, ()):
+            cache.invalidar()
+        for fn, somente_remoto in _callbacks.get(dominio, ()):
+            if somente_remoto and not remoto:
+                continue
+            try:
+                fn()
+            except Exception:
+                logger.exception("Callback de invalidação de %s falhou", dominio)
+
+
+# --- marcação das escritas (mesma transação) ---
+
+_instalado = False
+
+
+def _marcar(session: Session, dominios: Set[str]) -> None:
+    ja_marcados = session.info.setdefault("invalidacao_marcados", set())
+    novos = dominios - ja_marcados
+    if not novos:
+        return
+    tabela = models.VersaoCache.__table__
+    conn = session.connection()
+    stmt = update(tabela).where(tabela.c.dominio.in_(sorted(novos))).values(versao=tabela.c.versao + 1)
+    if conn.dialect.update_returning:
+        # Com as versões novas em mãos o observador não trata o próprio commit como remoto
+        versoes = dict(conn.execute(stmt.returning(tabela.c.dominio, tabela.c.versao)).all())
+        session.info.setdefault("invalidacao_versoes", {}).update(versoes)
+    else:
+        conn.execute(stmt)
+    ja_marcados.update(novos)
+
+
+def _dominios_de(objetos) -> Set[str]:
+    return {DOMINIOS_POR_MODELO[type(o)] for o in objetos if type(o) in DOMINIOS_POR_MODELO}
+
+
+def _apos_flush(session: Session, _flush_context) -> None:
+    if not _instalado:
+        return
+    dominios = _dominios_de(session.new) | _dominios_de(session.dirty) | _dominios_de(session.deleted)
+    if dominios:
+        _marcar(session, dominios)
+
+
+def _orm_execute(estado) -> None:
+    # UPDATE/DELETE/INSERT em massa via session.execute() não passam pelo flush
+    if not _instalado or not (estado.is_update or estado.is_delete or estado.is_insert):
+        return
+    mapper = estado.bind_mapper
+    dominio = DOMINIOS_POR_MODELO.get(mapper.class_) if mapper is not None else None
+    if dominio:
+        _marcar(estado.session, {dominio})
+
+
+def _apos_commit(session: Session) -> None:
+    marcados = session.info.pop("invalidacao_marcados", None)
+    versoes = session.info.pop("invalidacao_versoes", None)
+    if marcados:
+        invalidar_local(marcados)
+    if versoes and _observador is not None:
+        _observador.registrar_locais(versoes)
+
+
+def _fim_transacao(session: Session, transacao) -> None:
+    # Rollback (ou close sem commit): as versões incrementadas foram desfeitas
+    if transacao.parent is None:
+        session.info.pop("invalidacao_marcados", None)
+        session.info.pop("invalidacao_versoes", None)
+
+
+event.listen(Session, "after_flush", _apos_flush)
+event.listen(Session, "do_orm_execute", _orm_execute)
+event.listen(Session, "after_commit", _apos_commit)
+event.listen(Session, "after_transaction_end", _fim_transacao)
+
+
+# --- observação de outros processos ---
+
+class Observador:
+    def __init__(self, engine, intervalo_s: float = POLL_S):
+        self.engine = engine
+        self.intervalo_s = intervalo_s
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._versoes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._sqlite: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self.verificacoes = 0
+        self.invalidacoes = 0
+
+    def _ler_versoes(self) -> Dict[str, int]:
+        tabela = models.VersaoCache.__table__
+        with self.engine.connect() as conn:
+            return dict(conn.execute(select(tabela.c.dominio, tabela.c.versao)).all())
+
+    def _houve_commit_externo(self) -> bool:
+        if self._sqlite is None:
+            return True
+        atual = self._sqlite.execute("PRAGMA data_version").fetchone()[0]
+        mudou = atual != self._data_version
+        self._data_version = atual
+        return mudou
+
+    def verificar(self) -> Set[str]:
+        """Um ciclo: devolve os domínios que mudaram desde a última leitura."""
+        self.verificacoes += 1
+        if not self._houve_commit_externo():
+            return set()
+        versoes = self._ler_versoes()
+        with self._lock:
+            mudaram = {d for d, v in versoes.items() if self._versoes.get(d) != v}
+            self._versoes = versoes
+        if mudaram:
+            self.invalidacoes += 1
+            invalidar_local(mudaram, remoto=True)
+        return mudaram
+
+    def registrar_locais(self, versoes: Dict[str, int]) -> None:
+        """Versões gravadas por um commit deste processo (já invalidado localmente)."""
+        with self._lock:
+            for dominio, versao in versoes.items():
+                # Só avança se não houve escrita de outro processo no meio
+                if self._versoes.get(dominio) == versao - 1:
+                    self._versoes[dominio] = versao
+
+    def _loop(self) -> None:
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                self.verificar()
+            except Exception:
+                logger.exception("Erro ao verificar versões de cache")
+
+    def iniciar(self) -> None:
+        if self.engine.dialect.name == "sqlite" and self.engine.url.database not in (None, "", ":memory:"):
+            self._sqlite = sqlite3.connect(self.engine.url.database, check_same_thread=False)
+            self._data_version = self._sqlite.execute("PRAGMA data_version").fetchone()[0]
+        self._versoes = self._ler_versoes()
+        self._thread = threading.Thread(target=self._loop, name="cache-invalidacao", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._sqlite is not None:
+            self._sqlite.close()
+
+
+def garantir_dominios(engine) -> None:
+    """Cria `versoes_cache` e suas linhas, se faltarem (idempotente)."""
+    tabela = models.VersaoCache.__table__
+    tabela.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        existentes = {r[0] for r in conn.execute(select(tabela.c.dominio))}
+        faltando = [{"dominio": d, "versao": 0} for d in DOMINIOS if d not in existentes]
+        if faltando:
+            conn.execute(tabela.insert(), faltando)
+
+
+_observador: Optional[Observador] = None
+
+
+def iniciar(engine) -> None:
+    """Liga a marcação de versões e a thread que observa os outros processos."""
+    global _instalado, _observador
+    if _observador is not None:
+        return
+    try:
+        garantir_dominios(engine)
+    except Exception:
+        # Outro worker pode ter inserido as linhas ao mesmo tempo
+        logger.warning("Falha ao preparar versoes_cache; tentando novamente", exc_info=True)
+        garantir_dominios(engine)
+    _instalado = True
+    _observador = Observador(engine)
+    _observador.iniciar()
+    metrics.registrar_coletor(lambda: [
+        "# HELP cache_invalidation_checks_total Verificações de versão entre processos.",
+        "# TYPE cache_invalidation_checks_total counter",
+        f"cache_invalidation_checks_total {_observador.verificacoes if _observador else 0}",
+        "# HELP cache_invalidations_total Invalidações recebidas de escritas (qualquer processo).",
+        "# TYPE cache_invalidations_total counter",
+        f"cache_invalidations_total {_observador.invalidacoes if _observador else 0}",
+    ])
+    logger.info("Invalidação de caches entre processos ativa (poll %.0f ms, caches %s)",
+                POLL_S * 1000, "ligados" if ATIVO else "desligados")
+
+
+def parar() -> None:
+    global _instalado, _observador
+    _instalado = False
+    if _observador is not None:
+        _observador.parar()
+        _observador = None
@@ -0,0 +1,453 @@
+"""Fila de tarefas em segundo plano persistida no banco da aplicação.
+
+Tarefas são funções registradas com `@tarefa("nome")` que recebem
+`(db, payload)`. `enfileirar()` grava um `models.Job`; threads de trabalho
+(iniciadas no startup da app) reivindicam jobs prontos com um UPDATE
+condicional, então vários processos podem dividir a mesma fila sem executar o
+mesmo job duas vezes.
+
+- A tarefa roda em uma sessão própria (`SessionLocal`) e o executor marca o job
+  como concluído na mesma transação; por isso a tarefa deve apenas fazer
+  flush, sem commit, para que efeito e conclusão sejam atômicos.
+- Falhas são reagendadas com backoff exponencial (com jitter) até
+  `max_tentativas`; depois o job fica como `falhou`, com o traceback em `erro`.
+- `chave` (idempotência): um segundo `enfileirar` com a mesma chave devolve o
+  job existente em vez de criar outro.
+- `agendar(nome, "*/5 * * * *", tipo)`: agendamentos periódicos em sintaxe
+  cron (minuto hora dia mês dia-da-semana). Cada disparo é enfileirado com a
+  chave `cron:<nome>:<minuto>`, então vários processos agendando o mesmo
+  minuto geram um único job.
+
+Variáveis de ambiente:
+
+    JOBS_WORKERS=1                threads de trabalho por processo (0 desliga)
+    JOBS_SCHEDULER=true           roda o agendador neste processo
+    JOBS_POLL_S=1                 intervalo de consulta da fila quando ociosa
+    JOBS_BACKOFF_BASE_S=5         primeiro atraso de nova tentativa (dobra a cada falha)
+    JOBS_BACKOFF_MAX_S=900        atraso máximo entre tentativas
+    JOBS_LOCK_TIMEOUT_S=600       job `executando` há mais tempo que isso volta para a fila
+    JOBS_RETENTION_DAYS=7         jobs concluídos mais antigos são apagados (diariamente)
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from backend import metrics, models
+from backend.database import SessionLocal
+from backend.logging_config import logger
+
+WORKERS = int(os.environ.get("JOBS_WORKERS", "1"))
+AGENDADOR_ATIVO = os.environ.get("JOBS_SCHEDULER", "true").lower() in ("1", "true", "yes", "sim")
+POLL_S = float(os.environ.get("JOBS_POLL_S", "1"))
+BACKOFF_BASE_S = float(os.environ.get("JOBS_BACKOFF_BASE_S", "5"))
+BACKOFF_MAX_S = float(os.environ.get("JOBS_BACKOFF_MAX_S", "900"))
+LOCK_TIMEOUT_S = float(os.environ.get("JOBS_LOCK_TIMEOUT_S", "600"))
+RETENCAO_DIAS = int(os.environ.get("JOBS_RETENTION_DAYS", "7"))
+AGENDADOR_TICK_S = 15.0
+
+Job = models.Job
+
+
+def agora() -> datetime:
+    """UTC sem fuso, no mesmo formato das colunas DateTime do banco."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# --- registro de tarefas ---
+
+class Tarefa:
+    __slots__ = ("nome", "fn", "max_tentativas")
+
+    def __init__(self, nome: str, fn: Callable[[Session, dict], object], max_tentativas: int):
+        self.nome = nome
+        self.fn = fn
+        self.max_tentativas = max_tentativas
+
+
+_tarefas: Dict[str, Tarefa] = {}
+
+
+def tarefa(nome: str, max_tentativas: int = 5):
+    """Decorador que registra `fn(db, payload)` como tarefa `nome`."""
+    def registrar(fn):
+        _tarefas[nome] = Tarefa(nome, fn, max_tentativas)
+        return fn
+    return registrar
+
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(Job)
+
+
+def enfileirar(
+    tipo: str,
+    payload: Optional[dict] = None,
+    chave: Optional[str] = None,
+    atraso_s: float = 0,
+    executar_em: Optional[datetime] = None,
+    max_tentativas: Optional[int] = None,
+    db: Optional[Session] = None,
+) -> Optional[int]:
+    """Enfileira um job e devolve o id (o existente, se a chave já foi usada).
+
+    Com `db`, o job entra na transação do chamador e só passa a existir se ela
+    for confirmada; sem `db`, é gravado e confirmado imediatamente.
+    """
+    if tipo not in _tarefas:
+        raise ValueError(f"Tarefa desconhecida: {tipo}")
+    sessao = db if db is not None else SessionLocal()
+    try:
+        stmt = _insert(sessao).values(
+            tipo=tipo,
+            payload=json.dumps(payload or {}, ensure_ascii=False, default=str),
+            status="pendente",
+            tentativas=0,
+            max_tentativas=max_tentativas or _tarefas[tipo].max_tentativas,
+            chave_idempotencia=chave,
+            executar_em=executar_em or (agora() + timedelta(seconds=atraso_s)),
+        )
+        if chave:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["chave_idempotencia"])
+        resultado = sessao.execute(stmt)
+        if resultado.rowcount:
+            job_id = resultado.inserted_primary_key[0]
+        else:
+            job_id = sessao.execute(select(Job.id).where(Job.chave_idempotencia == chave)).scalar()
+        if db is None:
+            sessao.commit()
+    finally:
+        if db is None:
+            sessao.close()
+    _acordar.set()
+    return job_id
+
+
+# --- execução ---
+
+_parar = threading.Event()
+_acordar = threading.Event()
+_threads: List[threading.Thread] = []
+_contadores = {"executados": 0, "falhas": 0, "descartados": 0}
+_contadores_lock = threading.Lock()
+
+
+def _contar(nome: str) -> None:
+    with _contadores_lock:
+        _contadores[nome] += 1
+
+
+def _reivindicar(dono: str):
+    """Marca o próximo job pronto como `executando` para `dono`; None se a fila estiver vazia."""
+    with SessionLocal() as db:
+        for _ in range(5):
+            candidato = db.execute(
+                select(Job.id)
+                .where(Job.status == "pendente", Job.executar_em <= agora())
+                .order_by(Job.executar_em, Job.id)
+                .limit(1)
+            ).scalar()
+            if candidato is None:
+                return None
+            resultado = db.execute(
+                update(Job)
+                .where(Job.id == candidato, Job.status == "pendente")
+                .values(status="executando", iniciado_em=agora(), bloqueado_por=dono,
+                        tentativas=Job.tentativas + 1)
+            )
+            db.commit()
+            if resultado.rowcount == 1:
+                return db.execute(
+                    select(Job.id, Job.tipo, Job.payload, Job.tentativas, Job.max_tentativas).where(Job.id == candidato)
+                ).one()
+        # Outro worker levou os candidatos; tentar de novo no próximo ciclo
+        return None
+
+
+def _atraso_nova_tentativa(tentativas: int) -> float:
+    atraso = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** max(0, tentativas - 1)))
+    return atraso * random.uniform(0.8, 1.2)
+
+
+def _executar(job) -> None:
+    registro = _tarefas.get(job.tipo)
+    db = SessionLocal()
+    try:
+        if registro is None:
+            raise LookupError(f"Tarefa desconhecida: {job.tipo}")
+        registro.fn(db, json.loads(job.payload) if job.payload else {})
+        db.execute(update(Job).where(Job.id == job.id)
+                   .values(status="concluido", concluido_em=agora(), erro=None, bloqueado_por=None))
+        db.commit()
+        _contar("executados")
+    except Exception:
+        db.rollback()
+        erro = traceback.format_exc(limit=8)
+        if job.tentativas >= job.max_tentativas:
+            valores = {"status": "falhou", "concluido_em": agora()}
+            _contar("descartados")
+            logger.error("Job %s (%s) falhou definitivamente após %d tentativas", job.id, job.tipo, job.tentativas)
+        else:
+            atraso = _atraso_nova_tentativa(job.tentativas)
+            valores = {"status": "pendente", "executar_em": agora() + timedelta(seconds=atraso)}
+            logger.warning("Job %s (%s) falhou (tentativa %d/%d); nova tentativa em %.1fs",
+                           job.id, job.tipo, job.tentativas, job.max_tentativas, atraso)
+        _contar("falhas")
+        _registrar_falha(db, job, erro, valores)
+    finally:
+        db.close()
+
+
+def _registrar_falha(db, job, erro: str, valores: dict, tentativas: int = 3) -> None:
+    # A falha do job costuma ter a mesma causa (ex.: "database is locked"): tenta de novo algumas vezes
+    for tentativa in range(1, tentativas + 1):
+        try:
+            db.execute(update(Job).where(Job.id == job.id).values(erro=erro, bloqueado_por=None, **valores))
+            db.commit()
+            return
+        except Exception:
+            db.rollback()
+            if tentativa == tentativas:
+                logger.exception("Não foi possível registrar a falha do job %s (%s); ele fica 'executando' "
+                                 "até a recuperação de jobs travados", job.id, job.tipo)
+                return
+            time.sleep(0.2 * tentativa)
+
+
+def _loop_worker(dono: str) -> None:
+    while not _parar.is_set():
+        try:
+            job = _reivindicar(dono)
+        except Exception:
+            logger.exception("Erro ao consultar a fila de jobs")
+            job = None
+        if job is None:
+            _acordar.wait(POLL_S)
+            _acordar.clear()
+            continue
+        try:
+            _executar(job)
+        except Exception:
+            # Nunca deixar a thread morrer: o pool de workers encolheria em silêncio
+            logger.exception("Erro inesperado ao executar o job %s (%s)", job.id, job.tipo)
+
+
+def executar_pendentes(limite: int = 100) -> int:
+    """Executa jobs prontos na thread atual (scripts e manutenção); devolve quantos rodaram."""
+    dono = f"{socket.gethostname()}:{os.getpid()}:manual"
+    executados = 0
+    while executados < limite:
+        job = _reivindicar(dono)
+        if job is None:
+            break
+        _executar(job)
+        executados += 1
+    return executados
+
+
+# --- agendamentos periódicos ---
+
+_CAMPOS_CRON = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _parse_campo_cron(texto: str, minimo: int, maximo: int) -> Set[int]:
+    valores: Set[int] = set()
+    for parte in texto.split(","):
+        intervalo, _, passo = parte.partition("/")
+        passo_n = int(passo) if passo else 1
+        if intervalo == "*":
+            inicio, fim = minimo, maximo
+        elif "-" in intervalo:
+            a, b = intervalo.split("-", 1)
+            inicio, fim = int(a), int(b)
+        else:
+            inicio = int(intervalo)
+            fim = maximo if passo else inicio
+        if inicio < minimo or fim > maximo or inicio > fim or passo_n < 1:
+            raise ValueError(f"Campo cron inválido: {parte!r}")
+        valores.update(range(inicio, fim + 1, passo_n))
+    return valores
+
+
+class Cron:
+    """Expressão cron de 5 campos (`*`, `a-b`, `a,b`, `*/n`); dia da semana 0 = domingo."""
+
+    def __init__(self, expressao: str):
+        campos = expressao.split()
+        if len(campos) != 5:
+            raise ValueError(f"Expressão cron deve ter 5 campos: {expressao!r}")
+        self.expressao = expressao
+        self.minutos, self.horas, self.dias, self.meses, self.dias_semana = (
+            _parse_campo_cron(c, mn, mx) for c, (mn, mx) in zip(campos, _CAMPOS_CRON)
+        )
+        self._dia_livre = campos[2] == "*"
+        self._semana_livre = campos[4] == "*"
+
+    def corresponde(self, momento: datetime) -> bool:
+        if momento.minute not in self.minutos or momento.hour not in self.horas or momento.month not in self.meses:
+            return False
+        dia = momento.day in self.dias
+        semana = (momento.weekday() + 1) % 7 in self.dias_semana
+        if self._dia_livre or self._semana_livre:
+            return dia and semana
+        # Como no cron: com os dois campos restritos, basta um deles coincidir
+        return dia or semana
+
+
+class Agendamento:
+    __slots__ = ("nome", "cron", "tipo", "payload")
+
+    def __init__(self, nome: str, cron: Cron, tipo: str, payload: Optional[dict]):
+        self.nome = nome
+        self.cron = cron
+        self.tipo = tipo
+        self.payload = payload
+
+
+_agendamentos: Dict[str, Agendamento] = {}
+
+
+def agendar(nome: str, expressao: str, tipo: str, payload: Optional[dict] = None) -> None:
+    """Enfileira `tipo` em cada minuto que casar com a expressão cron (horário UTC)."""
+    _agendamentos[nome] = Agendamento(nome, Cron(expressao), tipo, payload)
+
+
+def _disparar_agendamentos(desde: datetime, ate: datetime) -> None:
+    minuto = desde + timedelta(minutes=1)
+    while minuto <= ate:
+        for ag in list(_agendamentos.values()):
+            if ag.cron.corresponde(minuto):
+                enfileirar(ag.tipo, ag.payload, chave=f"cron:{ag.nome}:{minuto:%Y%m%d%H%M}")
+        minuto += timedelta(minutes=1)
+
+
+def _recuperar_travados() -> None:
+    """Devolve à fila jobs `executando` cujo worker provavelmente morreu."""
+    limite = agora() - timedelta(seconds=LOCK_TIMEOUT_S)
+    with SessionLocal() as db:
+        resultado = db.execute(
+            update(Job).where(Job.status == "executando", Job.iniciado_em < limite)
+            .values(status="pendente", bloqueado_por=None, executar_em=agora())
+        )
+        db.commit()
+    if resultado.rowcount:
+        logger.warning("%d job(s) travados voltaram para a fila", resultado.rowcount)
+
+
+def _loop_agendador() -> None:
+    ultimo = agora().replace(second=0, microsecond=0)
+    while not _parar.wait(AGENDADOR_TICK_S):
+        atual = agora().replace(second=0, microsecond=0)
+        try:
+            if atual > ultimo:
+                _disparar_agendamentos(ultimo, atual)
+            _recuperar_travados()
+        except Exception:
+            logger.exception("Erro no agendador de jobs")
+        ultimo = max(ultimo, atual)
+
+
+@tarefa("jobs.limpar_antigos")
+def limpar_jobs_antigos(db: Session, payload: dict) -> None:
+    limite = agora() - timedelta(days=int(payload.get("dias", RETENCAO_DIAS)))
+    resultado = db.execute(delete(Job).where(Job.status == "concluido", Job.concluido_em < limite))
+    logger.info("Limpeza de jobs: %d removidos", resultado.rowcount)
+
+
+agendar("jobs-retencao", "30 3 * * *", "jobs.limpar_antigos")
+
+
+# --- métricas e ciclo de vida ---
+
+def _linhas_metricas() -> List[str]:
+    with SessionLocal() as db:
+        por_status = dict(db.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+        mais_antigo = db.execute(
+            select(func.min(Job.executar_em)).where(Job.status == "pendente", Job.executar_em <= agora())
+        ).scalar()
+    atraso = max(0.0, (agora() - mais_antigo).total_seconds()) if mais_antigo else 0.0
+    with _contadores_lock:
+        contadores = dict(_contadores)
+    linhas = [
+        "# HELP jobs_queue_depth Jobs por status.",
+        "# TYPE jobs_queue_depth gauge",
+    ]
+    for status in ("pendente", "executando", "concluido", "falhou"):
+        linhas.append(f'jobs_queue_depth{{status="{status}"}} {por_status.get(status, 0)}')
+    linhas += [
+        "# HELP jobs_queue_lag_seconds Há quanto tempo o job pronto mais antigo espera.",
+        "# TYPE jobs_queue_lag_seconds gauge",
+        f"jobs_queue_lag_seconds {atraso:.3f}",
+        "# HELP jobs_executed_total Jobs concluídos por este processo.",
+        "# TYPE jobs_executed_total counter",
+        f"jobs_executed_total {contadores['executados']}",
+        "# HELP jobs_failures_total Execuções de job que falharam neste processo.",
+        "# TYPE jobs_failures_total counter",
+        f"jobs_failures_total {contadores['falhas']}",
+        "# HELP jobs_dead_total Jobs que esgotaram as tentativas neste processo.",
+        "# TYPE jobs_dead_total counter",
+        f"jobs_dead_total {contadores['descartados']}",
+    ]
+    return linhas
+
+
+_metricas_registradas = False
+
+
+def iniciar(workers: int = WORKERS, agendador: bool = AGENDADOR_ATIVO) -> None:
+    """Inicia as threads de trabalho e o agendador (chamado no startup da app)."""
+    global _metricas_registradas
+    if not _metricas_registradas:
+        metrics.registrar_coletor(_linhas_metricas)
+        _metricas_registradas = True
+    if _threads:
+        return
+    _parar.clear()
+    base = f"{socket.gethostname()}:{os.getpid()}"
+    for i in range(workers):
+        th = threading.Thread(target=_loop_worker, args=(f"{base}:{i}",), name=f"jobs-worker-{i}", daemon=True)
+        th.start()
+        _threads.append(th)
+    if agendador and workers:
+        th = threading.Thread(target=_loop_agendador, name="jobs-scheduler", daemon=True)
+        th.start()
+        _threads.append(th)
+    if _threads:
+        logger.info("Jobs: %d worker(s), agendador %s, %d tarefa(s) registradas",
+                    workers, "ativo" if agendador else "inativo", len(_tarefas))
+
+
+def parar(timeout: float = 10.0) -> None:
+    _parar.set()
+    _acordar.set()
+    for th in _threads:
+        th.join(timeout)
+    _threads.clear()
+
+
+def listar(status: Optional[str] = None, limite: int = 50) -> List[dict]:
+    with SessionLocal() as db:
+        stmt = select(Job).order_by(Job.id.desc()).limit(limite)
+        if status:
+            stmt = stmt.where(Job.status == status)
+        return [
+            {
+                "id": j.id, "tipo": j.tipo, "status": j.status, "tentativas": j.tentativas,
+                "max_tentativas": j.max_tentativas, "chave": j.chave_idempotencia,
+                "executar_em": j.executar_em, "iniciado_em": j.iniciado_em, "concluido_em": j.concluido_em,
+                "payload": json.loads(j.payload) if j.payload else {}, "erro": j.erro,
+            }
+            for j in db.execute(stmt).scalars()
+        ]
@@ -1,17 +1,140 @@
 """Configuração de logging para o backend.
 
-Fornece um logger compartilhado configurado com formato simples e níveis.
+Fornece um logger compartilhado. As chamadas de log só enfileiram o registro
+(QueueHandler); a formatação e a escrita em stdout acontecem em uma thread
+separada (QueueListener), então backpressure do stdout não entra na latência
+das requisições.
+
+Variáveis de ambiente:
+
+    LOG_LEVEL=INFO                    nível da raiz
+    LOG_FORMAT=text|json              json gera um objeto por linha com campos estruturados
+    LOG_LEVELS="happy-hops=DEBUG,sqlalchemy.engine=WARNING"   níveis por logger
+    LOG_DEBUG_SAMPLE_RATE=1.0         fração dos registros DEBUG mantidos (amostragem)
+    LOG_QUEUE_SIZE=10000              capacidade da fila; registros excedentes são descartados
 """
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+
+# Campos estruturados aceitos via `extra=` e copiados para a saída JSON
+CAMPOS_ESTRUTURADOS = ("method", "route", "status", "duration_ms", "query_count", "user_id")
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        doc = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for campo in CAMPOS_ESTRUTURADOS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                doc[campo] = valor
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            doc["exc"] = record.exc_text
+        return json.dumps(doc, ensure_ascii=False, default=str)
+
+
+class AmostragemDebug(logging.Filter):
+    """Mantém apenas uma fração dos registros DEBUG (os demais níveis passam sempre)."""
+
+    def __init__(self, taxa: float):
+        super().__init__()
+        self.taxa = taxa
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.taxa
+
+
+class QueueHandlerNaoBloqueante(logging.handlers.QueueHandler):
+    """Enfileira sem bloquear e sem formatar na thread de quem loga."""
+
+    descartados = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve apenas a mensagem (%-args) e o traceback; o formatter roda no listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            QueueHandlerNaoBloqueante.descartados += 1
+
+
+_listener = None
+_queue_handler = None
+
+
+def _parse_niveis(valor: str) -> dict:
+    niveis = {}
+    for parte in valor.split(","):
+        nome, sep, nivel = parte.partition("=")
+        if sep and nome.strip():
+            niveis[nome.strip()] = nivel.strip().upper()
+    return niveis
+
 
 def configure_logging(level: int = logging.INFO):
+    global _listener, _queue_handler
     fmt = "%(asctime)s %(levelname)s %(name)s: %(message)s"
-    logging.basicConfig(stream=sys.stdout, level=level, format=fmt)
+    level = os.environ.get("LOG_LEVEL", "").upper() or level
+
+    stream = logging.StreamHandler(sys.stdout)
+    if os.environ.get("LOG_FORMAT", "text").lower() == "json":
+        stream.setFormatter(JSONFormatter())
+    else:
+        stream.setFormatter(logging.Formatter(fmt))
+
+    root = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()
+        root.removeHandler(_queue_handler)
+
+    fila = queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", "10000")))
+    _queue_handler = QueueHandlerNaoBloqueante(fila)
+    taxa = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+    if taxa < 1.0:
+        _queue_handler.addFilter(AmostragemDebug(taxa))
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    for nome, nivel in _parse_niveis(os.environ.get("LOG_LEVELS", "")).items():
+        logging.getLogger(nome).setLevel(nivel)
+
+    _listener = logging.handlers.QueueListener(fila, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Esvazia a fila e para a thread de escrita (registrado em atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 
 # configurar ao importar
 configure_logging()
+atexit.register(shutdown_logging)
 
 # logger público para uso nos módulos
 logger = logging.getLogger('happy-hops')
@@ -2,19 +2,37 @@ from fastapi import FastAPI, Depends, HTTPException, Response, Cookie, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from backend import crud, models, schemas
+from datetime import date, datetime
+from decimal import Decimal
+from backend import busca, crud, dashboard, estoque_minimo, facetas, favoritos, indice_produtos, migracoes, models, read_models, schemas
 from .database import engine, get_db
+from backend import invalidacao, jobs, metrics, outbox, previsao, profiling, query_plans, query_stats, recomendacoes, serializacao, tarefas, vendas, write_coordinator
+import logging
 import os
+import time
 import requests
 from pydantic import BaseModel
 from typing import Dict, Any
 
+# Instrumentar o pool antes da primeira conexão (métricas em /metrics)
+metrics.registro.instrumentar_engine(engine)
+query_stats.instrumentar_engine(engine)
+query_plans.instalar(engine)
+
 # Criar tabelas no banco de dados
 models.Base.metadata.create_all(bind=engine)
+# Colunas/índices novos em tabelas já existentes
+migracoes.aplicar(engine)
+
+app = FastAPI(title="Choperia API", default_response_class=serializacao.RespostaJSON)
 
-app = FastAPI(title="Choperia API")
+from backend.logging_config import logger, QueueHandlerNaoBloqueante
 
-from backend.logging_config import logger
+metrics.registrar_coletor(lambda: [
+    "# HELP log_records_dropped_total Registros de log descartados com a fila cheia.",
+    "# TYPE log_records_dropped_total counter",
+    f"log_records_dropped_total {QueueHandlerNaoBloqueante.descartados}",
+])
 
 # Garantir criação das tabelas dos modelos registrados quando a app iniciar.
 """
@@ -61,23 +79,75 @@ def startup_event():
 async def log_requests(request: Request, call_next):
     """
     Middleware que registra cada requisição HTTP recebida, mostrando método, URL, status e tempo de resposta.
-    Útil para depuração e monitoramento de performance.
+    Também alimenta as métricas por rota expostas em /metrics (relógio monotônico).
     """
-    import time
-    start = time.time()
-    try:
-        logger.debug(f"[middleware] -> incoming {request.method} {request.url}")
-    except Exception:
-        logger.debug("[middleware] -> incoming (could not format request)")
+    start = time.perf_counter()
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("[middleware] -> incoming %s %s", request.method, request.url)
+    metrics.registro.inicio_requisicao()
+    stats = query_stats.iniciar_requisicao()
+    status = 500
+    rota = metrics.ROTA_NAO_ENCONTRADA
     try:
-        response = await call_next(request)
-        elapsed = (time.time() - start) * 1000
-        logger.debug(f"[middleware] <- completed {request.method} {request.url} status={response.status_code} time_ms={elapsed:.1f}")
+        response = await profiling.chamar(request, call_next)
+        rota = getattr(request.scope.get("route"), "path", None) or rota
+        response = query_stats.finalizar_requisicao(stats, f"{request.method} {rota}", response, time.perf_counter() - start)
+        status = response.status_code
+        if debug:
+            elapsed = (time.perf_counter() - start) * 1000
+            logger.debug("[middleware] <- completed %s %s status=%s time_ms=%.1f queries=%d",
+                         request.method, request.url, status, elapsed, stats.quantidade,
+                         extra={"method": request.method, "route": rota, "status": status,
+                                "duration_ms": round(elapsed, 2), "query_count": stats.quantidade,
+                                "user_id": request.cookies.get("session")})
         return response
     except Exception as e:
-        elapsed = (time.time() - start) * 1000
-        logger.exception(f"[middleware] <- exception {request.method} {request.url} error={e} time_ms={elapsed:.1f}")
+        logger.exception("[middleware] <- exception %s %s error=%s time_ms=%.1f",
+                         request.method, request.url, e, (time.perf_counter() - start) * 1000)
         raise
+    finally:
+        metrics.registro.fim_requisicao(request.method, rota, status, time.perf_counter() - start)
+
+# Captura opcional de tráfego para replay (CAPTURE_REQUESTS=true)
+from backend import captura
+if captura.CAPTURE_ENABLED:
+    app.middleware("http")(captura.capturar_requisicoes)
+    logger.info("Captura de requisições ativa em %s (amostra=%s)", captura.CAPTURE_DIR, captura.CAPTURE_SAMPLE_RATE)
+
+
+@app.on_event("startup")
+def iniciar_coordenador_escrita():
+    # Group commit das mutações quentes (WRITE_COORDINATOR=true)
+    write_coordinator.iniciar(engine)
+
+
+@app.on_event("startup")
+def iniciar_invalidacao():
+    # Caches em processo coerentes entre workers (versoes_cache + PRAGMA data_version)
+    invalidacao.iniciar(engine)
+
+
+@app.on_event("startup")
+def iniciar_busca():
+    # Índice FTS5 de produtos (criado/reconstruído se estiver defasado)
+    busca.criar_indice(engine)
+    # Índice de prefixos do PDV em memória (/produtos/lookup)
+    indice_produtos.reconstruir()
+
+
+@app.on_event("startup")
+def iniciar_jobs():
+    # Workers e agendador da fila de jobs (JOBS_WORKERS=0 desliga neste processo)
+    jobs.iniciar()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    jobs.parar()
+    write_coordinator.parar()
+    invalidacao.parar()
+    captura.fechar()
 
 # Configurar CORS
 # Permitir configurar origens via variável de ambiente ALLOWED_ORIGINS (CSV).
@@ -114,6 +184,89 @@ def health_check():
     """Endpoint para verificar se o backend está rodando"""
     return {"status": "ok", "message": "Backend is running"}
 
+# Métricas no formato texto do Prometheus
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(content=metrics.registro.texto(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Profiling sob demanda (somente admin)
+def _exigir_admin(session: Optional[str]):
+    if not profiling.usuario_admin(session):
+        raise HTTPException(status_code=403, detail='Admin only')
+
+
+@app.get('/admin/profiles')
+def read_profiles(session: str | None = Cookie(None)):
+    _exigir_admin(session)
+    return profiling.listar_perfis()
+
+
+@app.get('/admin/profiles/{perfil_id}')
+def read_profile(perfil_id: str, session: str | None = Cookie(None)):
+    _exigir_admin(session)
+    perfil = profiling.obter_perfil(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail='Profile not found')
+    return Response(content=perfil['conteudo'], media_type='text/plain; charset=utf-8')
+
+
+@app.post('/admin/tracemalloc/snapshot')
+def tracemalloc_snapshot(session: str | None = Cookie(None)):
+    """Marca o ponto de referência; o próximo /admin/tracemalloc/diff compara com ele."""
+    _exigir_admin(session)
+    return profiling.marcar_ponto_tracemalloc()
+
+
+@app.get('/admin/tracemalloc/diff')
+def tracemalloc_diff(top: int = 25, session: str | None = Cookie(None)):
+    _exigir_admin(session)
+    return profiling.diff_desde_ponto(top=top)
+
+
+@app.post('/admin/tracemalloc/stop')
+def tracemalloc_stop(session: str | None = Cookie(None)):
+    _exigir_admin(session)
+    return profiling.parar_tracemalloc()
+
+
+@app.get('/admin/jobs')
+def read_jobs(status: Optional[str] = None, limit: int = 50, session: str | None = Cookie(None)):
+    _exigir_admin(session)
+    return jobs.listar(status=status, limite=limit)
+
+
+@app.post('/admin/jobs')
+def create_job(payload: dict, session: str | None = Cookie(None)):
+    """Enfileira um job manualmente (body: { tipo, payload?, chave?, atrasoS? })."""
+    _exigir_admin(session)
+    tipo = payload.get('tipo')
+    if not tipo:
+        raise HTTPException(status_code=400, detail='tipo is required')
+    try:
+        job_id = jobs.enfileirar(tipo, payload.get('payload') or {}, chave=payload.get('chave'),
+                                 atraso_s=float(payload.get('atrasoS') or 0))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'id': job_id}
+
+
+@app.get('/changes')
+def read_changes(after: Optional[int] = None, limit: int = 100, consumer: Optional[str] = None,
+                 session: str | None = Cookie(None), db: Session = Depends(get_db)):
+    """Feed de mudanças do outbox em ordem de id (ver backend/outbox.py)."""
+    _exigir_admin(session)
+    return outbox.ler(db, after=after, limite=limit, consumidor=consumer)
+
+
+@app.get('/admin/query-plans')
+def read_query_plans(ordenar: str = 'tempo', scans: bool = False, limit: int = 100, session: str | None = Cookie(None)):
+    """Statements distintos com plano, chamadas e tempo acumulado (QUERY_PLAN_CAPTURE=true)."""
+    _exigir_admin(session)
+    return {
+        'ativo': query_plans.CAPTURA_ATIVA,
+        'statements': query_plans.relatorio(ordenar=ordenar, somente_scans=scans, limite=limit),
+    }
+
 # User endpoints
 @app.post("/users/", response_model=schemas.User)
 def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -188,8 +341,9 @@ def auth_logout(response: Response):
 
 @app.get("/users/", response_model=List[schemas.User])
 def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    users = crud.get_users(db, skip=skip, limit=limit)
-    return users
+    conteudo = invalidacao.cache_usuarios.obter(("lista", skip, limit), lambda: serializacao.json_lista(
+        serializacao.ADAPTADOR_USUARIOS, read_models.listar_usuarios(db, skip=skip, limit=limit)))
+    return Response(content=conteudo, media_type="application/json")
 
 @app.get("/users/{user_id}", response_model=schemas.User)
 def read_user(user_id: int, db: Session = Depends(get_db)):
@@ -214,9 +368,61 @@ def create_produto(produto: schemas.ProdutoCreate, db: Session = Depends(get_db)
     return crud.create_produto(db=db, produto=produto)
 
 @app.get("/produtos/", response_model=List[schemas.Produto])
-def read_produtos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    produtos = crud.get_produtos(db, skip=skip, limit=limit)
-    return produtos
+def read_produtos(skip: int = 0, limit: int = 100, categoria_id: Optional[int] = None,
+                  empresa_id: Optional[int] = None, disponivel: Optional[bool] = None,
+                  preco_min: Optional[Decimal] = None, preco_max: Optional[Decimal] = None,
+                  em_estoque: Optional[bool] = None, facets: bool = False,
+                  session: str | None = Cookie(None), db: Session = Depends(get_db)):
+    """Lista produtos com filtros opcionais.
+
+    Com `facets=true` a resposta vira `{ itens, total, facetas }`, com as contagens
+    por categoria, empresa, disponibilidade, estoque e faixa de preço. Para o
+    usuário da sessão, `isFavorito` marca os produtos favoritados.
+    """
+    filtros = {'categoria_id': categoria_id, 'empresa_id': empresa_id, 'disponivel': disponivel,
+               'preco_min': preco_min, 'preco_max': preco_max, 'em_estoque': em_estoque}
+    chave = ("produtos", skip, limit, facets) + tuple(filtros.values())
+
+    def _listar() -> List[dict]:
+        return read_models.listar_produtos(db, skip=skip, limit=limit, filtros=filtros)
+
+    def _serializar(itens: List[dict]) -> bytes:
+        if not facets:
+            return serializacao.json_lista(serializacao.ADAPTADOR_PRODUTOS, itens)
+        return serializacao.json_envelope(serializacao.ADAPTADOR_PRODUTOS, 'itens', itens,
+                                          **facetas.contar(facetas.cubo(db), filtros))
+
+    ids_favoritos = frozenset()
+    if session:
+        try:
+            ids_favoritos = favoritos.do_usuario(db, int(session))
+        except ValueError:
+            pass
+    if not ids_favoritos:
+        # Sem favoritos a resposta é a mesma para todos: bytes em cache
+        conteudo = invalidacao.cache_catalogo.obter(chave, lambda: _serializar(_listar()))
+    else:
+        itens = invalidacao.cache_catalogo.obter(chave + ("itens",), _listar)
+        conteudo = _serializar([{**p, 'isFavorito': p['id'] in ids_favoritos} for p in itens])
+    return Response(content=conteudo, media_type="application/json")
+
+@app.get("/produtos/search", response_model=List[schemas.Produto])
+def search_produtos(q: str, categoria_id: Optional[int] = None, empresa_id: Optional[int] = None,
+                    skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
+    """Busca por nome, descrição e código (prefixos, sem acentos), mais relevantes primeiro."""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q is required")
+    limit = max(1, min(limit, 100))
+    chave = ("busca", q, categoria_id, empresa_id, skip, limit)
+    conteudo = invalidacao.cache_catalogo.obter(chave, lambda: serializacao.json_lista(
+        serializacao.ADAPTADOR_PRODUTOS,
+        busca.buscar_produtos(db, q, categoria_id=categoria_id, empresa_id=empresa_id, skip=skip, limit=limit)))
+    return Response(content=conteudo, media_type="application/json")
+
+@app.get("/produtos/lookup")
+def lookup_produtos(prefix: str, limit: int = 10):
+    """Lançamento rápido no PDV: produtos disponíveis cujo código, nome ou slug começa com `prefix`."""
+    return indice_produtos.buscar(prefix, limit)
 
 @app.get("/produtos/{produto_id}", response_model=schemas.Produto)
 def read_produto(produto_id: int, db: Session = Depends(get_db)):
@@ -225,6 +431,14 @@ def read_produto(produto_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Produto not found")
     return db_produto
 
+@app.get("/produtos/{produto_id}/recomendados", response_model=List[schemas.Recomendacao])
+def read_produto_recomendados(produto_id: int, k: int = 10, db: Session = Depends(get_db)):
+    """Produtos comprados junto com `produto_id`, ordenados por lift."""
+    k = max(1, min(k, recomendacoes.K_MAXIMO))
+    conteudo = recomendacoes.cache.obter(("recomendados", produto_id, k), lambda: serializacao.json_lista(
+        serializacao.ADAPTADOR_RECOMENDACOES, recomendacoes.recomendados(db, produto_id, k)))
+    return Response(content=conteudo, media_type="application/json")
+
 @app.put("/produtos/{produto_id}", response_model=schemas.Produto)
 def update_produto(produto_id: int, produto: schemas.ProdutoCreate, db: Session = Depends(get_db)):
     db_produto = crud.get_produto(db, produto_id=produto_id)
@@ -236,6 +450,32 @@ def update_produto(produto_id: int, produto: schemas.ProdutoCreate, db: Session
     db.refresh(db_produto)
     return db_produto
 
+def _limite_estoque(payload: dict, chave: str) -> Optional[int]:
+    """Valor de estoque mínimo do body (`null` remove); 400 se não for inteiro >= 0."""
+    if not isinstance(payload, dict) or chave not in payload:
+        raise HTTPException(status_code=400, detail=f'{chave} is required')
+    valor = payload[chave]
+    if valor is None:
+        return None
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        valor = -1
+    if valor < 0:
+        raise HTTPException(status_code=400, detail=f'{chave} must be a non-negative integer or null')
+    return valor
+
+@app.put("/produtos/{produto_id}/estoque-minimo", response_model=schemas.Produto)
+def update_produto_estoque_minimo(produto_id: int, payload: dict, db: Session = Depends(get_db)):
+    """Define o estoque mínimo do produto: { "estoqueMinimo": 10 } (null volta ao padrão da empresa)."""
+    db_produto = crud.get_produto(db, produto_id=produto_id)
+    if db_produto is None:
+        raise HTTPException(status_code=404, detail="Produto not found")
+    db_produto.estoque_minimo = _limite_estoque(payload, 'estoqueMinimo')
+    db.commit()
+    db.refresh(db_produto)
+    return db_produto
+
 @app.delete("/produtos/{produto_id}")
 def delete_produto(produto_id: int, db: Session = Depends(get_db)):
     db_produto = crud.get_produto(db, produto_id=produto_id)
@@ -252,45 +492,49 @@ def create_mesa(mesa: schemas.MesaCreate, db: Session = Depends(get_db)):
 
 @app.get("/mesas/", response_model=List[schemas.Mesa])
 def read_mesas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    mesas = crud.get_mesas(db, skip=skip, limit=limit)
-    result = []
-    for db_mesa in mesas:
-        # Anexar itens do pedido pendente para cada mesa
-        pedido_pendente = crud.get_pedido_pendente_por_mesa(db, mesa_id=db_mesa.id)
-        itens = []
-        pedido_numero: Optional[str] = None
-        if pedido_pendente:
-            pedido_numero = getattr(pedido_pendente, 'numero', None)
-            for it in pedido_pendente.itens:
-                try:
-                    produto = it.produto
-                    itens.append({
-                        'id': it.id,
-                        'nome': produto.nome if produto else '',
-                        'quantidade': int(it.quantidade),
-                        'venda': float(it.preco_unitario),
-                        'total': float(it.subtotal),
-                        'produtoId': int(it.produto_id),
-                        'mesaId': db_mesa.id,
-                        'precoUnitario': float(it.preco_unitario),
-                        'status': 'ativo'
-                    })
-                except Exception:
-                    continue
-
-        result.append({
-            'id': db_mesa.id,
-            'nome': db_mesa.nome,
-            'status': db_mesa.status,
-            'capacidade': db_mesa.capacidade,
-            'observacoes': db_mesa.observacoes,
-            'slug': db_mesa.slug,
-            'pedido': pedido_numero or None,
-            'itens': itens,
-            'usuario_responsavel_id': db_mesa.usuario_responsavel_id,
-            'statusPedido': getattr(db_mesa, 'statusPedido', None)
-        })
-    return result
+    def _carregar() -> bytes:
+        mesas = crud.get_mesas(db, skip=skip, limit=limit)
+        result = []
+        for db_mesa in mesas:
+            # Anexar itens do pedido pendente para cada mesa
+            pedido_pendente = crud.get_pedido_pendente_por_mesa(db, mesa_id=db_mesa.id)
+            itens = []
+            pedido_numero: Optional[str] = None
+            if pedido_pendente:
+                pedido_numero = getattr(pedido_pendente, 'numero', None)
+                for it in pedido_pendente.itens:
+                    try:
+                        produto = it.produto
+                        itens.append({
+                            'id': it.id,
+                            'nome': produto.nome if produto else '',
+                            'quantidade': int(it.quantidade),
+                            'venda': float(it.preco_unitario),
+                            'total': float(it.subtotal),
+                            'produtoId': int(it.produto_id),
+                            'mesaId': db_mesa.id,
+                            'precoUnitario': float(it.preco_unitario),
+                            'status': 'ativo'
+                        })
+                    except Exception:
+                        continue
+
+            result.append({
+                'id': db_mesa.id,
+                'nome': db_mesa.nome,
+                'status': db_mesa.status,
+                'capacidade': db_mesa.capacidade,
+                'observacoes': db_mesa.observacoes,
+                'slug': db_mesa.slug,
+                'pedido': pedido_numero or None,
+                'itens': itens,
+                'usuario_responsavel_id': db_mesa.usuario_responsavel_id,
+                'statusPedido': getattr(db_mesa, 'statusPedido', None)
+            })
+        return serializacao.json_lista(serializacao.ADAPTADOR_MESAS, result)
+
+    conteudo = invalidacao.cache_salao.obter(("mesas", skip, limit), _carregar)
+    return Response(content=conteudo, media_type="application/json")
 
 @app.get("/mesas/slug/{slug}", response_model=schemas.Mesa)
 def read_mesa_by_slug(slug: str, db: Session = Depends(get_db)):
@@ -431,8 +675,8 @@ def read_pedidos(
     tipo: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    pedidos = crud.get_pedidos(db, skip=skip, limit=limit, tipo=tipo)
-    return pedidos
+    pedidos = read_models.listar_pedidos(db, skip=skip, limit=limit, tipo=tipo)
+    return serializacao.responder_lista(serializacao.ADAPTADOR_PEDIDOS, pedidos)
 
 @app.get("/pedidos/{pedido_id}", response_model=schemas.Pedido)
 def read_pedido(pedido_id: int, db: Session = Depends(get_db)):
@@ -450,6 +694,7 @@ def update_pedido_status(pedido_id: int, payload: dict, db: Session = Depends(ge
     if db_pedido is None:
         raise HTTPException(status_code=404, detail="Pedido not found")
     db_pedido.status = status
+    tarefas.enfileirar_baixa_se_necessario(db, pedido_id=pedido_id, status=status)
     db.commit()
     db.refresh(db_pedido)
     return db_pedido
@@ -472,7 +717,7 @@ def add_item_mesa(mesa_id: int, payload: dict, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail='produtoId e quantidade são obrigatórios')
 
     try:
-        pedido = crud.add_item_to_pedido(db=db, mesa_id=mesa_id, produto_id=int(produto_id), quantidade=int(quantidade), usuario_id=usuario_id, preco_unitario=preco, numero_sugerido=numero)
+        pedido = write_coordinator.executar_escrita(db, lambda sessao: crud.add_item_to_pedido(db=sessao, mesa_id=mesa_id, produto_id=int(produto_id), quantidade=int(quantidade), usuario_id=usuario_id, preco_unitario=preco, numero_sugerido=numero))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Erro ao adicionar item: {e}')
 
@@ -482,7 +727,7 @@ def add_item_mesa(mesa_id: int, payload: dict, db: Session = Depends(get_db)):
 @app.delete('/mesas/{mesa_id}/itens/{item_id}')
 def delete_item_mesa(mesa_id: int, item_id: int, db: Session = Depends(get_db)):
     try:
-        pedido = crud.remove_item_from_pedido(db=db, item_id=item_id)
+        pedido = write_coordinator.executar_escrita(db, lambda sessao: crud.remove_item_from_pedido(db=sessao, item_id=item_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Erro ao remover item: {e}')
 
@@ -509,6 +754,7 @@ def create_produto_avaliacao(produto_id: int, payload: dict = {}, db: Session =
         raise HTTPException(status_code=400, detail='rating is required')
     if usuario_id is None:
         raise HTTPException(status_code=400, detail='usuarioId is required')
+    _validar_rating(rating)
 
     return crud.create_avaliacao(
         db=db,
@@ -518,9 +764,32 @@ def create_produto_avaliacao(produto_id: int, payload: dict = {}, db: Session =
         comentario=comentario
     )
 
-@app.get("/produtos/{produto_id}/avaliacoes/")
-def read_produto_avaliacoes(produto_id: int, db: Session = Depends(get_db)):
-    return crud.get_avaliacoes_produto(db, produto_id=produto_id)
+def _validar_rating(rating) -> None:
+    try:
+        valido = 1 <= int(rating) <= 5
+    except (TypeError, ValueError):
+        valido = False
+    if not valido:
+        raise HTTPException(status_code=400, detail='rating must be an integer from 1 to 5')
+
+
+def _pagina_avaliacoes(db: Session, produto_id: int, ordem: str, limit: int, cursor: Optional[str]) -> Response:
+    try:
+        avaliacoes, proximo = read_models.listar_avaliacoes(db, produto_id, ordem=ordem,
+                                                            limit=max(1, min(limit, 100)), cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response = serializacao.responder_lista(serializacao.ADAPTADOR_AVALIACOES, avaliacoes)
+    if proximo:
+        response.headers['X-Next-Cursor'] = proximo
+    return response
+
+
+@app.get("/produtos/{produto_id}/avaliacoes/", response_model=List[schemas.Avaliacao])
+def read_produto_avaliacoes(produto_id: int, ordem: str = 'recentes', limit: int = 50, cursor: Optional[str] = None,
+                            db: Session = Depends(get_db)):
+    """Avaliações paginadas por cursor: a próxima página vem no header X-Next-Cursor."""
+    return _pagina_avaliacoes(db, produto_id, ordem, limit, cursor)
 
 
 # Rotas compatíveis com frontend (root)
@@ -542,12 +811,14 @@ def create_avaliacao_root(payload: dict, session: str | None = Cookie(None), db:
         raise HTTPException(status_code=400, detail='produtoId and rating are required')
     if usuario_id is None:
         raise HTTPException(status_code=401, detail='Not authenticated')
+    _validar_rating(rating)
     return crud.create_avaliacao(db=db, usuario_id=int(usuario_id), produto_id=int(produto_id), rating=int(rating), comentario=comentario)
 
 
-@app.get("/avaliacoes/{produto_id}")
-def read_avaliacoes_root(produto_id: int, db: Session = Depends(get_db)):
-    return crud.get_avaliacoes_produto(db, produto_id=produto_id)
+@app.get("/avaliacoes/{produto_id}", response_model=List[schemas.Avaliacao])
+def read_avaliacoes_root(produto_id: int, ordem: str = 'recentes', limit: int = 50, cursor: Optional[str] = None,
+                         db: Session = Depends(get_db)):
+    return _pagina_avaliacoes(db, produto_id, ordem, limit, cursor)
 
 # Favoritos endpoints
 @app.post("/produtos/{produto_id}/favoritos/{usuario_id}")
@@ -653,6 +924,17 @@ def update_empresa(empresa_id: int, empresa: schemas.EmpresaCreate, db: Session
     db.refresh(db_empresa)
     return db_empresa
 
+@app.put("/empresas/{empresa_id}/estoque-minimo", response_model=schemas.Empresa)
+def update_empresa_estoque_minimo(empresa_id: int, payload: dict, db: Session = Depends(get_db)):
+    """Estoque mínimo padrão dos produtos da empresa: { "estoqueMinimoPadrao": 5 } (null desliga)."""
+    db_empresa = crud.get_empresa(db, empresa_id=empresa_id)
+    if db_empresa is None:
+        raise HTTPException(status_code=404, detail="Empresa not found")
+    db_empresa.estoque_minimo_padrao = _limite_estoque(payload, 'estoqueMinimoPadrao')
+    db.commit()
+    db.refresh(db_empresa)
+    return db_empresa
+
 @app.delete("/empresas/{empresa_id}")
 def delete_empresa(empresa_id: int, db: Session = Depends(get_db)):
     db_empresa = crud.get_empresa(db, empresa_id=empresa_id)
@@ -716,7 +998,7 @@ def replace_carrinho(payload: dict, session: str | None = Cookie(None), db: Sess
         raise HTTPException(status_code=401, detail='Not authenticated')
     itens = payload.get('itens') or payload.get('carrinho') or []
     try:
-        cart = crud.replace_carrinho_items(db, usuario_id=int(usuario_id), items=itens)
+        cart = write_coordinator.executar_escrita(db, lambda sessao: crud.replace_carrinho_items(sessao, usuario_id=int(usuario_id), items=itens))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Erro ao salvar carrinho: {e}')
     # retornar carrinho atualizado
@@ -740,7 +1022,7 @@ def add_item_carrinho(payload: dict, session: str | None = Cookie(None), db: Ses
     if produto_id is None:
         raise HTTPException(status_code=400, detail='produtoId is required')
     try:
-        cart = crud.add_item_to_carrinho(db, usuario_id=int(usuario_id), produto_id=int(produto_id), quantidade=int(quantidade))
+        cart = write_coordinator.executar_escrita(db, lambda sessao: crud.add_item_to_carrinho(sessao, usuario_id=int(usuario_id), produto_id=int(produto_id), quantidade=int(quantidade)))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Erro ao adicionar item: {e}')
     return { 'status': 'ok', 'carrinhoId': cart.id }
@@ -756,7 +1038,7 @@ def delete_item_carrinho(produto_id: int, session: str | None = Cookie(None), db
             usuario_id = None
     if usuario_id is None:
         raise HTTPException(status_code=401, detail='Not authenticated')
-    ok = crud.remove_item_from_carrinho(db, usuario_id=int(usuario_id), produto_id=produto_id)
+    ok = write_coordinator.executar_escrita(db, lambda sessao: crud.remove_item_from_carrinho(sessao, usuario_id=int(usuario_id), produto_id=produto_id))
     if not ok:
         raise HTTPException(status_code=404, detail='Item not found')
     return { 'status': 'success' }
@@ -791,14 +1073,68 @@ def read_movimentacoes(db: Session = Depends(get_db)):
     return result
 
 
+@app.get("/dashboard/resumo")
+def read_dashboard_resumo(db: Session = Depends(get_db)):
+    """Ocupação das mesas, comandas abertas, vendas do dia, mais vendidos e estoque baixo."""
+    return Response(content=dashboard.resumo_json(db), media_type="application/json")
+
+
+def _validar_rollup(granularidade: str, dimensao: str) -> None:
+    if granularidade not in vendas.GRANULARIDADES:
+        raise HTTPException(status_code=400, detail=f"granularidade must be one of: {', '.join(vendas.GRANULARIDADES)}")
+    if dimensao not in vendas.DIMENSOES:
+        raise HTTPException(status_code=400, detail=f"dimensao must be one of: {', '.join(vendas.DIMENSOES)}")
+
+
+@app.get("/vendas/serie")
+def read_vendas_serie(granularidade: str = 'dia', dimensao: str = 'total', inicio: Optional[datetime] = None,
+                      fim: Optional[datetime] = None, chave: Optional[str] = None, db: Session = Depends(get_db)):
+    """Pedidos, itens e receita por hora ou dia em [inicio, fim), lidos dos rollups."""
+    _validar_rollup(granularidade, dimensao)
+    inicio, fim = vendas.intervalo_padrao(granularidade, inicio, fim)
+    return vendas.serie(db, granularidade, dimensao, inicio, fim, chave=chave)
+
+
+@app.get("/vendas/ranking")
+def read_vendas_ranking(dimensao: str = 'produto', inicio: Optional[datetime] = None, fim: Optional[datetime] = None,
+                        limit: int = 10, db: Session = Depends(get_db)):
+    """Totais por produto, categoria, empresa ou tipo em [inicio, fim), maior receita primeiro."""
+    _validar_rollup('dia', dimensao)
+    granularidade = 'dia'
+    if (inicio is not None and inicio != inicio.replace(hour=0, minute=0, second=0, microsecond=0)) or \
+            (fim is not None and fim != fim.replace(hour=0, minute=0, second=0, microsecond=0)):
+        granularidade = 'hora'  # limites no meio do dia: somar as horas
+    inicio, fim = vendas.intervalo_padrao(granularidade, inicio, fim)
+    return vendas.ranking(db, dimensao, inicio, fim, limite=max(1, min(limit, 100)), granularidade=granularidade)
+
+
+@app.get("/estoque/baixo")
+def read_estoque_baixo(empresa_id: Optional[int] = None, limit: int = 200, db: Session = Depends(get_db)):
+    """Produtos com estoque no mínimo ou abaixo dele, os mais críticos primeiro."""
+    return estoque_minimo.listar_baixo(db, empresa_id=empresa_id, limite=limit)
+
+
+@app.get("/estoque/sugestoes")
+def read_sugestoes_reposicao(ate: Optional[date] = None, somente_repor: bool = False, limit: int = 200,
+                             db: Session = Depends(get_db)):
+    """Previsão de demanda por produto, data estimada de ruptura e quantidade sugerida de reposição.
+
+    Ordenadas pela ruptura mais próxima. `ate` fixa o último dia do histórico (padrão: hoje).
+    """
+    itens = previsao.sugestoes(db, ate)
+    if somente_repor:
+        itens = [s for s in itens if s['quantidadeSugerida'] > 0]
+    return itens[:max(1, min(limit, 5000))]
+
+
 @app.post("/estoque/movimentacoes", response_model=schemas.MovimentacaoEstoque)
 def create_movimentacao(mov: schemas.MovimentacaoEstoqueCreate, db: Session = Depends(get_db)):
     """Cria uma movimentação de estoque usando schema `MovimentacaoEstoqueCreate`.
     Campos esperados (camelCase): produtoId, quantidade, tipo, origem, observacoes, referencia, usuarioId
     """
-    try:
+    def _criar(sessao):
         db_mov = crud.create_movimentacao_estoque(
-            db=db,
+            db=sessao,
             produto_id=int(mov.produtoId),
             quantidade=int(mov.quantidade),
             tipo=str(mov.tipo),
@@ -806,6 +1142,11 @@ def create_movimentacao(mov: schemas.MovimentacaoEstoqueCreate, db: Session = De
             observacoes=mov.observacoes,
             usuario_id=mov.usuarioId
         )
+        db_mov.produto  # carregar antes de sair da sessão de escrita
+        return db_mov
+
+    try:
+        db_mov = write_coordinator.executar_escrita(db, _criar)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Erro ao criar movimentação: {e}')
 
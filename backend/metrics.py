@@ -0,0 +1,232 @@
+"""Métricas em memória expostas em formato texto do Prometheus (`GET /metrics`).
+
+- latência por rota (template, ex. `/mesas/{mesa_id}`, nunca a URL crua) em histograma;
+- contagem de respostas por rota e status;
+- requisições em andamento;
+- checkouts do pool de conexões do banco (tempo de posse e conexões em uso);
+- acertos/faltas dos caches em processo (`registrar_cache`), incluindo o cache
+  de SQL compilado do SQLAlchemy (`sqlalchemy_compiled`);
+- coletores extras registrados por outros módulos (`registrar_coletor`).
+
+Tudo é mantido por processo: com vários workers cada um expõe os próprios números.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import default as _sa_default
+
+# Limites superiores (segundos) dos buckets de latência
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ROTA_NAO_ENCONTRADA = "<sem rota>"
+
+
+def _escape(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Histograma:
+    """Histograma cumulativo com buckets fixos (sem alocação por observação)."""
+
+    __slots__ = ("contagens", "soma", "total")
+
+    def __init__(self):
+        self.contagens = [0] * (len(BUCKETS) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.contagens[bisect_left(BUCKETS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome: str, **labels) -> Iterable[str]:
+        acumulado = 0
+        for limite, qtd in zip(BUCKETS, self.contagens):
+            acumulado += qtd
+            yield f"{nome}_bucket{_labels(**labels, le=limite)} {acumulado}"
+        yield f"{nome}_bucket{_labels(**labels, le='+Inf')} {self.total}"
+        yield f"{nome}_sum{_labels(**labels)} {self.soma:.6f}"
+        yield f"{nome}_count{_labels(**labels)} {self.total}"
+
+
+class EstatisticasCache:
+    """Contadores de acerto/falta de um cache em processo."""
+
+    __slots__ = ("nome", "acertos", "faltas")
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.acertos = 0
+        self.faltas = 0
+
+    def acerto(self) -> None:
+        self.acertos += 1
+
+    def falta(self) -> None:
+        self.faltas += 1
+
+    @property
+    def taxa_acerto(self) -> float:
+        total = self.acertos + self.faltas
+        return self.acertos / total if total else 0.0
+
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias: Dict[Tuple[str, str], Histograma] = defaultdict(Histograma)
+        self.respostas: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.em_andamento = 0
+        self.pool_checkouts = 0
+        self.pool_conexoes_criadas = 0
+        self.pool_em_uso = 0
+        self.pool_posse = Histograma()
+        self.caches: Dict[str, EstatisticasCache] = {}
+        self.coletores: List[Callable[[], Iterable[str]]] = []
+        self.inicio = time.time()
+
+    # --- requisições ---
+    def inicio_requisicao(self) -> None:
+        with self._lock:
+            self.em_andamento += 1
+
+    def fim_requisicao(self, method: str, rota: str, status: int, duracao_s: float) -> None:
+        with self._lock:
+            self.em_andamento -= 1
+            self.latencias[(method, rota)].observar(duracao_s)
+            self.respostas[(method, rota, status)] += 1
+
+    # --- caches e coletores ---
+    def registrar_cache(self, nome: str) -> EstatisticasCache:
+        with self._lock:
+            if nome not in self.caches:
+                self.caches[nome] = EstatisticasCache(nome)
+            return self.caches[nome]
+
+    def registrar_coletor(self, coletor: Callable[[], Iterable[str]]) -> None:
+        """Registra uma função que devolve linhas prontas no formato do Prometheus."""
+        with self._lock:
+            self.coletores.append(coletor)
+
+    # --- pool do banco ---
+    def instrumentar_engine(self, engine) -> None:
+        cache_sql = self.registrar_cache("sqlalchemy_compiled")
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _cache_compilado(_conn, _cursor, _statement, _parameters, context, _executemany):
+            estado = getattr(context, "cache_hit", None)
+            if estado is _sa_default.CACHE_HIT:
+                cache_sql.acerto()
+            elif estado is _sa_default.CACHE_MISS:
+                cache_sql.falta()
+
+        def _entradas_cache():
+            cache = getattr(engine, "_compiled_cache", None)
+            return [
+                "# HELP sqlalchemy_compiled_cache_entries Statements compilados em cache no engine.",
+                "# TYPE sqlalchemy_compiled_cache_entries gauge",
+                f"sqlalchemy_compiled_cache_entries {len(cache) if cache is not None else 0}",
+                "# HELP sqlalchemy_compiled_cache_capacity Capacidade do cache (query_cache_size).",
+                "# TYPE sqlalchemy_compiled_cache_capacity gauge",
+                f"sqlalchemy_compiled_cache_capacity {getattr(cache, 'capacity', 0) if cache is not None else 0}",
+            ]
+        self.registrar_coletor(_entradas_cache)
+
+        @event.listens_for(engine, "connect")
+        def _connect(_dbapi_conn, _record):
+            with self._lock:
+                self.pool_conexoes_criadas += 1
+
+        @event.listens_for(engine, "checkout")
+        def _checkout(_dbapi_conn, record, _proxy):
+            record.info["metrics_checkout"] = time.perf_counter()
+            with self._lock:
+                self.pool_checkouts += 1
+                self.pool_em_uso += 1
+
+        @event.listens_for(engine, "checkin")
+        def _checkin(_dbapi_conn, record):
+            inicio = record.info.pop("metrics_checkout", None)
+            with self._lock:
+                self.pool_em_uso = max(0, self.pool_em_uso - 1)
+                if inicio is not None:
+                    self.pool_posse.observar(time.perf_counter() - inicio)
+
+    # --- exposição ---
+    def texto(self) -> str:
+        with self._lock:
+            latencias = {k: (list(h.contagens), h.soma, h.total) for k, h in self.latencias.items()}
+            respostas = dict(self.respostas)
+            em_andamento = self.em_andamento
+            pool = (self.pool_checkouts, self.pool_conexoes_criadas, self.pool_em_uso)
+            posse = (list(self.pool_posse.contagens), self.pool_posse.soma, self.pool_posse.total)
+            caches = [(c.nome, c.acertos, c.faltas, c.taxa_acerto) for c in self.caches.values()]
+            coletores = list(self.coletores)
+
+        def _hist(dados):
+            h = Histograma()
+            h.contagens, h.soma, h.total = dados
+            return h
+
+        linhas = [
+            "# HELP http_request_duration_seconds Latência das requisições por rota (template).",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, rota), dados in sorted(latencias.items()):
+            linhas.extend(_hist(dados).linhas("http_request_duration_seconds", method=method, route=rota))
+        linhas += ["# HELP http_responses_total Respostas por rota e status.", "# TYPE http_responses_total counter"]
+        for (method, rota, status), qtd in sorted(respostas.items()):
+            linhas.append(f"http_responses_total{_labels(method=method, route=rota, status=status)} {qtd}")
+        linhas += [
+            "# HELP http_requests_in_flight Requisições em andamento.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {em_andamento}",
+            "# HELP db_pool_checkouts_total Conexões retiradas do pool.",
+            "# TYPE db_pool_checkouts_total counter",
+            f"db_pool_checkouts_total {pool[0]}",
+            "# HELP db_pool_connections_created_total Conexões abertas com o banco.",
+            "# TYPE db_pool_connections_created_total counter",
+            f"db_pool_connections_created_total {pool[1]}",
+            "# HELP db_pool_checked_out Conexões do pool em uso agora.",
+            "# TYPE db_pool_checked_out gauge",
+            f"db_pool_checked_out {pool[2]}",
+            "# HELP db_pool_checkout_duration_seconds Tempo entre checkout e checkin de uma conexão.",
+            "# TYPE db_pool_checkout_duration_seconds histogram",
+        ]
+        linhas.extend(_hist(posse).linhas("db_pool_checkout_duration_seconds"))
+        linhas += [
+            "# HELP cache_hits_total Acertos de cache em processo.",
+            "# TYPE cache_hits_total counter",
+        ]
+        linhas += [f"cache_hits_total{_labels(cache=n)} {a}" for n, a, _f, _t in caches]
+        linhas += ["# HELP cache_misses_total Faltas de cache em processo.", "# TYPE cache_misses_total counter"]
+        linhas += [f"cache_misses_total{_labels(cache=n)} {f}" for n, _a, f, _t in caches]
+        linhas += ["# HELP cache_hit_ratio Proporção de acertos do cache.", "# TYPE cache_hit_ratio gauge"]
+        linhas += [f"cache_hit_ratio{_labels(cache=n)} {t:.4f}" for n, _a, _f, t in caches]
+        for coletor in coletores:
+            try:
+                linhas.extend(coletor())
+            except Exception:
+                linhas.append(f"# coletor {getattr(coletor, '__name__', coletor)} falhou")
+        linhas += [
+            "# HELP process_start_time_seconds Início do processo (epoch).",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.inicio:.3f}",
+        ]
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+registrar_cache = registro.registrar_cache
+registrar_coletor = registro.registrar_coletor
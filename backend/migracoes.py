@@ -0,0 +1,170 @@
+"""Migrações incrementais de esquema para bancos já existentes.
+
+`Base.metadata.create_all` só cria tabelas que faltam: colunas e índices
+novos em tabelas antigas precisam de ALTER TABLE / CREATE INDEX. Cada
+migração é uma função `fn(conn)` idempotente (confere antes de alterar e
+recalcula os dados do zero), registrada em `MIGRACOES` e marcada na tabela
+`migracoes` depois de aplicada. `aplicar(engine)` roda no startup da app e
+em `backend.servidor` antes de subir os workers; pode ser chamada também
+à mão:
+
+    python -m backend.migracoes
+"""
+import sys
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, inspect, select, text
+from sqlalchemy.exc import OperationalError
+
+from backend import models
+from backend.logging_config import logger
+
+_tabela_migracoes = Table(
+    "migracoes", MetaData(),
+    Column("nome", String(100), primary_key=True),
+    Column("aplicada_em", DateTime, server_default=func.now()),
+)
+
+
+def adicionar_coluna(conn, tabela: str, coluna: Column) -> bool:
+    """ALTER TABLE ... ADD COLUMN se a coluna ainda não existir; True se adicionou."""
+    existentes = {c["name"] for c in inspect(conn).get_columns(tabela)}
+    if coluna.name in existentes:
+        return False
+    ddl = f"ALTER TABLE {tabela} ADD COLUMN {coluna.name} {coluna.type.compile(conn.dialect)}"
+    if coluna.server_default is not None:
+        ddl += f" DEFAULT {coluna.server_default.arg}"
+        if not coluna.nullable:
+            ddl += " NOT NULL"
+    try:
+        conn.exec_driver_sql(ddl)
+    except OperationalError as e:
+        # Outro processo adicionou a coluna ao mesmo tempo
+        if "duplicate column" not in str(e).lower():
+            raise
+        return False
+    return True
+
+
+def criar_indices(conn, tabela) -> None:
+    for indice in tabela.indexes:
+        indice.create(bind=conn, checkfirst=True)
+
+
+def _m0001_agregados_avaliacoes(conn) -> None:
+    produto = models.Produto.__table__
+    for nome in ("rating_count", "rating_sum", "rating_1", "rating_2", "rating_3", "rating_4", "rating_5"):
+        adicionar_coluna(conn, "produtos", produto.c[nome])
+    criar_indices(conn, models.Avaliacao.__table__)
+    # Backfill a partir das avaliações existentes (notas fora de 1..5 só entram na contagem e na soma)
+    conn.execute(text("""
+        UPDATE produtos SET
+            rating_count = (SELECT count(*) FROM avaliacoes a WHERE a.produto_id = produtos.id),
+            rating_sum = (SELECT coalesce(sum(a.rating), 0) FROM avaliacoes a WHERE a.produto_id = produtos.id),
+            rating_1 = (SELECT count(*) FROM avaliacoes a WHERE a.produto_id = produtos.id AND a.rating = 1),
+            rating_2 = (SELECT count(*) FROM avaliacoes a WHERE a.produto_id = produtos.id AND a.rating = 2),
+            rating_3 = (SELECT count(*) FROM avaliacoes a WHERE a.produto_id = produtos.id AND a.rating = 3),
+            rating_4 = (SELECT count(*) FROM avaliacoes a WHERE a.produto_id = produtos.id AND a.rating = 4),
+            rating_5 = (SELECT count(*) FROM avaliacoes a WHERE a.produto_id = produtos.id AND a.rating = 5)
+    """))
+
+
+def _m0002_favoritos_unicos(conn) -> None:
+    # Remove duplicatas (fica a linha mais antiga) antes do índice único
+    removidas = conn.execute(text("""
+        DELETE FROM favoritos WHERE id NOT IN (
+            SELECT min(id) FROM favoritos GROUP BY usuario_id, produto_id
+        )
+    """)).rowcount
+    if removidas:
+        logger.info("Favoritos duplicados removidos: %d", removidas)
+    criar_indices(conn, models.Favorito.__table__)
+
+
+def _m0003_indice_vendas(conn) -> None:
+    criar_indices(conn, models.MovimentacaoEstoque.__table__)
+
+
+def _m0004_estoque_minimo(conn) -> None:
+    produto = models.Produto.__table__
+    adicionar_coluna(conn, "produtos", produto.c.estoque_minimo)
+    adicionar_coluna(conn, "produtos", produto.c.estoque_baixo)
+    adicionar_coluna(conn, "empresas", models.Empresa.__table__.c.estoque_minimo_padrao)
+    criar_indices(conn, produto)
+    conn.execute(text("""
+        UPDATE produtos SET estoque_baixo = CASE
+            WHEN coalesce(estoque, 0) <= coalesce(
+                estoque_minimo,
+                (SELECT e.estoque_minimo_padrao FROM empresas e WHERE e.id = produtos.empresa_id)
+            ) THEN 1 ELSE 0 END
+    """))
+
+
+def _m0005_outbox_autoincrement(conn) -> None:
+    if conn.dialect.name != "sqlite":
+        return  # sequências do Postgres nunca reaproveitam ids
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'outbox'")).scalar()
+    if ddl is None:
+        return  # create_all ainda vai criar a tabela, já com AUTOINCREMENT
+    if "AUTOINCREMENT" not in ddl.upper():
+        # O SQLite não altera a chave de uma tabela existente: recria e copia
+        colunas = ", ".join(c.name for c in models.MudancaOutbox.__table__.columns)
+        conn.exec_driver_sql("ALTER TABLE outbox RENAME TO outbox_antigo")
+        models.MudancaOutbox.__table__.create(bind=conn)
+        conn.exec_driver_sql(f"INSERT INTO outbox ({colunas}) SELECT {colunas} FROM outbox_antigo")
+        conn.exec_driver_sql("DROP TABLE outbox_antigo")
+    # Próximo id acima de tudo o que já foi gravado ou confirmado (ids já podem ter sido reaproveitados)
+    # sqlite_sequence não aparece em inspect().get_table_names()
+    tabelas = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+    proximo = conn.execute(text("SELECT coalesce(max(id), 0) FROM outbox")).scalar() or 0
+    if "outbox_consumidores" in tabelas:
+        cursor = conn.execute(text("SELECT coalesce(max(ultimo_id), 0) FROM outbox_consumidores")).scalar() or 0
+        proximo = max(proximo, cursor)
+    if "sqlite_sequence" not in tabelas:
+        # Criada pelo SQLite junto com a primeira tabela AUTOINCREMENT; só falta se a recriação acima não rodou
+        return
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'outbox'"))
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('outbox', :seq)"), {"seq": proximo})
+
+
+MIGRACOES: List[Tuple[str, Callable]] = [
+    ("0001_agregados_avaliacoes", _m0001_agregados_avaliacoes),
+    ("0002_favoritos_unicos", _m0002_favoritos_unicos),
+    ("0003_indice_vendas", _m0003_indice_vendas),
+    ("0004_estoque_minimo", _m0004_estoque_minimo),
+    ("0005_outbox_autoincrement", _m0005_outbox_autoincrement),
+]
+
+
+def aplicar(engine) -> List[str]:
+    """Aplica as migrações pendentes, em ordem; devolve os nomes aplicados."""
+    _tabela_migracoes.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        feitas = set(conn.execute(select(_tabela_migracoes.c.nome)).scalars())
+    aplicadas = []
+    for nome, fn in MIGRACOES:
+        if nome in feitas:
+            continue
+        with engine.begin() as conn:
+            fn(conn)
+            ja_marcada = conn.execute(
+                select(_tabela_migracoes.c.nome).where(_tabela_migracoes.c.nome == nome)
+            ).first()
+            if not ja_marcada:
+                conn.execute(_tabela_migracoes.insert().values(nome=nome))
+        logger.info("Migração aplicada: %s", nome)
+        aplicadas.append(nome)
+    return aplicadas
+
+
+def main(argv=None) -> int:
+    from backend.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    aplicadas = aplicar(engine)
+    print("\n".join(aplicadas) if aplicadas else "Nenhuma migração pendente")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
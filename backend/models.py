@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Numeric, Boolean, Enum, event
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Numeric, Boolean, Enum, Index, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -62,17 +62,24 @@ class Empresa(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     # slug para URLs amigáveis
     slug = Column(String(200), unique=True, nullable=True)
+    # Estoque mínimo dos produtos da empresa que não definem o próprio (ver backend/estoque_minimo.py)
+    estoque_minimo_padrao = Column(Integer, nullable=True)
 
     produtos = relationship("Produto", back_populates="empresa")
 
 
+def remover_acentos(text: str) -> str:
+    """Remove acentos e demais caracteres fora do ASCII (ex.: 'Pão de Açúcar' -> 'Pao de Acucar')."""
+    t = unicodedata.normalize('NFKD', text)
+    return t.encode('ascii', 'ignore').decode('ascii')
+
+
 def gerar_slug(text: str) -> str:
     """Gera um slug simples a partir de um texto (normaliza acentos, espaços e caracteres inválidos)."""
     if not text:
         return ''
     # normalizar acentos
-    t = unicodedata.normalize('NFKD', text)
-    t = t.encode('ascii', 'ignore').decode('ascii')
+    t = remover_acentos(text)
     t = t.strip()
 
     # Se o nome for somente números (ex: '1' ou '01'), produz 'Mesa-01'
@@ -91,6 +98,7 @@ def gerar_slug(text: str) -> str:
 
 class Produto(Base):
     __tablename__ = "produtos"
+    __table_args__ = (Index("ix_produtos_estoque_baixo", "estoque_baixo", "estoque"),)
 
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String(20), unique=True, index=True)
@@ -106,6 +114,17 @@ class Produto(Base):
     imagem = Column(String(255), nullable=True)
     slug = Column(String(200), unique=True, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Agregados das avaliações, mantidos por crud.create_avaliacao (ver backend/migracoes.py)
+    rating_count = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_sum = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_1 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_2 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_3 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_4 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_5 = Column(Integer, default=0, server_default="0", nullable=False)
+    # Estoque mínimo próprio (None = padrão da empresa) e se o estoque está nele ou abaixo
+    estoque_minimo = Column(Integer, nullable=True)
+    estoque_baixo = Column(Boolean, default=False, server_default="0", nullable=False)
 
     categoria = relationship("Categoria", back_populates="produtos")
     avaliacoes = relationship("Avaliacao", back_populates="produto")
@@ -114,6 +133,15 @@ class Produto(Base):
     pedido_itens = relationship("PedidoItem", back_populates="produto")
     empresa = relationship("Empresa", back_populates="produtos")
 
+    @property
+    def rating_histograma(self) -> list:
+        """Quantidade de avaliações com 1 a 5 estrelas."""
+        return [self.rating_1 or 0, self.rating_2 or 0, self.rating_3 or 0, self.rating_4 or 0, self.rating_5 or 0]
+
+    @property
+    def rating_media(self):
+        return round(self.rating_sum / self.rating_count, 2) if self.rating_count else None
+
 class Mesa(Base):
     __tablename__ = "mesas"
 
@@ -180,6 +208,11 @@ event.listen(PedidoItem, 'before_update', PedidoItem.before_update)
 
 class Avaliacao(Base):
     __tablename__ = "avaliacoes"
+    # Listagem paginada por produto (keyset): mais recentes ou por nota
+    __table_args__ = (
+        Index("ix_avaliacoes_produto_recentes", "produto_id", "created_at", "id"),
+        Index("ix_avaliacoes_produto_rating", "produto_id", "rating", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"))
@@ -193,6 +226,9 @@ class Avaliacao(Base):
 
 class Favorito(Base):
     __tablename__ = "favoritos"
+    __table_args__ = (
+        Index("uq_favoritos_usuario_produto", "usuario_id", "produto_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"))
@@ -229,6 +265,10 @@ class CarrinhoItem(Base):
 
 class MovimentacaoEstoque(Base):
     __tablename__ = "movimentacoes_estoque"
+    # Cobre a série diária de vendas da previsão de demanda (ver backend/previsao.py)
+    __table_args__ = (
+        Index("ix_movimentacoes_vendas", "tipo", "created_at", "origem", "produto_id", "quantidade"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     produto_id = Column(Integer, ForeignKey("produtos.id"))
@@ -253,4 +293,107 @@ class Pagamento(Base):
     status = Column(String(20))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    pedido = relationship("Pedido", back_populates="pagamentos")
\ No newline at end of file
+    pedido = relationship("Pedido", back_populates="pagamentos")
+
+
+class Job(Base):
+    """Tarefa em segundo plano persistida no banco (ver backend/jobs.py)."""
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_executar_em", "status", "executar_em"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(100), index=True)
+    payload = Column(Text, nullable=True)  # JSON
+    status = Column(String(20), default="pendente")  # pendente, executando, concluido, falhou
+    tentativas = Column(Integer, default=0)
+    max_tentativas = Column(Integer, default=5)
+    chave_idempotencia = Column(String(200), unique=True, nullable=True)
+    executar_em = Column(DateTime)
+    iniciado_em = Column(DateTime, nullable=True)
+    concluido_em = Column(DateTime, nullable=True)
+    bloqueado_por = Column(String(100), nullable=True)
+    erro = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class VersaoCache(Base):
+    """Versão por domínio de cache; incrementada a cada escrita (ver backend/invalidacao.py)."""
+    __tablename__ = "versoes_cache"
+
+    dominio = Column(String(50), primary_key=True)
+    versao = Column(Integer, default=0, nullable=False)
+
+
+class MudancaOutbox(Base):
+    """Registro compacto de uma mutação, gravado na mesma transação (ver backend/outbox.py)."""
+    __tablename__ = "outbox"
+    # Sem AUTOINCREMENT o SQLite reaproveita ids depois que a retenção esvazia a tabela,
+    # e consumidores com cursor à frente deixariam de ver as mudanças novas
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entidade = Column(String(50), nullable=False)  # pedido, pedido_item, mesa, produto, ...
+    entidade_id = Column(Integer, nullable=True)
+    operacao = Column(String(10), nullable=False)  # insert, update, delete
+    dados = Column(Text, nullable=True)  # JSON com os campos relevantes
+    created_at = Column(DateTime, nullable=False)
+
+
+class ConsumidorOutbox(Base):
+    """Posição de leitura de cada consumidor do feed `/changes`."""
+    __tablename__ = "outbox_consumidores"
+
+    nome = Column(String(100), primary_key=True)
+    ultimo_id = Column(Integer, default=0, nullable=False)
+    atualizado_em = Column(DateTime, nullable=True)
+
+
+class PedidoAnalisado(Base):
+    """Pedido fechado já contado nas coocorrências (ver backend/recomendacoes.py)."""
+    __tablename__ = "recomendacao_pedidos"
+
+    pedido_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+class FrequenciaProduto(Base):
+    """Número de pedidos fechados que contêm o produto."""
+    __tablename__ = "recomendacao_frequencias"
+
+    produto_id = Column(Integer, primary_key=True)
+    pedidos = Column(Integer, default=0, nullable=False)
+
+
+class Coocorrencia(Base):
+    """Pedidos fechados com os dois produtos; gravada nos dois sentidos (a, b) e (b, a)."""
+    __tablename__ = "recomendacao_coocorrencias"
+
+    produto_id = Column(Integer, primary_key=True)
+    outro_id = Column(Integer, primary_key=True)
+    pedidos = Column(Integer, default=0, nullable=False)
+
+
+class _RollupVendas:
+    """Colunas comuns das tabelas de rollup de vendas (ver backend/vendas.py)."""
+    dimensao = Column(String(20), primary_key=True)  # total, tipo, produto, categoria, empresa
+    inicio = Column(DateTime, primary_key=True)  # início do intervalo (hora ou dia)
+    chave = Column(String(50), primary_key=True)  # id ou tipo; "" para total
+    pedidos = Column(Integer, default=0, nullable=False)
+    itens = Column(Integer, default=0, nullable=False)
+    receita = Column(Numeric(14, 2), default=0, nullable=False)
+
+
+class VendasHora(_RollupVendas, Base):
+    __tablename__ = "vendas_por_hora"
+
+
+class VendasDia(_RollupVendas, Base):
+    __tablename__ = "vendas_por_dia"
+
+
+class PedidoContabilizado(Base):
+    """Pedido fechado já somado aos rollups de vendas."""
+    __tablename__ = "vendas_pedidos_contabilizados"
+
+    pedido_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
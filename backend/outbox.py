@@ -0,0 +1,182 @@
+"""Outbox de mudanças: cada mutação relevante vira uma linha em `outbox`.
+
+Um listener `after_flush` da Session olha os objetos novos, alterados e
+removidos de pedidos, itens, mesas, produtos, movimentações de estoque e
+pagamentos, e grava uma linha compacta por objeto: entidade, id, operação e os
+campos relevantes (`dados`, JSON). A linha vai na mesma transação da
+mutação, então só aparece se ela for confirmada. Vale para todos os caminhos
+que usam o ORM (`crud`, `main.py`, tarefas de `jobs`).
+
+`GET /changes?after=<id>&limit=` lê o feed em ordem de id (varredura pela
+chave primária). Com `consumer=<nome>`, a posição fica guardada em
+`outbox_consumidores`: sem `after`, a leitura continua de onde o consumidor
+parou, e ao passar `after=<id>` ele confirma que já processou tudo até `<id>`.
+
+A retenção (`outbox.limpar`, de hora em hora) apaga as linhas que todos os
+consumidores já confirmaram e estão há mais de OUTBOX_RETENCAO_HORAS no feed.
+Linhas com mais de OUTBOX_RETENCAO_MAX_DIAS são apagadas mesmo sem
+confirmação, para que um consumidor abandonado não faça a tabela crescer
+sem limite.
+
+    OUTBOX_ATIVO=true
+    OUTBOX_RETENCAO_HORAS=24
+    OUTBOX_RETENCAO_MAX_DIAS=7
+
+UPDATE/DELETE em massa (`session.execute(update(...))`) e SQL cru não passam
+pelo flush e não geram linhas.
+"""
+import json
+import os
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from backend import jobs, metrics, models
+from backend.database import SessionLocal
+from backend.logging_config import logger
+
+ATIVO = os.environ.get("OUTBOX_ATIVO", "true").lower() in ("1", "true", "yes", "sim")
+RETENCAO_HORAS = float(os.environ.get("OUTBOX_RETENCAO_HORAS", "24"))
+RETENCAO_MAX_DIAS = float(os.environ.get("OUTBOX_RETENCAO_MAX_DIAS", "7"))
+LIMITE_MAXIMO = 1000
+
+# Modelo -> (nome da entidade no feed, campos copiados para `dados`)
+RASTREADOS = {
+    models.Pedido: ("pedido", ("numero", "tipo", "status", "total", "mesa_id", "usuario_id")),
+    models.PedidoItem: ("pedido_item", ("pedido_id", "produto_id", "quantidade", "subtotal")),
+    models.Mesa: ("mesa", ("nome", "status", "usuario_responsavel_id")),
+    models.Produto: ("produto", ("codigo", "nome", "preco_venda", "estoque", "disponivel", "categoria_id",
+                                 "empresa_id")),
+    models.MovimentacaoEstoque: ("movimentacao_estoque", ("produto_id", "tipo", "origem", "quantidade",
+                                                          "quantidade_nova")),
+    models.Pagamento: ("pagamento", ("pedido_id", "valor", "forma_pagamento", "status")),
+}
+
+Mudanca = models.MudancaOutbox
+Consumidor = models.ConsumidorOutbox
+
+
+def _json(dados: Dict[str, object]) -> str:
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _linha(obj, operacao: str, agora) -> Optional[dict]:
+    entidade, campos = RASTREADOS[type(obj)]
+    if operacao == "update":
+        estado = inspect(obj)
+        alterados = [c for c in campos if estado.attrs[c].history.has_changes()]
+        if not alterados:
+            # Só relacionamentos ou colunas fora do feed mudaram (ex.: rating_*, estoque_minimo)
+            return None
+        dados = {c: getattr(obj, c) for c in alterados}
+    else:
+        dados = {c: getattr(obj, c) for c in campos}
+    return {"entidade": entidade, "entidade_id": obj.id, "operacao": operacao, "dados": _json(dados),
+            "created_at": agora}
+
+
+def _apos_flush(session: Session, _flush_context) -> None:
+    if not ATIVO:
+        return
+    agora = jobs.agora()
+    linhas = []
+    for objetos, operacao in ((session.new, "insert"), (session.dirty, "update"), (session.deleted, "delete")):
+        for obj in objetos:
+            if type(obj) in RASTREADOS:
+                linha = _linha(obj, operacao, agora)
+                if linha is not None:
+                    linhas.append(linha)
+    if linhas:
+        session.connection().execute(insert(Mudanca.__table__), linhas)
+
+
+event.listen(Session, "after_flush", _apos_flush)
+
+
+def registrar(conn, entidade: str, entidade_id: Optional[int], operacao: str, dados: Dict[str, object]) -> None:
+    """Grava uma mudança avulsa (ex.: alertas) na transação de `conn`."""
+    if ATIVO:
+        conn.execute(insert(Mudanca.__table__), {
+            "entidade": entidade, "entidade_id": entidade_id, "operacao": operacao, "dados": _json(dados),
+            "created_at": jobs.agora(),
+        })
+
+
+# --- leitura do feed ---
+
+def _upsert_consumidor(db: Session, nome: str, ultimo_id: int) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+    stmt = insert_dialeto(Consumidor).values(nome=nome, ultimo_id=ultimo_id, atualizado_em=jobs.agora())
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["nome"], set_={"ultimo_id": ultimo_id, "atualizado_em": stmt.excluded.atualizado_em},
+    ))
+
+
+def ler(db: Session, after: Optional[int] = None, limite: int = 100, consumidor: Optional[str] = None) -> dict:
+    """Mudanças com id > `after`, em ordem. Com `consumidor`, lê/grava a posição dele."""
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+    if consumidor:
+        if after is None:
+            after = db.execute(select(Consumidor.ultimo_id).where(Consumidor.nome == consumidor)).scalar() or 0
+        else:
+            _upsert_consumidor(db, consumidor, after)
+            db.commit()
+    after = after or 0
+    linhas = db.execute(
+        select(Mudanca.id, Mudanca.entidade, Mudanca.entidade_id, Mudanca.operacao, Mudanca.dados, Mudanca.created_at)
+        .where(Mudanca.id > after)
+        .order_by(Mudanca.id)
+        .limit(limite)
+    ).all()
+    mudancas = [
+        {"id": m.id, "entidade": m.entidade, "entidade_id": m.entidade_id, "operacao": m.operacao,
+         "dados": json.loads(m.dados) if m.dados else None, "created_at": m.created_at}
+        for m in linhas
+    ]
+    return {
+        "changes": mudancas,
+        "next": mudancas[-1]["id"] if mudancas else after,
+        "hasMore": len(mudancas) == limite,
+    }
+
+
+# --- retenção ---
+
+@jobs.tarefa("outbox.limpar")
+def limpar_outbox(db: Session, payload: dict) -> None:
+    agora = jobs.agora()
+    confirmadas = 0
+    minimo = db.execute(select(func.min(Consumidor.ultimo_id))).scalar()
+    if minimo:
+        limite = agora - timedelta(hours=float(payload.get("horas", RETENCAO_HORAS)))
+        confirmadas = db.execute(delete(Mudanca).where(Mudanca.id <= minimo, Mudanca.created_at < limite)).rowcount
+    limite_max = agora - timedelta(days=float(payload.get("max_dias", RETENCAO_MAX_DIAS)))
+    expiradas = db.execute(delete(Mudanca).where(Mudanca.created_at < limite_max)).rowcount
+    logger.info("Limpeza do outbox: %d confirmadas e %d expiradas removidas", confirmadas, expiradas)
+
+
+jobs.agendar("outbox-retencao", "15 * * * *", "outbox.limpar")
+
+
+def _linhas_metricas() -> List[str]:
+    with SessionLocal() as db:
+        ultimo = db.execute(select(func.max(Mudanca.id))).scalar() or 0
+        consumidores = db.execute(select(Consumidor.nome, Consumidor.ultimo_id)).all()
+    linhas = [
+        "# HELP outbox_last_id Último id gravado no outbox.",
+        "# TYPE outbox_last_id gauge",
+        f"outbox_last_id {ultimo}",
+        "# HELP outbox_consumer_lag Mudanças ainda não confirmadas por consumidor.",
+        "# TYPE outbox_consumer_lag gauge",
+    ]
+    linhas += [f'outbox_consumer_lag{{consumer="{metrics._escape(nome)}"}} {max(0, ultimo - pos)}'
+               for nome, pos in consumidores]
+    return linhas
+
+
+metrics.registrar_coletor(_linhas_metricas)
@@ -0,0 +1,246 @@
+"""Previsão de demanda e sugestões de reposição a partir das movimentações de estoque.
+
+As vendas diárias de todos os produtos saem de uma única consulta agrupada
+sobre `movimentacoes_estoque` (saídas com origem `venda_fisica`/`venda_online`
+nos últimos PREVISAO_JANELA_DIAS dias) e viram uma matriz produtos × dias.
+Sobre ela, para todos os produtos de uma vez:
+
+- sazonalidade semanal: índice de cada dia da semana (média do dia / média
+  geral), suavizado em direção a 1 enquanto houver poucas semanas de histórico;
+- suavização exponencial simples (PREVISAO_ALPHA) da série dessazonalizada,
+  que dá o nível de demanda diária;
+- média móvel dos últimos 7 dias, devolvida como referência.
+
+A demanda prevista de um dia futuro é nível × índice do dia da semana. O
+estoque atual (`Produto.estoque`) é consumido pela previsão dia a dia para
+estimar a data de ruptura. A quantidade sugerida cobre o prazo de entrega
+(PREVISAO_PRAZO_ENTREGA_DIAS) mais PREVISAO_COBERTURA_DIAS, com um estoque de
+segurança de PREVISAO_Z desvios da demanda diária.
+
+Com NumPy instalado (`pip install numpy`, opcional) os cálculos são
+vetorizados sobre a matriz. Sem ele, o mesmo cálculo roda produto a produto
+em Python puro e devolve os mesmos números.
+
+    PREVISAO_JANELA_DIAS=56
+    PREVISAO_HORIZONTE_DIAS=60      até onde procurar a data de ruptura
+    PREVISAO_PRAZO_ENTREGA_DIAS=3
+    PREVISAO_COBERTURA_DIAS=7
+    PREVISAO_ALPHA=0.3
+    PREVISAO_Z=1.65
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.orm import Session
+
+from backend import invalidacao, models
+from backend.logging_config import logger
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+JANELA_DIAS = int(os.environ.get("PREVISAO_JANELA_DIAS", "56"))
+HORIZONTE_DIAS = int(os.environ.get("PREVISAO_HORIZONTE_DIAS", "60"))
+PRAZO_ENTREGA_DIAS = int(os.environ.get("PREVISAO_PRAZO_ENTREGA_DIAS", "3"))
+COBERTURA_DIAS = int(os.environ.get("PREVISAO_COBERTURA_DIAS", "7"))
+ALPHA = float(os.environ.get("PREVISAO_ALPHA", "0.3"))
+Z = float(os.environ.get("PREVISAO_Z", "1.65"))
+ORIGENS_VENDA = ("venda_fisica", "venda_online")
+MEDIA_MOVEL_DIAS = 7
+# Peso (em semanas) do índice neutro 1.0 na sazonalidade
+SEMANAS_SUAVIZACAO = 2.0
+
+cache = invalidacao.CacheLocal("previsao", ("catalogo",), ttl_s=float(os.environ.get("PREVISAO_CACHE_TTL_S", "300")))
+
+
+def vendas_diarias(db: Session, inicio: date, fim: date) -> List[tuple]:
+    """Linhas (produto_id, 'AAAA-MM-DD', quantidade vendida) de `inicio` a `fim`, em uma consulta."""
+    mov = models.MovimentacaoEstoque
+    dia = func.date(mov.created_at) if db.get_bind().dialect.name == "sqlite" else cast(mov.created_at, Date)
+    # Coberta pelo índice ix_movimentacoes_vendas (tipo, created_at, origem, produto_id, quantidade)
+    return db.execute(
+        select(mov.produto_id, dia, func.sum(mov.quantidade))
+        .where(mov.tipo == "saida", mov.origem.in_(ORIGENS_VENDA),
+               mov.created_at >= datetime.combine(inicio, datetime.min.time()),
+               mov.created_at < datetime.combine(fim + timedelta(days=1), datetime.min.time()))
+        .group_by(mov.produto_id, dia)
+    ).all()
+
+
+# --- cálculo (NumPy) ---
+
+def _calcular_numpy(matriz: list, estoques: list, dows: list, dows_futuros: list) -> dict:
+    v = np.asarray(matriz, dtype=float).reshape(len(estoques), len(dows))
+    dow = np.asarray(dows)
+    semanas = np.bincount(dow, minlength=7).astype(float)
+    media = v.mean(axis=1)
+    soma_dow = np.stack([v[:, dow == d].sum(axis=1) for d in range(7)], axis=1)
+    media_dow = np.divide(soma_dow, semanas, out=np.zeros_like(soma_dow), where=semanas > 0)
+    bruto = np.divide(media_dow, media[:, None], out=np.ones_like(media_dow), where=media[:, None] > 0)
+    bruto[:, semanas == 0] = 1.0
+    indice = (semanas * bruto + SEMANAS_SUAVIZACAO) / (semanas + SEMANAS_SUAVIZACAO)
+    indice /= indice.mean(axis=1, keepdims=True)
+
+    dessaz = v / indice[:, dow]
+    nivel = dessaz[:, :MEDIA_MOVEL_DIAS].mean(axis=1)
+    for t in range(MEDIA_MOVEL_DIAS, v.shape[1]):
+        nivel = ALPHA * dessaz[:, t] + (1 - ALPHA) * nivel
+    desvio = v.std(axis=1)
+    media_movel = v[:, -MEDIA_MOVEL_DIAS:].mean(axis=1)
+
+    futuro = nivel[:, None] * indice[:, np.asarray(dows_futuros)]
+    estoque = np.asarray(estoques, dtype=float)
+    acumulado = np.cumsum(futuro, axis=1)
+    esgotou = acumulado >= estoque[:, None]
+    dias_ruptura = np.where(estoque <= 0, 0, np.where(esgotou.any(axis=1), esgotou.argmax(axis=1) + 1, -1))
+    periodo = PRAZO_ENTREGA_DIAS + COBERTURA_DIAS
+    demanda = acumulado[:, periodo - 1]
+    seguranca = Z * desvio * math.sqrt(PRAZO_ENTREGA_DIAS)
+    quantidade = np.maximum(0, np.ceil(demanda + seguranca - np.maximum(estoque, 0) - 1e-9))
+    return {
+        "nivel": nivel.tolist(), "media_movel": media_movel.tolist(), "demanda": demanda.tolist(),
+        "dias_ruptura": dias_ruptura.tolist(), "quantidade": quantidade.tolist(),
+    }
+
+
+# --- cálculo (Python puro, mesmo resultado) ---
+
+def _calcular_python(matriz: list, estoques: list, dows: list, dows_futuros: list) -> dict:
+    n_dias = len(dows)
+    semanas = [dows.count(d) for d in range(7)]
+    periodo = PRAZO_ENTREGA_DIAS + COBERTURA_DIAS
+    saida = {"nivel": [], "media_movel": [], "demanda": [], "dias_ruptura": [], "quantidade": []}
+    for i, estoque in enumerate(estoques):
+        v = matriz[i * n_dias:(i + 1) * n_dias]
+        media = sum(v) / n_dias
+        soma_dow = [0.0] * 7
+        for t, d in enumerate(dows):
+            soma_dow[d] += v[t]
+        indice = []
+        for d in range(7):
+            bruto = soma_dow[d] / semanas[d] / media if semanas[d] and media > 0 else 1.0
+            indice.append((semanas[d] * bruto + SEMANAS_SUAVIZACAO) / (semanas[d] + SEMANAS_SUAVIZACAO))
+        media_indice = sum(indice) / 7
+        indice = [x / media_indice for x in indice]
+
+        dessaz = [v[t] / indice[d] for t, d in enumerate(dows)]
+        nivel = sum(dessaz[:MEDIA_MOVEL_DIAS]) / MEDIA_MOVEL_DIAS
+        for t in range(MEDIA_MOVEL_DIAS, n_dias):
+            nivel = ALPHA * dessaz[t] + (1 - ALPHA) * nivel
+        desvio = math.sqrt(sum((x - media) ** 2 for x in v) / n_dias)
+
+        acumulado, dias_ruptura, demanda = 0.0, (0 if estoque <= 0 else -1), 0.0
+        for h, d in enumerate(dows_futuros, start=1):
+            acumulado += nivel * indice[d]
+            if dias_ruptura < 0 and acumulado >= estoque:
+                dias_ruptura = h
+            if h == periodo:
+                demanda = acumulado
+        seguranca = Z * desvio * math.sqrt(PRAZO_ENTREGA_DIAS)
+        saida["nivel"].append(nivel)
+        saida["media_movel"].append(sum(v[-MEDIA_MOVEL_DIAS:]) / MEDIA_MOVEL_DIAS)
+        saida["demanda"].append(demanda)
+        saida["dias_ruptura"].append(dias_ruptura)
+        saida["quantidade"].append(float(max(0, math.ceil(demanda + seguranca - max(estoque, 0) - 1e-9))))
+    return saida
+
+
+def calcular_sugestoes(db: Session, ate: Optional[date] = None, usar_numpy: Optional[bool] = None) -> List[dict]:
+    """Previsão e sugestão de reposição de todos os produtos, com histórico até `ate` (padrão: hoje)."""
+    ate = ate or datetime.now(timezone.utc).date()
+    inicio = ate - timedelta(days=JANELA_DIAS - 1)
+    dias = [inicio + timedelta(days=i) for i in range(JANELA_DIAS)]
+    futuros = [ate + timedelta(days=h) for h in range(1, max(HORIZONTE_DIAS, PRAZO_ENTREGA_DIAS + COBERTURA_DIAS) + 1)]
+
+    produto = models.Produto
+    produtos = db.execute(
+        select(produto.id, produto.codigo, produto.nome, produto.estoque).order_by(produto.id)
+    ).all()
+    if not produtos:
+        return []
+    n_dias = len(dias)
+    posicao = {p.id: i * n_dias for i, p in enumerate(produtos)}
+    coluna = {d.isoformat(): j for j, d in enumerate(dias)}
+    matriz = [0.0] * (len(produtos) * n_dias)
+    for produto_id, dia, quantidade in vendas_diarias(db, inicio, ate):
+        i, j = posicao.get(produto_id), coluna.get(str(dia)[:10])
+        if i is not None and j is not None:
+            matriz[i + j] = float(quantidade or 0)
+    estoques = [int(p.estoque or 0) for p in produtos]
+    args = (matriz, estoques, [d.weekday() for d in dias], [d.weekday() for d in futuros])
+    if usar_numpy is None:
+        usar_numpy = np is not None
+    r = _calcular_numpy(*args) if usar_numpy else _calcular_python(*args)
+
+    sugestoes = []
+    for i, p in enumerate(produtos):
+        dias_ruptura = int(r["dias_ruptura"][i])
+        sugestoes.append({
+            "produtoId": p.id,
+            "codigo": p.codigo,
+            "nome": p.nome,
+            "estoque": estoques[i],
+            "mediaMovel7d": round(r["media_movel"][i], 2),
+            "previsaoDiaria": round(r["nivel"][i], 2),
+            "demandaPeriodo": round(r["demanda"][i], 2),
+            "diasAteRuptura": dias_ruptura if dias_ruptura >= 0 else None,
+            "dataRuptura": (ate + timedelta(days=dias_ruptura)).isoformat() if dias_ruptura >= 0 else None,
+            "quantidadeSugerida": int(r["quantidade"][i]),
+        })
+    return sugestoes
+
+
+def sugestoes(db: Session, ate: Optional[date] = None) -> List[dict]:
+    """`calcular_sugestoes` em cache; ordenadas pela ruptura mais próxima."""
+    def _carregar():
+        inicio = time.perf_counter()
+        lista = calcular_sugestoes(db, ate)
+        lista.sort(key=lambda s: (s["diasAteRuptura"] is None, s["diasAteRuptura"] or 0, -s["quantidadeSugerida"]))
+        logger.info("Previsão de demanda: %d produtos em %.0f ms (%s)", len(lista),
+                    (time.perf_counter() - inicio) * 1000, "numpy" if np is not None else "python")
+        return lista
+    return cache.obter(("sugestoes", ate), _carregar)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Previsão de demanda e sugestões de reposição.")
+    parser.add_argument("--ate", default=None, help="Último dia do histórico (AAAA-MM-DD); padrão: hoje")
+    parser.add_argument("--comparar", action="store_true",
+                        help="Roda os cálculos com NumPy e em Python puro e compara os resultados")
+    parser.add_argument("--limite", type=int, default=20, help="Linhas impressas")
+    args = parser.parse_args(argv)
+
+    from backend.database import SessionLocal
+
+    ate = date.fromisoformat(args.ate) if args.ate else None
+    with SessionLocal() as db:
+        if args.comparar:
+            if np is None:
+                print("NumPy não instalado")
+                return 1
+            tempos = {}
+            resultados = {}
+            for nome, usar in (("numpy", True), ("python", False)):
+                inicio = time.perf_counter()
+                resultados[nome] = calcular_sugestoes(db, ate, usar_numpy=usar)
+                tempos[nome] = (time.perf_counter() - inicio) * 1000
+            iguais = resultados["numpy"] == resultados["python"]
+            print(f"{len(resultados['numpy'])} produtos: numpy {tempos['numpy']:.0f} ms, "
+                  f"python {tempos['python']:.0f} ms, resultados {'iguais' if iguais else 'DIFERENTES'}")
+            return 0 if iguais else 1
+        for s in sugestoes(db, ate)[:args.limite]:
+            print(f"{s['produtoId']:>6}  estoque {s['estoque']:>5}  prev/dia {s['previsaoDiaria']:>7.2f}  "
+                  f"ruptura {s['dataRuptura'] or '-':>10}  repor {s['quantidadeSugerida']:>5}  {s['nome']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Profiling sob demanda de uma requisição e snapshots de tracemalloc (somente admin).
+
+Chaves por requisição (cabeçalho ou query string), aceitas apenas quando o
+cookie de sessão pertence a um usuário `UserType.admin`:
+
+    X-Profile: cpu            amostra as pilhas da requisição e guarda o perfil (id em `X-Profile-Id`)
+    X-Profile: cpu-inline     idem, mas devolve as pilhas colapsadas no lugar da resposta
+    X-Tracemalloc: 1          diff de alocações entre o início e o fim da requisição (id em `X-Profile-Id`);
+                              se o tracemalloc estava desligado, volta a ser desligado no fim
+    ?__profile=cpu / ?__profile=cpu-inline / ?__tracemalloc=1   equivalentes via query string
+
+O perfil de CPU é amostral: uma thread lê `sys._current_frames()` a cada
+PROFILE_INTERVAL_MS e guarda apenas as pilhas que passam pelo endpoint da rota,
+no formato colapsado (`a;b;c 12`) aceito por flamegraph.pl/speedscope.
+Os resultados ficam em memória (últimos PROFILE_KEEP) e, se PROFILE_DIR estiver
+definido, também em disco. Para crescimento de memória entre vários pontos use
+as rotas /admin/tracemalloc/* registradas em main.py.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+
+from backend import crud, invalidacao
+from backend.database import SessionLocal
+from backend.logging_config import logger
+from backend.models import UserType
+
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", "10"))
+
+_ids = itertools.count(1)
+_perfis: "OrderedDict[str, dict]" = OrderedDict()
+_perfis_lock = threading.Lock()
+_tracemalloc_lock = threading.Lock()
+_ponto_tracemalloc: Optional[tracemalloc.Snapshot] = None
+# Rastreamento ligado só para requisições com X-Tracemalloc: desliga quando a última termina
+_iniciado_por_requisicao = False
+_requisicoes_rastreadas = 0
+
+
+def usuario_admin(session: Optional[str]) -> bool:
+    """True se o cookie de sessão pertence a um usuário admin."""
+    if not session:
+        return False
+    try:
+        user_id = int(session)
+    except (TypeError, ValueError):
+        return False
+
+    def _carregar() -> bool:
+        db = SessionLocal()
+        try:
+            user = crud.get_user(db, user_id=user_id)
+            return bool(user and user.tipo == UserType.admin)
+        finally:
+            db.close()
+
+    return invalidacao.cache_usuarios.obter(("admin", user_id), _carregar)
+
+
+def _guardar(tipo: str, rota: str, conteudo: str) -> str:
+    perfil_id = f"{int(time.time())}-{next(_ids)}"
+    with _perfis_lock:
+        _perfis[perfil_id] = {"id": perfil_id, "tipo": tipo, "rota": rota, "criado_em": time.time(), "conteudo": conteudo}
+        while len(_perfis) > PROFILE_KEEP:
+            _perfis.popitem(last=False)
+    if PROFILE_DIR:
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            ext = "collapsed" if tipo == "cpu" else "txt"
+            with open(os.path.join(PROFILE_DIR, f"{perfil_id}-{tipo}.{ext}"), "w", encoding="utf-8") as fh:
+                fh.write(conteudo)
+        except OSError:
+            logger.exception("Falha ao gravar perfil %s em %s", perfil_id, PROFILE_DIR)
+    return perfil_id
+
+
+def listar_perfis() -> list:
+    with _perfis_lock:
+        return [{k: v for k, v in p.items() if k != "conteudo"} for p in reversed(_perfis.values())]
+
+
+def obter_perfil(perfil_id: str) -> Optional[dict]:
+    with _perfis_lock:
+        return _perfis.get(perfil_id)
+
+
+class AmostradorPilhas:
+    """Amostra periodicamente as pilhas das threads que executam um endpoint."""
+
+    def __init__(self, alvo_code, intervalo_s: float):
+        self.alvo = alvo_code
+        self.intervalo = intervalo_s
+        self.pilhas: Counter = Counter()
+        self.amostras = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="profiler-sampler", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+    def _loop(self):
+        proprio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            for tid, frame in sys._current_frames().items():
+                if tid == proprio:
+                    continue
+                pilha = []
+                encontrou = False
+                f = frame
+                while f is not None:
+                    code = f.f_code
+                    pilha.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    if code is self.alvo:
+                        encontrou = True
+                        break
+                    f = f.f_back
+                if encontrou:
+                    self.pilhas[";".join(reversed(pilha))] += 1
+                    self.amostras += 1
+
+    def colapsado(self) -> str:
+        return "".join(f"{pilha} {qtd}\n" for pilha, qtd in self.pilhas.most_common())
+
+
+def _endpoint(request: Request):
+    for route in request.app.router.routes:
+        match, _child = route.matches(request.scope)
+        if match == Match.FULL:
+            return route
+    return None
+
+
+def _diff_tracemalloc(antes: tracemalloc.Snapshot, depois: tracemalloc.Snapshot, top: int = 25) -> list:
+    filtros = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    diffs = depois.filter_traces(filtros).compare_to(antes.filter_traces(filtros), "lineno")
+    return [
+        {
+            "local": str(d.traceback[0]) if d.traceback else "?",
+            "size_diff": d.size_diff,
+            "size": d.size,
+            "count_diff": d.count_diff,
+        }
+        for d in diffs[:top]
+    ]
+
+
+def _garantir_tracemalloc():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        logger.info("tracemalloc iniciado (%d frames)", TRACEMALLOC_FRAMES)
+
+
+def _snapshot_antes_requisicao() -> tracemalloc.Snapshot:
+    global _iniciado_por_requisicao, _requisicoes_rastreadas
+    with _tracemalloc_lock:
+        if not tracemalloc.is_tracing():
+            _garantir_tracemalloc()
+            _iniciado_por_requisicao = True
+        _requisicoes_rastreadas += 1
+        return tracemalloc.take_snapshot()
+
+
+def _snapshot_depois_requisicao() -> Optional[tracemalloc.Snapshot]:
+    """Snapshot final (None se o rastreamento foi parado no meio); desliga o que a requisição ligou."""
+    global _iniciado_por_requisicao, _requisicoes_rastreadas
+    with _tracemalloc_lock:
+        depois = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        _requisicoes_rastreadas -= 1
+        if _requisicoes_rastreadas == 0 and _iniciado_por_requisicao:
+            _iniciado_por_requisicao = False
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.info("tracemalloc parado (ligado só para a requisição)")
+        return depois
+
+
+def marcar_ponto_tracemalloc() -> dict:
+    """Tira um snapshot de referência para `diff_desde_ponto`."""
+    global _ponto_tracemalloc, _iniciado_por_requisicao
+    with _tracemalloc_lock:
+        _garantir_tracemalloc()
+        # Ponto marcado pelo admin: o rastreamento continua até /admin/tracemalloc/stop
+        _iniciado_por_requisicao = False
+        _ponto_tracemalloc = tracemalloc.take_snapshot()
+        atual, pico = tracemalloc.get_traced_memory()
+    return {"status": "ok", "memoria_rastreada": atual, "pico": pico}
+
+
+def diff_desde_ponto(top: int = 25) -> dict:
+    with _tracemalloc_lock:
+        if _ponto_tracemalloc is None:
+            return {"status": "sem_ponto", "diffs": []}
+        depois = tracemalloc.take_snapshot()
+        atual, pico = tracemalloc.get_traced_memory()
+        return {"status": "ok", "memoria_rastreada": atual, "pico": pico, "diffs": _diff_tracemalloc(_ponto_tracemalloc, depois, top)}
+
+
+def parar_tracemalloc() -> dict:
+    global _ponto_tracemalloc
+    with _tracemalloc_lock:
+        _ponto_tracemalloc = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+    return {"status": "ok"}
+
+
+async def chamar(request: Request, call_next):
+    """Encaminha a requisição; se houver chave de profiling válida, executa instrumentada."""
+    modo = request.headers.get("x-profile") or request.query_params.get("__profile")
+    memoria = request.headers.get("x-tracemalloc") or request.query_params.get("__tracemalloc")
+    if not modo and not memoria:
+        return await call_next(request)
+
+    if not await run_in_threadpool(usuario_admin, request.cookies.get("session")):
+        # Chave ignorada silenciosamente para não admins
+        return await call_next(request)
+
+    route = _endpoint(request)
+    rota = getattr(route, "path", request.url.path)
+
+    if memoria:
+        antes = await run_in_threadpool(_snapshot_antes_requisicao)
+        try:
+            response = await call_next(request)
+        finally:
+            depois = await run_in_threadpool(_snapshot_depois_requisicao)
+        if depois is None:
+            return response
+        linhas = [f"{d['size_diff']:+d} B {d['count_diff']:+d} blocos  {d['local']}" for d in _diff_tracemalloc(antes, depois)]
+        response.headers["X-Profile-Id"] = _guardar("tracemalloc", rota, "\n".join(linhas) + "\n")
+        return response
+
+    endpoint = getattr(route, "endpoint", None)
+    if endpoint is None or not hasattr(endpoint, "__code__"):
+        return await call_next(request)
+    with AmostradorPilhas(endpoint.__code__, PROFILE_INTERVAL_MS / 1000.0) as amostrador:
+        response = await call_next(request)
+    colapsado = amostrador.colapsado()
+    logger.info("Perfil de CPU de %s: %d amostras", rota, amostrador.amostras)
+    if modo == "cpu-inline":
+        return PlainTextResponse(colapsado)
+    response.headers["X-Profile-Id"] = _guardar("cpu", rota, colapsado)
+    return response
@@ -0,0 +1,140 @@
+"""Captura de EXPLAIN QUERY PLAN por statement distinto (dev/staging).
+
+Com QUERY_PLAN_CAPTURE=true, cada statement distinto executado pela aplicação
+tem o plano obtido uma única vez (cache por texto do statement) e acumula
+contagem de chamadas e tempo total. Planos com `SCAN` em tabelas grandes
+(varredura completa, mesmo que "USING INDEX" só para ordenação) geram um aviso
+no log na primeira vez em que aparecem. O relatório fica em
+`GET /admin/query-plans`.
+
+    QUERY_PLAN_CAPTURE=true
+    QUERY_PLAN_LARGE_TABLES=pedidos,pedido_itens,...   tabelas em que SCAN é alertado
+    QUERY_PLAN_MAX_STATEMENTS=2000                     limite de statements distintos guardados
+
+Somente SQLite (EXPLAIN QUERY PLAN é específico dele).
+"""
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from backend.logging_config import logger
+
+CAPTURA_ATIVA = os.environ.get("QUERY_PLAN_CAPTURE", "false").lower() in ("1", "true", "yes", "sim")
+TABELAS_GRANDES = {
+    t.strip() for t in os.environ.get(
+        "QUERY_PLAN_LARGE_TABLES",
+        "pedidos,pedido_itens,movimentacoes_estoque,produtos,usuarios,avaliacoes,favoritos,carrinho_items,pagamentos",
+    ).split(",") if t.strip()
+}
+MAX_STATEMENTS = int(os.environ.get("QUERY_PLAN_MAX_STATEMENTS", "2000"))
+
+_RE_SCAN = re.compile(r"^SCAN (\w+)")
+_EXPLICAVEIS = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+class PlanoStatement:
+    __slots__ = ("statement", "plano", "chamadas", "tempo_s", "scans")
+
+    def __init__(self, statement: str, plano: List[str], scans: List[str]):
+        self.statement = statement
+        self.plano = plano
+        self.scans = scans
+        self.chamadas = 0
+        self.tempo_s = 0.0
+
+    def como_dict(self) -> dict:
+        return {
+            "statement": self.statement,
+            "plano": self.plano,
+            "scans_tabelas_grandes": self.scans,
+            "chamadas": self.chamadas,
+            "tempo_total_ms": round(self.tempo_s * 1000, 3),
+            "tempo_medio_ms": round(self.tempo_s * 1000 / self.chamadas, 3) if self.chamadas else None,
+        }
+
+
+_planos: Dict[str, PlanoStatement] = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _explicar(cursor, statement: str, parameters, executemany: bool) -> Optional[List[tuple]]:
+    params = parameters[0] if executemany and parameters else parameters
+    cur = cursor.connection.cursor()
+    try:
+        cur.execute("EXPLAIN QUERY PLAN " + statement, params or ())
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def _formatar(linhas: List[tuple]) -> List[str]:
+    """Converte (id, parent, notused, detail) em linhas indentadas como o shell do sqlite."""
+    profundidade = {0: -1}
+    saida = []
+    for row in linhas:
+        node_id, parent, detail = row[0], row[1], row[-1]
+        nivel = profundidade.get(parent, -1) + 1
+        profundidade[node_id] = nivel
+        saida.append("  " * nivel + str(detail))
+    return saida
+
+
+def observar(cursor, statement: str, parameters, executemany: bool, duracao_s: float) -> None:
+    """Observador de `query_stats`: acumula estatísticas e captura o plano na primeira execução."""
+    if getattr(_local, "explicando", False):
+        return
+    registro = _planos.get(statement)
+    if registro is None:
+        if len(_planos) >= MAX_STATEMENTS:
+            return
+        plano, scans = [], []
+        if statement.lstrip().upper().startswith(_EXPLICAVEIS):
+            _local.explicando = True
+            try:
+                linhas = _explicar(cursor, statement, parameters, executemany) or []
+                plano = _formatar(linhas)
+                for linha in linhas:
+                    m = _RE_SCAN.match(str(linha[-1]))
+                    if m and m.group(1) in TABELAS_GRANDES:
+                        scans.append(str(linha[-1]))
+            except Exception as e:
+                plano = [f"<falha ao obter plano: {e}>"]
+            finally:
+                _local.explicando = False
+        with _lock:
+            registro = _planos.setdefault(statement, PlanoStatement(statement, plano, scans))
+        if scans:
+            logger.warning("Varredura completa em tabela grande (%s): %s", "; ".join(scans), " ".join(statement.split())[:300])
+    with _lock:
+        registro.chamadas += 1
+        registro.tempo_s += duracao_s
+
+
+def relatorio(ordenar: str = "tempo", somente_scans: bool = False, limite: int = 100) -> List[dict]:
+    with _lock:
+        itens = list(_planos.values())
+        if somente_scans:
+            itens = [p for p in itens if p.scans]
+        chave = {"tempo": lambda p: p.tempo_s, "chamadas": lambda p: p.chamadas}.get(ordenar, lambda p: p.tempo_s)
+        itens.sort(key=chave, reverse=True)
+        return [p.como_dict() for p in itens[:limite]]
+
+
+def limpar() -> None:
+    with _lock:
+        _planos.clear()
+
+
+def instalar(engine) -> bool:
+    """Registra o observador se a captura estiver ativa e o banco for SQLite."""
+    if not CAPTURA_ATIVA:
+        return False
+    if engine.dialect.name != "sqlite":
+        logger.warning("QUERY_PLAN_CAPTURE ignorado: dialeto %s não suportado", engine.dialect.name)
+        return False
+    from backend import query_stats
+    query_stats.adicionar_observador(observar)
+    logger.info("Captura de planos de consulta ativa (tabelas grandes: %s)", ", ".join(sorted(TABELAS_GRANDES)))
+    return True
@@ -0,0 +1,148 @@
+"""Instrumentação de SQL por requisição: contagem, tempo e suspeitas de N+1.
+
+Os eventos `before_cursor_execute`/`after_cursor_execute` do engine acumulam,
+para a requisição corrente (via ContextVar), a quantidade de consultas, o tempo
+total no banco e quantas vezes cada forma de statement se repetiu. Como os
+statements chegam parametrizados (`... WHERE produtos.id = ?`), a mesma forma
+repetida várias vezes em uma requisição é o sintoma típico de N+1.
+
+Configuração por variáveis de ambiente:
+
+    QUERY_STATS_HEADERS=true          adiciona `Server-Timing` e `X-Query-Count` (dev)
+    SLOW_QUERY_MS=100                 loga statements mais lentos que isso
+    QUERY_N_PLUS_ONE_THRESHOLD=5      repetições da mesma forma que geram aviso de N+1
+    QUERY_BUDGETS="GET /mesas/=3,GET /produtos/=2"   orçamento de consultas por rota
+    QUERY_BUDGET_DEFAULT=0            orçamento para rotas sem valor próprio (0 = sem limite)
+    QUERY_BUDGET_ENFORCE=true         modo teste: estourar o orçamento vira resposta 500
+"""
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+
+from backend.logging_config import logger
+
+
+def _env_bool(nome: str, padrao: bool = False) -> bool:
+    return os.environ.get(nome, str(padrao)).lower() in ("1", "true", "yes", "sim")
+
+
+def _parse_orcamentos(valor: str) -> Dict[str, int]:
+    orcamentos = {}
+    for parte in valor.split(","):
+        if "=" not in parte:
+            continue
+        rota, _, limite = parte.rpartition("=")
+        try:
+            orcamentos[rota.strip()] = int(limite)
+        except ValueError:
+            logger.warning("QUERY_BUDGETS: valor inválido para %s", rota)
+    return orcamentos
+
+
+HEADERS_ATIVOS = _env_bool("QUERY_STATS_HEADERS")
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("QUERY_N_PLUS_ONE_THRESHOLD", "5"))
+ORCAMENTOS: Dict[str, int] = _parse_orcamentos(os.environ.get("QUERY_BUDGETS", ""))
+ORCAMENTO_PADRAO = int(os.environ.get("QUERY_BUDGET_DEFAULT", "0"))
+ORCAMENTO_ESTRITO = _env_bool("QUERY_BUDGET_ENFORCE")
+
+
+class EstatisticasConsultas:
+    """Consultas executadas durante uma requisição."""
+
+    __slots__ = ("quantidade", "tempo_s", "formas")
+
+    def __init__(self):
+        self.quantidade = 0
+        self.tempo_s = 0.0
+        self.formas: Counter = Counter()
+
+    def registrar(self, statement: str, duracao_s: float) -> None:
+        self.quantidade += 1
+        self.tempo_s += duracao_s
+        self.formas[statement] += 1
+
+    def suspeitas_n_mais_um(self, limite: int = N_PLUS_ONE_THRESHOLD) -> List[tuple]:
+        return [(stmt, qtd) for stmt, qtd in self.formas.most_common() if qtd >= limite]
+
+
+_atual: ContextVar[Optional[EstatisticasConsultas]] = ContextVar("query_stats", default=None)
+
+# Funções chamadas após cada statement com (cursor, statement, parameters, executemany, duracao_s)
+_observadores: List[Callable] = []
+
+
+def adicionar_observador(fn: Callable) -> None:
+    _observadores.append(fn)
+
+
+def atual() -> Optional[EstatisticasConsultas]:
+    """Estatísticas da requisição corrente (None fora de uma requisição)."""
+    return _atual.get()
+
+
+def _resumir(statement: str, tamanho: int = 300) -> str:
+    stmt = " ".join(statement.split())
+    return stmt if len(stmt) <= tamanho else stmt[:tamanho] + "..."
+
+
+def instrumentar_engine(engine) -> None:
+    # O início fica no contexto da execução, e não na conexão: se o comando falhar,
+    # after_cursor_execute não roda e nada sobra na conexão devolvida ao pool
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_stats_inicio = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, "_query_stats_inicio", None)
+        if inicio is None:
+            return
+        duracao = time.perf_counter() - inicio
+        stats = _atual.get()
+        if stats is not None:
+            stats.registrar(statement, duracao)
+        if duracao * 1000 >= SLOW_QUERY_MS:
+            logger.warning("Consulta lenta (%.1f ms): %s", duracao * 1000, _resumir(statement))
+        for observador in _observadores:
+            observador(cursor, statement, parameters, executemany, duracao)
+
+
+def iniciar_requisicao() -> EstatisticasConsultas:
+    stats = EstatisticasConsultas()
+    _atual.set(stats)
+    return stats
+
+
+def orcamento(chave_rota: str) -> int:
+    return ORCAMENTOS.get(chave_rota, ORCAMENTO_PADRAO)
+
+
+def finalizar_requisicao(stats: EstatisticasConsultas, chave_rota: str, response, duracao_s: float):
+    """Loga N+1/orçamento estourado e adiciona cabeçalhos; pode substituir a resposta no modo estrito."""
+    for stmt, qtd in stats.suspeitas_n_mais_um():
+        logger.warning("Possível N+1 em %s: %d execuções de %s", chave_rota, qtd, _resumir(stmt, 200))
+
+    limite = orcamento(chave_rota)
+    if limite and stats.quantidade > limite:
+        logger.error("Orçamento de consultas estourado em %s: %d > %d", chave_rota, stats.quantidade, limite)
+        if ORCAMENTO_ESTRITO:
+            response = JSONResponse(status_code=500, content={
+                "detail": f"Query budget exceeded for {chave_rota}: {stats.quantidade} > {limite}",
+                "queries": stats.quantidade,
+                "repetidas": {_resumir(s, 200): q for s, q in stats.suspeitas_n_mais_um(2)},
+            })
+
+    if HEADERS_ATIVOS:
+        response.headers["X-Query-Count"] = str(stats.quantidade)
+        response.headers["Server-Timing"] = (
+            f'db;dur={stats.tempo_s * 1000:.2f};desc="{stats.quantidade} queries", '
+            f'app;dur={duracao_s * 1000:.2f}'
+        )
+    return response
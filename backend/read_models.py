@@ -0,0 +1,172 @@
+"""Consultas de leitura para as listagens: só as colunas que a resposta usa.
+
+Em vez de hidratar entidades ORM completas (identity map, estado de cada
+instância, relacionamentos preguiçosos), estas funções selecionam colunas e
+devolvem dicts simples já no formato dos schemas de resposta
+(`schemas.Produto`, `schemas.Pedido`, `schemas.User`). Nada de relacionamento
+é carregado sob demanda e `User.password` nunca sai do banco.
+"""
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+_PRODUTO = models.Produto
+_CATEGORIA = models.Categoria
+_PEDIDO = models.Pedido
+_ITEM = models.PedidoItem
+_USER = models.User
+_AVALIACAO = models.Avaliacao
+
+
+def select_produtos():
+    """SELECT das colunas de `schemas.Produto` (com a categoria); combine com `produto_de_linha`."""
+    return (
+        select(
+            _PRODUTO.id, _PRODUTO.codigo, _PRODUTO.nome, _PRODUTO.descricao,
+            _PRODUTO.preco_compra, _PRODUTO.preco_venda, _PRODUTO.categoria_id,
+            _PRODUTO.estoque, _PRODUTO.created_at,
+            _CATEGORIA.id, _CATEGORIA.nome, _CATEGORIA.descricao,
+            _PRODUTO.rating_count, _PRODUTO.rating_sum, _PRODUTO.rating_1, _PRODUTO.rating_2,
+            _PRODUTO.rating_3, _PRODUTO.rating_4, _PRODUTO.rating_5,
+            _PRODUTO.estoque_minimo, _PRODUTO.estoque_baixo,
+        )
+        .outerjoin(_CATEGORIA, _CATEGORIA.id == _PRODUTO.categoria_id)
+    )
+
+
+def produto_de_linha(linha) -> dict:
+    (pid, codigo, nome, descricao, compra, venda, categoria_id, estoque, criado,
+     cat_id, cat_nome, cat_descricao, rating_count, rating_sum, *histograma) = linha[:19]
+    estoque_minimo, estoque_baixo = linha[19:21]
+    return {
+        "id": pid, "codigo": codigo, "nome": nome, "descricao": descricao,
+        "preco_compra": compra, "preco_venda": venda, "categoria_id": categoria_id,
+        "estoque": estoque, "created_at": criado,
+        # Produto sem categoria falha na validação do schema, como no caminho ORM
+        "categoria": None if cat_id is None else {"id": cat_id, "nome": cat_nome, "descricao": cat_descricao},
+        "rating_count": rating_count or 0,
+        "rating_media": round(rating_sum / rating_count, 2) if rating_count else None,
+        "rating_histograma": [h or 0 for h in histograma],
+        "estoque_minimo": estoque_minimo,
+        "estoque_baixo": bool(estoque_baixo),
+    }
+
+
+def listar_produtos(db: Session, skip: int = 0, limit: int = 100, filtros: Optional[dict] = None) -> List[dict]:
+    stmt = select_produtos()
+    if filtros:
+        from backend.facetas import condicoes
+        stmt = stmt.where(*condicoes(filtros))
+    stmt = stmt.order_by(_PRODUTO.id).offset(skip).limit(limit)
+    return [produto_de_linha(linha) for linha in db.execute(stmt)]
+
+
+def itens_por_pedido(db: Session, pedido_ids: List[int]) -> dict:
+    """Itens de vários pedidos em uma única consulta (IN), agrupados por pedido_id."""
+    agrupados = defaultdict(list)
+    if not pedido_ids:
+        return agrupados
+    stmt = (
+        select(_ITEM.id, _ITEM.pedido_id, _ITEM.produto_id, _ITEM.quantidade,
+               _ITEM.preco_unitario, _ITEM.subtotal)
+        .where(_ITEM.pedido_id.in_(pedido_ids))
+        .order_by(_ITEM.id)
+    )
+    for iid, pedido_id, produto_id, quantidade, unitario, subtotal in db.execute(stmt):
+        agrupados[pedido_id].append({
+            "id": iid, "pedido_id": pedido_id, "produto_id": produto_id,
+            "quantidade": quantidade, "preco_unitario": unitario, "subtotal": subtotal,
+        })
+    return agrupados
+
+
+def listar_pedidos(db: Session, skip: int = 0, limit: int = 100, tipo: Optional[str] = None) -> List[dict]:
+    stmt = select(
+        _PEDIDO.id, _PEDIDO.numero, _PEDIDO.tipo, _PEDIDO.status, _PEDIDO.total,
+        _PEDIDO.observacoes, _PEDIDO.mesa_id, _PEDIDO.created_at,
+    )
+    if tipo:
+        stmt = stmt.where(_PEDIDO.tipo == tipo)
+    stmt = stmt.order_by(_PEDIDO.id).offset(skip).limit(limit)
+    pedidos = [
+        {"id": pid, "numero": numero, "tipo": ptipo, "status": status, "total": total,
+         "observacoes": obs, "mesa_id": mesa_id, "created_at": criado}
+        for pid, numero, ptipo, status, total, obs, mesa_id, criado in db.execute(stmt)
+    ]
+    itens = itens_por_pedido(db, [p["id"] for p in pedidos])
+    for pedido in pedidos:
+        pedido["itens"] = itens.get(pedido["id"], [])
+    return pedidos
+
+
+def listar_usuarios(db: Session, skip: int = 0, limit: int = 100) -> List[dict]:
+    stmt = (
+        select(_USER.id, _USER.username, _USER.email, _USER.nome, _USER.tipo, _USER.created_at)
+        .order_by(_USER.id)
+        .offset(skip).limit(limit)
+    )
+    return [
+        {"id": uid, "username": username, "email": email, "nome": nome, "tipo": utipo, "created_at": criado}
+        for uid, username, email, nome, utipo, criado in db.execute(stmt)
+    ]
+
+
+# Avaliações: paginação por keyset (sem OFFSET), com o nome de quem avaliou no mesmo SELECT
+ORDENS_AVALIACOES = ("recentes", "rating")
+
+
+def _cursor(ordem: str, valor, aid: int) -> str:
+    bruto = json.dumps([ordem, valor.isoformat() if isinstance(valor, datetime) else valor, aid])
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def _ler_cursor(cursor: str, ordem: str):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_ordem, valor, aid = json.loads(bruto)
+    except Exception:
+        raise ValueError("cursor inválido")
+    if c_ordem != ordem:
+        raise ValueError("cursor de outra ordenação")
+    if ordem == "recentes" and valor is not None:
+        valor = datetime.fromisoformat(valor)
+    return valor, int(aid)
+
+
+def listar_avaliacoes(db: Session, produto_id: int, ordem: str = "recentes", limit: int = 20,
+                      cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """Uma página de avaliações do produto e o cursor da próxima (None na última).
+
+    `recentes`: created_at desc, id desc; `rating`: nota desc, id desc.
+    """
+    if ordem not in ORDENS_AVALIACOES:
+        raise ValueError(f"ordem deve ser uma de: {', '.join(ORDENS_AVALIACOES)}")
+    chave = _AVALIACAO.created_at if ordem == "recentes" else _AVALIACAO.rating
+    stmt = (
+        select(_AVALIACAO.id, _AVALIACAO.usuario_id, _AVALIACAO.produto_id, _AVALIACAO.rating,
+               _AVALIACAO.comentario, _AVALIACAO.created_at, _USER.nome)
+        .outerjoin(_USER, _USER.id == _AVALIACAO.usuario_id)
+        .where(_AVALIACAO.produto_id == produto_id)
+    )
+    if cursor:
+        valor, aid = _ler_cursor(cursor, ordem)
+        stmt = stmt.where(or_(chave < valor, and_(chave == valor, _AVALIACAO.id < aid)))
+    stmt = stmt.order_by(chave.desc(), _AVALIACAO.id.desc()).limit(limit + 1)
+    linhas = db.execute(stmt).all()
+    avaliacoes = [
+        {"id": aid, "usuario_id": usuario_id, "produto_id": pid, "rating": rating, "comentario": comentario,
+         "created_at": criado, "usuario_nome": nome}
+        for aid, usuario_id, pid, rating, comentario, criado, nome in linhas[:limit]
+    ]
+    proximo = None
+    if len(linhas) > limit:
+        ultima = avaliacoes[-1]
+        proximo = _cursor(ordem, ultima["created_at"] if ordem == "recentes" else ultima["rating"], ultima["id"])
+    return avaliacoes, proximo
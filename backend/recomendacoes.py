@@ -0,0 +1,207 @@
+"""Recomendações "comprados juntos" a partir dos pedidos fechados.
+
+A matriz produto × produto de coocorrências é esparsa e fica no banco:
+`recomendacao_coocorrencias` guarda, para cada par que já apareceu junto, em
+quantos pedidos isso aconteceu (nos dois sentidos, para ler pela chave
+primária a partir de qualquer produto). `recomendacao_frequencias` guarda em
+quantos pedidos cada produto aparece, e `recomendacao_pedidos` quais pedidos
+já foram contados. O total de linhas dessa última é o N do lift.
+
+A atualização é incremental. Quando um pedido fecha (`tarefas.STATUS_FECHADOS`),
+a tarefa `recomendacoes.pedido` é enfileirada com chave de idempotência e soma
+a cesta do pedido às contagens. Um pedido já registrado em
+`recomendacao_pedidos` nunca é somado de novo.
+
+`GET /produtos/{id}/recomendados?k=10` ordena os parceiros pelo lift
+
+    lift(a, b) = pedidos(a, b) * N / (pedidos(a) * pedidos(b))
+
+ignorando pares vistos em menos de RECOMENDACOES_SUPORTE_MIN pedidos e
+produtos indisponíveis. As respostas ficam em um cache em processo por
+RECOMENDACOES_CACHE_TTL_S segundos, limpo quando o catálogo muda.
+
+Para contar o histórico (ou refazer tudo do zero), use:
+
+    python -m backend.recomendacoes --reconstruir --lote 500
+
+A reconstrução lê os pedidos fechados em lotes pela chave primária e grava
+cada lote em uma transação. A memória usada depende do tamanho do lote, não
+do histórico.
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+from itertools import permutations
+from typing import Dict, Iterable, List
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from backend import invalidacao, jobs, models, read_models, tarefas
+from backend.logging_config import logger
+
+SUPORTE_MINIMO = int(os.environ.get("RECOMENDACOES_SUPORTE_MIN", "2"))
+MAX_PRODUTOS_POR_PEDIDO = int(os.environ.get("RECOMENDACOES_MAX_PRODUTOS", "30"))
+CACHE_TTL_S = float(os.environ.get("RECOMENDACOES_CACHE_TTL_S", "300"))
+K_PADRAO = 10
+K_MAXIMO = 50
+
+Analisado = models.PedidoAnalisado
+Frequencia = models.FrequenciaProduto
+Coocorrencia = models.Coocorrencia
+
+cache = invalidacao.CacheLocal("recomendacoes", ("catalogo",), ttl_s=CACHE_TTL_S)
+
+
+def _somar(db: Session, modelo, chaves: List[str], linhas: List[dict]) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE SET pedidos = pedidos + novo."""
+    if not linhas:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+    tabela = modelo.__table__
+    stmt = insert_dialeto(tabela)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=chaves, set_={"pedidos": tabela.c.pedidos + stmt.excluded.pedidos},
+    ), linhas)
+
+
+def acumular(db: Session, cestas: Dict[int, Iterable[int]]) -> int:
+    """Soma as cestas (pedido_id -> produtos) às contagens; devolve quantos pedidos eram novos."""
+    if not cestas:
+        return 0
+    ja_contados = set(db.execute(select(Analisado.pedido_id).where(Analisado.pedido_id.in_(list(cestas)))).scalars())
+    frequencias, pares, novos = Counter(), Counter(), []
+    for pedido_id, produtos in cestas.items():
+        if pedido_id in ja_contados:
+            continue
+        novos.append(pedido_id)
+        distintos = sorted({p for p in produtos if p is not None})[:MAX_PRODUTOS_POR_PEDIDO]
+        frequencias.update(distintos)
+        pares.update(permutations(distintos, 2))
+    if not novos:
+        return 0
+    agora = jobs.agora()
+    db.execute(insert(Analisado.__table__), [{"pedido_id": p, "created_at": agora} for p in novos])
+    _somar(db, Frequencia, ["produto_id"],
+           [{"produto_id": p, "pedidos": n} for p, n in frequencias.items()])
+    _somar(db, Coocorrencia, ["produto_id", "outro_id"],
+           [{"produto_id": a, "outro_id": b, "pedidos": n} for (a, b), n in pares.items()])
+    return len(novos)
+
+
+@jobs.tarefa("recomendacoes.pedido")
+def contar_pedido(db: Session, payload: dict) -> None:
+    pedido_id = int(payload["pedido_id"])
+    produtos = db.execute(
+        select(models.PedidoItem.produto_id).where(models.PedidoItem.pedido_id == pedido_id)
+    ).scalars().all()
+    acumular(db, {pedido_id: produtos})
+
+
+tarefas.ao_fechar_pedido("recomendacoes.pedido")
+
+
+# --- consulta ---
+
+def recomendados(db: Session, produto_id: int, k: int = K_PADRAO) -> List[dict]:
+    """Até `k` produtos disponíveis mais associados a `produto_id`, por lift."""
+    pedidos_produto = db.execute(select(Frequencia.pedidos).where(Frequencia.produto_id == produto_id)).scalar()
+    if not pedidos_produto:
+        return []
+    total = db.execute(select(func.count()).select_from(Analisado)).scalar() or 0
+    produto = models.Produto
+    # N e pedidos(a) são fixos para `produto_id`: ordenar por lift é ordenar por pedidos(a, b) / pedidos(b).
+    # Indisponíveis saem já aqui, para o LIMIT não cortar parceiros válidos
+    candidatos = db.execute(
+        select(Coocorrencia.outro_id, Coocorrencia.pedidos, Frequencia.pedidos)
+        .join(Frequencia, Frequencia.produto_id == Coocorrencia.outro_id)
+        .join(produto, produto.id == Coocorrencia.outro_id)
+        .where(Coocorrencia.produto_id == produto_id, Coocorrencia.pedidos >= SUPORTE_MINIMO,
+               func.coalesce(produto.disponivel, True))
+        .order_by((Coocorrencia.pedidos * 1.0 / Frequencia.pedidos).desc(), Coocorrencia.pedidos.desc(),
+                  Coocorrencia.outro_id)
+        .limit(k)
+    ).all()
+    if not candidatos:
+        return []
+    produtos = {
+        p["id"]: p for p in (
+            read_models.produto_de_linha(linha) for linha in db.execute(
+                read_models.select_produtos().where(produto.id.in_([c[0] for c in candidatos]))
+            )
+        )
+    }
+    resultado = []
+    for outro_id, juntos, pedidos_outro in candidatos:
+        if outro_id not in produtos:
+            continue  # removido entre as duas consultas
+        resultado.append({
+            "produto": produtos[outro_id],
+            "lift": round(juntos * total / (pedidos_produto * pedidos_outro), 4),
+            "confianca": round(juntos / pedidos_produto, 4),
+            "pedidos": juntos,
+        })
+        if len(resultado) >= k:
+            break
+    return resultado
+
+
+# --- reconstrução ---
+
+def reconstruir(db: Session, lote: int = 500) -> int:
+    """Zera as contagens e recontabiliza todos os pedidos fechados, `lote` pedidos por transação."""
+    for modelo in (Coocorrencia, Frequencia, Analisado):
+        db.execute(delete(modelo.__table__))
+    db.commit()
+    pedido, item = models.Pedido, models.PedidoItem
+    ultimo, total = 0, 0
+    while True:
+        ids = db.execute(
+            select(pedido.id)
+            .where(pedido.id > ultimo, func.lower(func.trim(pedido.status)).in_(sorted(tarefas.STATUS_FECHADOS)))
+            .order_by(pedido.id)
+            .limit(lote)
+        ).scalars().all()
+        if not ids:
+            break
+        cestas: Dict[int, list] = {pedido_id: [] for pedido_id in ids}
+        for pedido_id, produto_id in db.execute(select(item.pedido_id, item.produto_id).where(item.pedido_id.in_(ids))):
+            cestas[pedido_id].append(produto_id)
+        total += acumular(db, cestas)
+        db.commit()
+        ultimo = ids[-1]
+        logger.info("Recomendações: %d pedidos contados (até o pedido %d)", total, ultimo)
+    cache.invalidar()
+    return total
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Coocorrências de produtos para recomendações.")
+    parser.add_argument("--reconstruir", action="store_true",
+                        help="Zera as contagens e reprocessa todos os pedidos fechados")
+    parser.add_argument("--lote", type=int, default=500, help="Pedidos por transação na reconstrução")
+    parser.add_argument("--produto", type=int, default=None, help="Imprime as recomendações de um produto")
+    parser.add_argument("-k", type=int, default=K_PADRAO, help="Quantidade de recomendações")
+    args = parser.parse_args(argv)
+
+    from backend import migracoes
+    from backend.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    migracoes.aplicar(engine)
+    with SessionLocal() as db:
+        if args.reconstruir:
+            print(f"{reconstruir(db, lote=max(1, args.lote))} pedidos contados")
+        if args.produto is not None:
+            for r in recomendados(db, args.produto, args.k):
+                print(f"{r['produto']['id']:>6}  lift {r['lift']:>8.3f}  conf {r['confianca']:.3f}  "
+                      f"{r['pedidos']:>5}  {r['produto']['nome']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
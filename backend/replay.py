@@ -0,0 +1,306 @@
+"""Replay de tráfego capturado (`backend/captura.py`) contra um alvo.
+
+Re-emite as requisições gravadas respeitando o intervalo original entre elas
+(dividido por `--velocidade`), com concorrência máxima configurável. Ao final
+compara, por rota, as latências p50/p95/p99 e os status com o que foi gravado.
+Com `--max-regressao-p95` o comando sai com código 1 se alguma rota piorar
+mais que o limite: serve de gate de regressão de performance.
+
+Usage:
+    python backend/replay.py capturas/ --alvo http://localhost:8000 --concorrencia 32 --velocidade 4
+    python backend/replay.py capturas/captura-20251017-*.jsonl --somente-leitura --saida replay.json
+
+Atenção: requisições de escrita (POST/PUT/DELETE) alteram o banco do alvo.
+Rode contra uma cópia do banco ou use `--somente-leitura`.
+"""
+import argparse
+import asyncio
+import base64
+import glob
+import json
+import math
+import os
+import pathlib
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+if __package__ is None or __package__ == '':
+    project_root_str = str(pathlib.Path(__file__).resolve().parents[1])
+    if project_root_str not in sys.path:
+        sys.path.insert(0, project_root_str)
+
+from backend.logging_config import logger
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil por interpolação linear (p entre 0 e 100)."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * (p / 100.0)
+    baixo = math.floor(k)
+    alto = math.ceil(k)
+    if baixo == alto:
+        return ordenados[int(k)]
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (k - baixo)
+
+
+def resumo_latencias(valores: List[float]) -> dict:
+    return {
+        "n": len(valores),
+        "p50": percentil(valores, 50),
+        "p95": percentil(valores, 95),
+        "p99": percentil(valores, 99),
+    }
+
+
+class AsyncHTTPClient:
+    """Cliente HTTP/1.1 mínimo sobre asyncio, com conexões keep-alive reaproveitadas.
+
+    Evita depender de httpx/aiohttp (não fazem parte do requirements) e tem
+    overhead baixo o bastante para gerar carga a partir de um único processo.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        partes = urlsplit(base_url)
+        if partes.scheme not in ("http", ""):
+            raise ValueError("Somente alvos http:// são suportados")
+        self.host = partes.hostname or "localhost"
+        self.port = partes.port or 80
+        self.timeout = timeout
+        self._livres: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def _conectar(self):
+        if self._livres:
+            return self._livres.pop()
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes, Dict[str, str]]:
+        """Envia uma requisição e retorna (status, corpo, cabeçalhos em minúsculas)."""
+        for tentativa in range(2):
+            reader, writer = await self._conectar()
+            try:
+                return await asyncio.wait_for(self._enviar(reader, writer, method, path, body, headers or {}), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # conexão keep-alive fechada pelo servidor: tentar uma vez com conexão nova
+                if tentativa == 1:
+                    raise
+            except BaseException:
+                writer.close()
+                raise
+
+    async def _enviar(self, reader, writer, method, path, body, headers):
+        linhas = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        linhas.extend(f"{k}: {v}" for k, v in headers.items())
+        writer.write(("\r\n".join(linhas) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readuntil(b"\r\n")
+        status = int(status_line.split(b" ", 2)[1])
+        resp_headers: Dict[str, str] = {}
+        while True:
+            linha = await reader.readuntil(b"\r\n")
+            if linha == b"\r\n":
+                break
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            resp_headers[nome.strip().lower()] = valor.strip()
+
+        if resp_headers.get("transfer-encoding", "").lower() == "chunked":
+            partes = []
+            while True:
+                tamanho = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if tamanho == 0:
+                    await reader.readuntil(b"\r\n")
+                    break
+                partes.append(await reader.readexactly(tamanho))
+                await reader.readexactly(2)
+            corpo = b"".join(partes)
+        else:
+            corpo = await reader.readexactly(int(resp_headers.get("content-length", "0")))
+
+        if resp_headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self._livres.append((reader, writer))
+        return status, corpo, resp_headers
+
+    async def fechar(self):
+        while self._livres:
+            _reader, writer = self._livres.pop()
+            writer.close()
+
+
+def carregar_registros(entradas: List[str], somente_leitura: bool = False, limite: Optional[int] = None) -> List[dict]:
+    """Lê os arquivos JSONL (arquivos, diretórios ou globs) em ordem de timestamp."""
+    arquivos: List[str] = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            arquivos.extend(sorted(glob.glob(os.path.join(entrada, "*.jsonl"))))
+        else:
+            arquivos.extend(sorted(glob.glob(entrada)) or [entrada])
+    registros = []
+    for arq in arquivos:
+        with open(arq, encoding="utf-8") as fh:
+            for linha in fh:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    reg = json.loads(linha)
+                except json.JSONDecodeError:
+                    logger.warning("Linha inválida ignorada em %s", arq)
+                    continue
+                if somente_leitura and reg.get("method") not in ("GET", "HEAD"):
+                    continue
+                registros.append(reg)
+    registros.sort(key=lambda r: r.get("ts", 0))
+    if limite:
+        registros = registros[:limite]
+    return registros
+
+
+def chave_rota(reg: dict) -> str:
+    return f"{reg.get('method')} {reg.get('route') or reg.get('path')}"
+
+
+async def reproduzir(registros: List[dict], alvo: str, concorrencia: int, velocidade: float, timeout: float) -> List[dict]:
+    """Re-emite os registros e retorna, para cada um, status e duração observados."""
+    cliente = AsyncHTTPClient(alvo, timeout=timeout)
+    semaforo = asyncio.Semaphore(concorrencia)
+    resultados: List[dict] = []
+    if not registros:
+        return resultados
+    ts0 = registros[0].get("ts", 0)
+    inicio = time.perf_counter()
+
+    async def _um(reg: dict):
+        async with semaforo:
+            corpo = reg.get("body") or ""
+            corpo_bytes = base64.b64decode(corpo) if reg.get("body_b64") else corpo.encode("utf-8")
+            headers = {}
+            if reg.get("content_type"):
+                headers["Content-Type"] = reg["content_type"]
+            if reg.get("session"):
+                headers["Cookie"] = f"session={reg['session']}"
+            caminho = reg["path"] + (f"?{reg['query']}" if reg.get("query") else "")
+            t = time.perf_counter()
+            try:
+                status, _corpo, _h = await cliente.request(reg["method"], caminho, corpo_bytes, headers)
+                erro = None
+            except Exception as e:
+                status, erro = None, f"{type(e).__name__}: {e}"
+            resultados.append({
+                "rota": chave_rota(reg),
+                "status_gravado": reg.get("status"),
+                "duracao_gravada_ms": reg.get("duration_ms"),
+                "status": status,
+                "duracao_ms": (time.perf_counter() - t) * 1000,
+                "erro": erro,
+            })
+
+    tarefas = []
+    for reg in registros:
+        if velocidade > 0:
+            alvo_t = (reg.get("ts", ts0) - ts0) / velocidade
+            espera = alvo_t - (time.perf_counter() - inicio)
+            if espera > 0:
+                await asyncio.sleep(espera)
+        tarefas.append(asyncio.create_task(_um(reg)))
+    await asyncio.gather(*tarefas)
+    await cliente.fechar()
+    return resultados
+
+
+def _classe(status: Optional[int]) -> str:
+    return "erro" if status is None else f"{status // 100}xx"
+
+
+def comparar(resultados: List[dict]) -> dict:
+    """Agrupa por rota: percentis gravados x replay e divergências de status."""
+    por_rota: Dict[str, List[dict]] = defaultdict(list)
+    for r in resultados:
+        por_rota[r["rota"]].append(r)
+
+    relatorio = {}
+    for rota, itens in sorted(por_rota.items()):
+        gravado = resumo_latencias([i["duracao_gravada_ms"] for i in itens if i["duracao_gravada_ms"] is not None])
+        replay = resumo_latencias([i["duracao_ms"] for i in itens if i["status"] is not None])
+        divergencias: Dict[str, int] = defaultdict(int)
+        for i in itens:
+            if _classe(i["status"]) != _classe(i["status_gravado"]):
+                divergencias[f"{_classe(i['status_gravado'])}->{_classe(i['status'])}"] += 1
+        delta = None
+        if gravado["p95"] and replay["p95"] is not None:
+            delta = (replay["p95"] - gravado["p95"]) / gravado["p95"] * 100
+        relatorio[rota] = {
+            "gravado": gravado,
+            "replay": replay,
+            "delta_p95_pct": delta,
+            "divergencias_status": dict(divergencias),
+            "erros": sum(1 for i in itens if i["erro"]),
+        }
+    return relatorio
+
+
+def imprimir(relatorio: dict) -> None:
+    def _fmt(v):
+        return "-" if v is None else f"{v:8.1f}"
+
+    print(f"{'rota':<50} {'n':>6} {'p50 grav':>9} {'p50':>9} {'p95 grav':>9} {'p95':>9} {'p99':>9} {'Δp95%':>8}  status")
+    for rota, r in relatorio.items():
+        g, x = r["gravado"], r["replay"]
+        div = ", ".join(f"{k}:{v}" for k, v in r["divergencias_status"].items()) or "ok"
+        print(f"{rota[:50]:<50} {x['n']:>6} {_fmt(g['p50']):>9} {_fmt(x['p50']):>9} {_fmt(g['p95']):>9} "
+              f"{_fmt(x['p95']):>9} {_fmt(x['p99']):>9} {_fmt(r['delta_p95_pct']):>8}  {div}")
+
+
+def regressoes(relatorio: dict, max_regressao_p95: float, min_amostras: int = 20) -> List[str]:
+    falhas = []
+    for rota, r in relatorio.items():
+        if r["replay"]["n"] < min_amostras:
+            continue
+        if r["delta_p95_pct"] is not None and r["delta_p95_pct"] > max_regressao_p95:
+            falhas.append(f"{rota}: p95 +{r['delta_p95_pct']:.1f}%")
+        if r["divergencias_status"] or r["erros"]:
+            falhas.append(f"{rota}: status divergentes {r['divergencias_status']} erros={r['erros']}")
+    return falhas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reproduz tráfego capturado e compara latências por rota.")
+    parser.add_argument("entradas", nargs="+", help="Arquivos, diretórios ou globs de captura (*.jsonl)")
+    parser.add_argument("--alvo", default="http://localhost:8000", help="URL base do alvo")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Requisições simultâneas no máximo")
+    parser.add_argument("--velocidade", type=float, default=1.0, help="Fator de aceleração do tempo gravado (0 = sem espera)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--limite", type=int, default=None, help="Reproduzir apenas as N primeiras requisições")
+    parser.add_argument("--somente-leitura", action="store_true", help="Ignora requisições que não sejam GET/HEAD")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o relatório completo")
+    parser.add_argument("--max-regressao-p95", type=float, default=None,
+                        help="Falha (exit 1) se o p95 de alguma rota piorar mais que este percentual")
+    args = parser.parse_args(argv)
+
+    registros = carregar_registros(args.entradas, somente_leitura=args.somente_leitura, limite=args.limite)
+    logger.info("Reproduzindo %d requisições contra %s", len(registros), args.alvo)
+    resultados = asyncio.run(reproduzir(registros, args.alvo, args.concorrencia, args.velocidade, args.timeout))
+    relatorio = comparar(resultados)
+    imprimir(relatorio)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as fh:
+            json.dump({"alvo": args.alvo, "total": len(resultados), "rotas": relatorio}, fh, indent=2, ensure_ascii=False)
+
+    if args.max_regressao_p95 is not None:
+        falhas = regressoes(relatorio, args.max_regressao_p95)
+        for f in falhas:
+            print(f"REGRESSÃO {f}")
+        return 1 if falhas else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
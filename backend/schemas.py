@@ -59,6 +59,12 @@ class Produto(ProdutoBase):
     estoque: int
     categoria: Categoria
     created_at: datetime
+    rating_count: int = 0
+    rating_media: Optional[float] = None
+    rating_histograma: List[int] = [0, 0, 0, 0, 0]
+    isFavorito: bool = False
+    estoque_minimo: Optional[int] = None
+    estoque_baixo: bool = False
     model_config = {"from_attributes": True}
 
 class PedidoItem(BaseModel):
@@ -91,6 +97,7 @@ class EmpresaCreate(EmpresaBase):
 
 class Empresa(EmpresaBase):
     id: int
+    estoque_minimo_padrao: Optional[int] = None
     model_config = {"from_attributes": True}
 
 class MesaBase(BaseModel):
@@ -162,4 +169,23 @@ class Carrinho(CarrinhoBase):
     usuarioId: int
     created_at: datetime
     itens: List[CarrinhoItem]
-    model_config = {"from_attributes": True}
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+# Avaliações (listagem paginada, com o nome de quem avaliou)
+class Avaliacao(BaseModel):
+    id: int
+    usuario_id: Optional[int] = None
+    produto_id: int
+    rating: Optional[int] = None
+    comentario: Optional[str] = None
+    created_at: Optional[datetime] = None
+    usuario_nome: Optional[str] = None
+    model_config = {"from_attributes": True}
+
+
+# Recomendações "comprados juntos"
+class Recomendacao(BaseModel):
+    produto: Produto
+    lift: float
+    confianca: float
+    pedidos: int
@@ -0,0 +1,61 @@
+"""Serialização rápida das respostas JSON.
+
+- `RespostaJSON`: classe de resposta padrão da app. Usa orjson quando instalado
+  (`pip install orjson`) e cai para o `json` da stdlib caso contrário, com a
+  mesma saída compacta em UTF-8.
+- `ADAPTADOR_*` e `responder_lista`: para as listagens quentes, um `TypeAdapter`
+  pré-construído valida os objetos ORM uma única vez e gera os bytes JSON no
+  pydantic-core, sem a volta pelo dict intermediário + `json.dumps` que o
+  `response_model` faz. O `response_model` continua nas rotas para a
+  documentação; ao devolver um `Response` pronto o FastAPI não revalida.
+"""
+from typing import Any, List
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from backend import schemas
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+ORJSON_DISPONIVEL = orjson is not None
+
+
+class RespostaJSON(JSONResponse):
+    """JSONResponse que usa orjson quando disponível."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            try:
+                return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # Tipo não suportado pelo orjson (ex.: int maior que 64 bits)
+                pass
+        return super().render(content)
+
+
+ADAPTADOR_PEDIDOS = TypeAdapter(List[schemas.Pedido])
+ADAPTADOR_PRODUTOS = TypeAdapter(List[schemas.Produto])
+ADAPTADOR_MESAS = TypeAdapter(List[schemas.Mesa])
+ADAPTADOR_USUARIOS = TypeAdapter(List[schemas.User])
+ADAPTADOR_AVALIACOES = TypeAdapter(List[schemas.Avaliacao])
+ADAPTADOR_RECOMENDACOES = TypeAdapter(List[schemas.Recomendacao])
+
+
+def json_lista(adaptador: TypeAdapter, objetos) -> bytes:
+    """Valida (a partir de atributos ORM ou dicts de `read_models`) e serializa direto para bytes JSON."""
+    return adaptador.dump_json(adaptador.validate_python(objetos, from_attributes=True))
+
+
+def json_envelope(adaptador: TypeAdapter, chave: str, objetos, **extras) -> bytes:
+    """Bytes JSON de `{chave: [...], **extras}`, com a lista validada pelo adaptador."""
+    lista = adaptador.dump_python(adaptador.validate_python(objetos, from_attributes=True), mode="json")
+    return RespostaJSON({chave: lista, **extras}).body
+
+
+def responder_lista(adaptador: TypeAdapter, objetos) -> Response:
+    return Response(content=json_lista(adaptador, objetos), media_type="application/json")
@@ -0,0 +1,54 @@
+"""Sobe o backend com vários processos worker (uvicorn).
+
+Cada worker tem os próprios caches em processo (catálogo, usuários, salão);
+eles continuam coerentes entre si pelo canal de invalidação de
+`backend/invalidacao.py`, que é iniciado no startup de cada worker. Com
+vários workers, os jobs em segundo plano rodam em todos eles por padrão:
+a reivindicação é atômica e os agendamentos são deduplicados, mas
+JOBS_WORKERS=0 em parte deles reduz a disputa pelo banco.
+
+Usage:
+    python -m backend.servidor --workers 4 --port 8000
+"""
+import argparse
+import os
+import sys
+
+
+def preparar_banco() -> None:
+    """Cria as tabelas uma vez, no processo principal, antes de subir os workers.
+
+    Sem isso todos os workers executam `create_all` ao mesmo tempo e, num banco
+    novo, os que perdem a corrida falham com "table ... already exists".
+    """
+    from backend import busca, invalidacao, migracoes, models
+    from backend.database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    migracoes.aplicar(engine)
+    invalidacao.garantir_dominios(engine)
+    busca.criar_indice(engine)
+    engine.dispose()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sobe o backend com vários workers uvicorn.")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "2")),
+                        help="Número de processos worker (padrão: WEB_CONCURRENCY ou 2)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    if args.workers > 1:
+        preparar_banco()
+    # Com workers > 1 o uvicorn exige a app como string de importação
+    uvicorn.run("backend.main:app", host=args.host, port=args.port, workers=args.workers,
+                log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Tarefas de domínio executadas pela fila de jobs (backend/jobs.py).
+
+- `carrinho.limpar_abandonados`: remove os itens de carrinhos sem atividade há
+  CARRINHO_ABANDONADO_DIAS dias; agendada diariamente (CARRINHO_LIMPEZA_CRON).
+- `estoque.baixa_pedido`: dá baixa no estoque dos itens de um pedido quando ele
+  é entregue. Só é enfileirada com BAIXA_ESTOQUE_NO_BACKEND=true, porque hoje o
+  frontend registra as próprias movimentações de saída.
+
+Outros módulos registram com `ao_fechar_pedido(tipo)` tarefas que recebem
+`{"pedido_id": id}` quando um pedido entra em um status de `STATUS_FECHADOS`,
+por qualquer caminho do ORM (criação já fechado ou mudança de status). O job
+é enfileirado no flush, na mesma transação, com a chave `<tipo>:<pedido_id>`.
+"""
+import os
+from datetime import timedelta
+from typing import List
+
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from backend import crud, jobs, models
+from backend.logging_config import logger
+
+CARRINHO_ABANDONADO_DIAS = int(os.environ.get("CARRINHO_ABANDONADO_DIAS", "7"))
+CARRINHO_LIMPEZA_CRON = os.environ.get("CARRINHO_LIMPEZA_CRON", "0 4 * * *")
+BAIXA_ESTOQUE_NO_BACKEND = os.environ.get("BAIXA_ESTOQUE_NO_BACKEND", "false").lower() in ("1", "true", "yes", "sim")
+# Status (comparados sem diferenciar maiúsculas) que disparam a baixa de estoque
+STATUS_BAIXA_ESTOQUE = {"entregue"}
+# Status (comparados sem diferenciar maiúsculas) de um pedido fechado
+STATUS_FECHADOS = {"entregue", "pago", "finalizado", "concluido"}
+
+_tarefas_ao_fechar: List[str] = []
+
+
+def pedido_fechado(status) -> bool:
+    return (status or "").strip().lower() in STATUS_FECHADOS
+
+
+def ao_fechar_pedido(tipo: str) -> None:
+    """Enfileira a tarefa `tipo` para cada pedido que passar a um status fechado."""
+    if tipo not in _tarefas_ao_fechar:
+        _tarefas_ao_fechar.append(tipo)
+
+
+def _apos_flush(session: Session, _flush_context) -> None:
+    if not _tarefas_ao_fechar:
+        return
+    fechados = []
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, models.Pedido) or not pedido_fechado(obj.status):
+            continue
+        historico = inspect(obj).attrs.status.history
+        # Só a transição para fechado conta (ex.: entregue -> pago não reenfileira)
+        if obj in session.new or (historico.has_changes()
+                                  and not any(pedido_fechado(s) for s in historico.deleted)):
+            fechados.append(obj.id)
+    for pedido_id in fechados:
+        for tipo in _tarefas_ao_fechar:
+            jobs.enfileirar(tipo, {"pedido_id": pedido_id}, chave=f"{tipo}:{pedido_id}", db=session)
+
+
+event.listen(Session, "after_flush", _apos_flush)
+
+
+@jobs.tarefa("carrinho.limpar_abandonados")
+def limpar_carrinhos_abandonados(db: Session, payload: dict) -> None:
+    limite = jobs.agora() - timedelta(days=int(payload.get("dias", CARRINHO_ABANDONADO_DIAS)))
+    abandonados = (
+        select(models.CarrinhoItem.carrinho_id)
+        .group_by(models.CarrinhoItem.carrinho_id)
+        .having(func.max(models.CarrinhoItem.created_at) < limite)
+    )
+    resultado = db.execute(
+        delete(models.CarrinhoItem).where(models.CarrinhoItem.carrinho_id.in_(abandonados)),
+        execution_options={"synchronize_session": False},
+    )
+    logger.info("Carrinhos abandonados: %d itens removidos", resultado.rowcount)
+
+
+@jobs.tarefa("estoque.baixa_pedido", max_tentativas=8)
+def baixa_estoque_pedido(db: Session, payload: dict) -> None:
+    pedido = crud.get_pedido(db, int(payload["pedido_id"]))
+    if pedido is None:
+        logger.warning("Baixa de estoque: pedido %s não existe mais", payload.get("pedido_id"))
+        return
+    origem = "venda_online" if pedido.tipo == "online" else "venda_fisica"
+    for item in pedido.itens:
+        produto = crud.get_produto(db, item.produto_id)
+        if produto is None:
+            continue
+        anterior = int(produto.estoque or 0)
+        nova = max(0, anterior - int(item.quantidade or 0))
+        produto.estoque = nova
+        db.add(models.MovimentacaoEstoque(
+            produto_id=produto.id,
+            quantidade=int(item.quantidade or 0),
+            quantidade_anterior=anterior,
+            quantidade_nova=nova,
+            tipo="saida",
+            origem=origem,
+            observacoes=f"Baixa automática do pedido {pedido.numero}",
+            usuario_id=pedido.usuario_id,
+        ))
+    # Sem commit: o executor confirma junto com a conclusão do job
+    db.flush()
+
+
+def enfileirar_baixa_se_necessario(db: Session, pedido_id: int, status: str) -> None:
+    """Chamado na mudança de status do pedido, dentro da transação da requisição."""
+    if BAIXA_ESTOQUE_NO_BACKEND and (status or "").strip().lower() in STATUS_BAIXA_ESTOQUE:
+        jobs.enfileirar("estoque.baixa_pedido", {"pedido_id": pedido_id},
+                        chave=f"estoque.baixa_pedido:{pedido_id}", db=db)
+
+
+jobs.agendar("carrinhos-abandonados", CARRINHO_LIMPEZA_CRON, "carrinho.limpar_abandonados")
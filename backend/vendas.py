@@ -0,0 +1,250 @@
+"""Rollups de vendas por hora e por dia, atualizados quando os pedidos fecham.
+
+`vendas_por_hora` e `vendas_por_dia` têm uma linha por (dimensão, início do
+intervalo, chave) com pedidos, itens vendidos e receita:
+
+    total       chave ""            receita = soma de Pedido.total
+    tipo        online / fisica     receita = soma de Pedido.total
+    produto     produto_id          receita = soma dos subtotais dos itens
+    categoria   categoria_id        idem, pela categoria do produto
+    empresa     empresa_id          idem, pela empresa do produto
+
+Quando um pedido fecha (`tarefas.STATUS_FECHADOS`), a tarefa
+`vendas.rollup_pedido` soma a contribuição dele às duas tabelas (upsert que
+incrementa). `vendas_pedidos_contabilizados` impede que um pedido seja somado
+duas vezes. O intervalo é o da criação do pedido (`Pedido.created_at`), o
+mesmo usado no backfill, deslocado por VENDAS_UTC_OFFSET_HORAS (ex.: -3 para
+o horário de Brasília). Se mudar o deslocamento, rode o backfill com
+`--recriar`. Cancelar um pedido depois de fechado não desconta as vendas dele.
+
+As consultas de intervalo (`serie`, `ranking`) leem só os rollups. Para o
+histórico:
+
+    python -m backend.vendas --backfill --lote 1000 [--recriar]
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from backend import jobs, models, tarefas
+from backend.logging_config import logger
+
+UTC_OFFSET = timedelta(hours=float(os.environ.get("VENDAS_UTC_OFFSET_HORAS", "0")))
+DIMENSOES = ("total", "tipo", "produto", "categoria", "empresa")
+_DIMENSOES_ID = {"produto", "categoria", "empresa"}
+GRANULARIDADES = {"hora": models.VendasHora, "dia": models.VendasDia}
+
+Contabilizado = models.PedidoContabilizado
+
+
+def _intervalos(momento: datetime) -> Dict[object, datetime]:
+    local = momento.replace(tzinfo=None) + UTC_OFFSET
+    hora = local.replace(minute=0, second=0, microsecond=0)
+    return {models.VendasHora: hora, models.VendasDia: hora.replace(hour=0)}
+
+
+def _upsert(db: Session, modelo, linhas: List[dict]) -> None:
+    if not linhas:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+    tabela = modelo.__table__
+    stmt = insert_dialeto(tabela)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["dimensao", "inicio", "chave"],
+        set_={c: tabela.c[c] + stmt.excluded[c] for c in ("pedidos", "itens", "receita")},
+    ), linhas)
+
+
+def contabilizar(db: Session, pedido_ids: Iterable[int]) -> int:
+    """Soma os pedidos aos rollups (os já contabilizados são ignorados); devolve quantos entraram."""
+    ids = list(pedido_ids)
+    if not ids:
+        return 0
+    ja = set(db.execute(select(Contabilizado.pedido_id).where(Contabilizado.pedido_id.in_(ids))).scalars())
+    ids = [i for i in ids if i not in ja]
+    if not ids:
+        return 0
+    pedido, item, produto = models.Pedido, models.PedidoItem, models.Produto
+    pedidos = {
+        p.id: p for p in db.execute(
+            select(pedido.id, pedido.tipo, pedido.total, pedido.created_at).where(pedido.id.in_(ids))
+        )
+    }
+    # (modelo, dimensao, inicio, chave) -> [pedidos, itens, receita]; pedidos por chave contados uma vez
+    somas = defaultdict(lambda: [0, 0, Decimal("0")])
+    vistos = set()
+
+    def _somar(inicios, dimensao, chave, pedido_id, itens, receita):
+        for modelo, inicio in inicios.items():
+            soma = somas[(modelo, dimensao, inicio, chave)]
+            if (modelo, dimensao, chave, pedido_id) not in vistos:
+                vistos.add((modelo, dimensao, chave, pedido_id))
+                soma[0] += 1
+            soma[1] += itens
+            soma[2] += receita
+
+    inicios_por_pedido = {}
+    for p in pedidos.values():
+        inicios = inicios_por_pedido[p.id] = _intervalos(p.created_at or jobs.agora())
+        total = Decimal(str(p.total or 0))
+        _somar(inicios, "total", "", p.id, 0, total)
+        _somar(inicios, "tipo", p.tipo or "", p.id, 0, total)
+    linhas_itens = db.execute(
+        select(item.pedido_id, item.produto_id, produto.categoria_id, produto.empresa_id, item.quantidade,
+               item.subtotal)
+        .outerjoin(produto, produto.id == item.produto_id)
+        .where(item.pedido_id.in_(list(pedidos)))
+    )
+    for pedido_id, produto_id, categoria_id, empresa_id, quantidade, subtotal in linhas_itens:
+        inicios = inicios_por_pedido[pedido_id]
+        quantidade, subtotal = int(quantidade or 0), Decimal(str(subtotal or 0))
+        for dimensao, chave in (("produto", produto_id), ("categoria", categoria_id), ("empresa", empresa_id)):
+            _somar(inicios, dimensao, "" if chave is None else str(chave), pedido_id, quantidade, subtotal)
+        # Itens vendidos também no total e no tipo do pedido
+        tipo = pedidos[pedido_id].tipo or ""
+        for modelo, inicio in inicios.items():
+            somas[(modelo, "total", inicio, "")][1] += quantidade
+            somas[(modelo, "tipo", inicio, tipo)][1] += quantidade
+
+    agora = jobs.agora()
+    db.execute(insert(Contabilizado.__table__), [{"pedido_id": i, "created_at": agora} for i in pedidos])
+    por_modelo = defaultdict(list)
+    for (modelo, dimensao, inicio, chave), (n_pedidos, itens, receita) in somas.items():
+        por_modelo[modelo].append({"dimensao": dimensao, "inicio": inicio, "chave": chave,
+                                   "pedidos": n_pedidos, "itens": itens, "receita": receita})
+    for modelo, linhas in por_modelo.items():
+        _upsert(db, modelo, linhas)
+    return len(pedidos)
+
+
+@jobs.tarefa("vendas.rollup_pedido")
+def rollup_pedido(db: Session, payload: dict) -> None:
+    contabilizar(db, [int(payload["pedido_id"])])
+
+
+tarefas.ao_fechar_pedido("vendas.rollup_pedido")
+
+
+# --- consultas ---
+
+def _chave_publica(dimensao: str, chave: str):
+    if dimensao in _DIMENSOES_ID:
+        return int(chave) if chave else None
+    return chave or None
+
+
+def intervalo_atual(granularidade: str) -> datetime:
+    """Início da hora ou do dia corrente, no deslocamento dos rollups."""
+    return _intervalos(jobs.agora())[GRANULARIDADES[granularidade]]
+
+
+def intervalo_padrao(granularidade: str, inicio: Optional[datetime] = None,
+                     fim: Optional[datetime] = None) -> tuple:
+    """Completa [inicio, fim): até o fim do intervalo atual, 30 dias (dia) ou 48 horas (hora) para trás."""
+    if fim is None:
+        atual = intervalo_atual(granularidade)
+        fim = atual + (timedelta(days=1) if granularidade == "dia" else timedelta(hours=1))
+    if inicio is None:
+        inicio = fim - (timedelta(days=30) if granularidade == "dia" else timedelta(hours=48))
+    return inicio, fim
+
+
+def serie(db: Session, granularidade: str, dimensao: str, inicio: datetime, fim: datetime,
+          chave: Optional[str] = None) -> List[dict]:
+    """Linhas do rollup em [inicio, fim), em ordem de tempo."""
+    modelo = GRANULARIDADES[granularidade]
+    stmt = (
+        select(modelo.inicio, modelo.chave, modelo.pedidos, modelo.itens, modelo.receita)
+        .where(modelo.dimensao == dimensao, modelo.inicio >= inicio, modelo.inicio < fim)
+        .order_by(modelo.inicio, modelo.chave)
+    )
+    if chave is not None:
+        stmt = stmt.where(modelo.chave == chave)
+    return [
+        {"inicio": i, "chave": _chave_publica(dimensao, c), "pedidos": p, "itens": n,
+         "receita": Decimal(str(r or 0)).quantize(Decimal("0.01"))}
+        for i, c, p, n, r in db.execute(stmt)
+    ]
+
+
+def ranking(db: Session, dimensao: str, inicio: datetime, fim: datetime, limite: int = 10,
+            granularidade: str = "dia") -> List[dict]:
+    """Totais por chave em [inicio, fim), maior receita primeiro."""
+    modelo = GRANULARIDADES[granularidade]
+    receita = func.sum(modelo.receita)
+    linhas = db.execute(
+        select(modelo.chave, func.sum(modelo.pedidos), func.sum(modelo.itens), receita)
+        .where(modelo.dimensao == dimensao, modelo.inicio >= inicio, modelo.inicio < fim)
+        .group_by(modelo.chave)
+        .order_by(receita.desc(), modelo.chave)
+        .limit(limite)
+    ).all()
+    return [
+        {"chave": _chave_publica(dimensao, c), "pedidos": int(p or 0), "itens": int(n or 0),
+         "receita": Decimal(str(r or 0)).quantize(Decimal("0.01"))}
+        for c, p, n, r in linhas
+    ]
+
+
+# --- backfill ---
+
+def backfill(db: Session, lote: int = 1000, recriar: bool = False) -> int:
+    """Contabiliza os pedidos fechados ainda fora dos rollups, `lote` por transação."""
+    if recriar:
+        for modelo in (models.VendasHora, models.VendasDia, Contabilizado):
+            db.execute(delete(modelo.__table__))
+        db.commit()
+    pedido = models.Pedido
+    ultimo, total = 0, 0
+    while True:
+        ids = db.execute(
+            select(pedido.id)
+            .where(pedido.id > ultimo, func.lower(func.trim(pedido.status)).in_(sorted(tarefas.STATUS_FECHADOS)))
+            .order_by(pedido.id)
+            .limit(lote)
+        ).scalars().all()
+        if not ids:
+            break
+        total += contabilizar(db, ids)
+        db.commit()
+        ultimo = ids[-1]
+        logger.info("Rollup de vendas: %d pedidos contabilizados (até o pedido %d)", total, ultimo)
+    return total
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rollups de vendas por hora e por dia.")
+    parser.add_argument("--backfill", action="store_true", help="Contabiliza os pedidos fechados do histórico")
+    parser.add_argument("--recriar", action="store_true", help="Zera os rollups antes do backfill")
+    parser.add_argument("--lote", type=int, default=1000, help="Pedidos por transação no backfill")
+    parser.add_argument("--dias", type=int, default=0, help="Imprime a receita diária dos últimos N dias")
+    args = parser.parse_args(argv)
+
+    from backend import migracoes
+    from backend.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    migracoes.aplicar(engine)
+    with SessionLocal() as db:
+        if args.backfill:
+            print(f"{backfill(db, lote=max(1, args.lote), recriar=args.recriar)} pedidos contabilizados")
+        if args.dias:
+            fim = (jobs.agora() + UTC_OFFSET).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            for linha in serie(db, "dia", "total", fim - timedelta(days=args.dias), fim):
+                print(f"{linha['inicio']:%Y-%m-%d}  {linha['pedidos']:>6} pedidos  {linha['itens']:>7} itens  "
+                      f"R$ {linha['receita']:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
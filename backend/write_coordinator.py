@@ -0,0 +1,203 @@
+"""Coordenador de escritas: uma thread escritora com group commit (opcional).
+
+Com WRITE_COORDINATOR=true, as mutações quentes (itens de mesa, movimentações
+de estoque, carrinho) deixam de abrir cada uma sua própria transação de
+escrita no SQLite. Elas são enfileiradas como funções `fn(sessao)` e uma única
+thread as executa em lotes: todas as operações do lote rodam na mesma sessão e
+terminam em um único COMMIT. Cada chamador recebe, via Future, o próprio
+resultado ou a própria exceção.
+
+As funções de `crud` chamam `db.commit()` internamente; na sessão do
+coordenador (`SessaoAgrupada`) isso vira apenas `flush()`, e o commit real
+acontece no fim do lote. Se alguma operação do lote falhar, o lote inteiro é
+desfeito e as operações são reexecutadas uma a uma, cada uma com seu commit,
+para que a falha de uma não contamine as demais.
+
+    WRITE_COORDINATOR=true            ativa o coordenador
+    WRITE_COORDINATOR_MAX_BATCH=64    operações por commit
+    WRITE_COORDINATOR_WAIT_MS=0       espera extra para juntar mais operações no lote
+    WRITE_COORDINATOR_TIMEOUT_S=30    tempo máximo que um chamador espera pelo resultado
+
+Os objetos devolvidos ficam desanexados da sessão (expire_on_commit=False):
+atributos já carregados continuam acessíveis, mas relacionamentos que o
+chamador vá usar devem ser carregados dentro de `fn`.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend import metrics
+from backend.logging_config import logger
+
+ATIVO = os.environ.get("WRITE_COORDINATOR", "false").lower() in ("1", "true", "yes", "sim")
+MAX_LOTE = int(os.environ.get("WRITE_COORDINATOR_MAX_BATCH", "64"))
+ESPERA_S = float(os.environ.get("WRITE_COORDINATOR_WAIT_MS", "0")) / 1000.0
+TIMEOUT_S = float(os.environ.get("WRITE_COORDINATOR_TIMEOUT_S", "30"))
+
+
+class SessaoAgrupada(Session):
+    """Sessão em que `commit()` só faz flush; o coordenador confirma o lote com `confirmar()`."""
+
+    def commit(self) -> None:
+        self.flush()
+
+    def confirmar(self) -> None:
+        super().commit()
+
+
+_PARAR = object()
+
+
+class CoordenadorEscrita:
+    def __init__(self, bind, max_lote: int = MAX_LOTE, espera_s: float = ESPERA_S):
+        self._Session = sessionmaker(bind=bind, class_=SessaoAgrupada, autocommit=False,
+                                     autoflush=False, expire_on_commit=False)
+        self.max_lote = max_lote
+        self.espera_s = espera_s
+        self._fila: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.lotes = 0
+        self.operacoes = 0
+        self.falhas = 0
+        self.lotes_refeitos = 0
+
+    # --- ciclo de vida ---
+    def iniciar(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="write-coordinator", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> None:
+        """Processa o que já está na fila e encerra a thread."""
+        if self._thread is None:
+            return
+        self._fila.put(_PARAR)
+        self._thread.join()
+        self._thread = None
+
+    # --- API ---
+    def submeter(self, fn: Callable[[Session], object]) -> Future:
+        futuro: Future = Future()
+        if self._thread is None:
+            futuro.set_exception(RuntimeError("Coordenador de escritas não iniciado"))
+            return futuro
+        self._fila.put((fn, futuro))
+        return futuro
+
+    def executar(self, fn: Callable[[Session], object], timeout: Optional[float] = TIMEOUT_S):
+        return self.submeter(fn).result(timeout=timeout)
+
+    def profundidade(self) -> int:
+        return self._fila.qsize()
+
+    # --- thread escritora ---
+    def _loop(self) -> None:
+        parar = False
+        while not parar:
+            item = self._fila.get()
+            if item is _PARAR:
+                break
+            lote = [item]
+            prazo = time.monotonic() + self.espera_s
+            while len(lote) < self.max_lote:
+                try:
+                    restante = prazo - time.monotonic()
+                    item = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _PARAR:
+                    parar = True
+                    break
+                lote.append(item)
+            lote = [(fn, fut) for fn, fut in lote if fut.set_running_or_notify_cancel()]
+            if lote:
+                self._processar(lote)
+
+    def _processar(self, lote: List[Tuple[Callable, Future]]) -> None:
+        db = self._Session()
+        try:
+            resultados = [fn(db) for fn, _fut in lote]
+            db.confirmar()
+        except Exception:
+            db.rollback()
+            if len(lote) > 1:
+                self.lotes_refeitos += 1
+            self._um_a_um(lote)
+            return
+        finally:
+            db.close()
+        self.lotes += 1
+        self.operacoes += len(lote)
+        for (_fn, fut), resultado in zip(lote, resultados):
+            fut.set_result(resultado)
+
+    def _um_a_um(self, lote: List[Tuple[Callable, Future]]) -> None:
+        for fn, fut in lote:
+            db = self._Session()
+            try:
+                resultado = fn(db)
+                db.confirmar()
+            except Exception as e:
+                db.rollback()
+                self.falhas += 1
+                fut.set_exception(e)
+            else:
+                self.lotes += 1
+                self.operacoes += 1
+                fut.set_result(resultado)
+            finally:
+                db.close()
+
+    def linhas_metricas(self) -> List[str]:
+        return [
+            "# HELP write_coordinator_queue_depth Operações de escrita aguardando a thread escritora.",
+            "# TYPE write_coordinator_queue_depth gauge",
+            f"write_coordinator_queue_depth {self.profundidade()}",
+            "# HELP write_coordinator_commits_total Commits feitos pelo coordenador.",
+            "# TYPE write_coordinator_commits_total counter",
+            f"write_coordinator_commits_total {self.lotes}",
+            "# HELP write_coordinator_operations_total Operações executadas pelo coordenador.",
+            "# TYPE write_coordinator_operations_total counter",
+            f"write_coordinator_operations_total {self.operacoes}",
+            "# HELP write_coordinator_failures_total Operações que terminaram em erro.",
+            "# TYPE write_coordinator_failures_total counter",
+            f"write_coordinator_failures_total {self.falhas}",
+            "# HELP write_coordinator_batch_retries_total Lotes desfeitos e refeitos um a um.",
+            "# TYPE write_coordinator_batch_retries_total counter",
+            f"write_coordinator_batch_retries_total {self.lotes_refeitos}",
+        ]
+
+
+_coordenador: Optional[CoordenadorEscrita] = None
+
+
+def iniciar(bind) -> Optional[CoordenadorEscrita]:
+    """Cria e inicia o coordenador global se WRITE_COORDINATOR estiver ativo."""
+    global _coordenador
+    if not ATIVO or _coordenador is not None:
+        return _coordenador
+    _coordenador = CoordenadorEscrita(bind)
+    _coordenador.iniciar()
+    metrics.registrar_coletor(_coordenador.linhas_metricas)
+    logger.info("Coordenador de escritas ativo (lote máximo %d)", _coordenador.max_lote)
+    return _coordenador
+
+
+def parar() -> None:
+    global _coordenador
+    if _coordenador is not None:
+        _coordenador.parar()
+        _coordenador = None
+
+
+def executar_escrita(db: Session, fn: Callable[[Session], object]):
+    """Executa `fn(sessao)` pelo coordenador, se ativo; senão direto na sessão da requisição."""
+    if _coordenador is None:
+        return fn(db)
+    return _coordenador.executar(fn)